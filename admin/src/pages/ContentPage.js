@@ -87,8 +87,10 @@ const ContentPage = () => {
         updatesBySection[section][key] = value;
       });
 
-      // Send a single bulk update request
+      // Send a single bulk update request (saves the draft)
       await axios.put('/api/admin/content/bulk-update', updatesBySection);
+      // Publicar el borrador: el sitio cambia de una sola vez
+      await axios.post('/api/admin/content/publish');
 
       // Refresh content
       await fetchContent();
@@ -117,6 +119,7 @@ const ContentPage = () => {
   const initializeDefaults = async () => {
     try {
       await axios.post('/api/admin/content/initialize-defaults');
+      await axios.post('/api/admin/content/publish');
       await fetchContent();
       toast.success('Contenido inicializado con valores por defecto');
     } catch (error) {
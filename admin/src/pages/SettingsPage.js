@@ -65,6 +65,18 @@ const SettingsPage = () => {
   const createBackup = async () => {
     try {
       const resp = await axios.post('/api/admin/system/backups/create');
+      toast.success('Backup en progreso');
+      // The backup runs as a background job: poll until it finishes
+      let job = resp.data;
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const jobResp = await axios.get(`/api/admin/system/backups/jobs/${resp.data.job_id}`);
+        job = jobResp.data;
+      }
+      if (job.status === 'failed') {
+        toast.error('Error creando backup');
+        return;
+      }
       toast.success('Backup creado');
       await fetchSettings();
     } catch (e) {
@@ -0,0 +1,24 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict
+
+from rollups import record_event
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+
+@traced("audit.log_action")
+async def log_action(db, entry: Dict[str, Any]):
+    """Write an audit event to admin_logs and update the daily rollups.
+
+    Every admin/system action goes through here so the per-day counters stay
+    current without rescanning admin_logs.
+    """
+    entry.setdefault("timestamp", datetime.utcnow())
+    await db.admin_logs.insert_one(entry)
+    try:
+        await record_event(db, entry)
+    except Exception as e:
+        # Rollups can be rebuilt from admin_logs; never fail the action over them
+        logger.error(f"Error updating audit rollups: {str(e)}")
@@ -1,7 +1,5 @@
 import jwt
 import bcrypt
-import pyotp
-import qrcode
 from io import BytesIO
 import base64
 from datetime import datetime, timedelta
@@ -11,6 +9,10 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from audit import log_action
+# Re-exported: routes and scripts import the database accessors from auth
+from database import get_database, query_budget, set_database
+
 # Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-super-secret-jwt-key-change-in-production")
 ALGORITHM = "HS256"
@@ -19,20 +21,6 @@ MFA_COMPANY_NAME = "Óptica Villalba Admin"
 
 security = HTTPBearer()
 
-# MongoDB connection - will be injected
-_db = None
-
-def set_database(database):
-    """Set database instance for auth service"""
-    global _db
-    _db = database
-
-def get_database():
-    """Get database instance"""
-    if _db is None:
-        raise RuntimeError("Database not initialized. Call set_database() first.")
-    return _db
-
 class AuthService:
     @staticmethod
     def hash_password(password: str) -> str:
@@ -78,11 +66,15 @@ class AuthService:
     @staticmethod
     def generate_mfa_secret() -> str:
         """Generate MFA secret for user"""
+        import pyotp
         return pyotp.random_base32()
     
     @staticmethod
     def generate_qr_code(secret: str, username: str) -> str:
         """Generate QR code for MFA setup"""
+        # qrcode pulls in Pillow: only needed during MFA enrolment
+        import pyotp
+        import qrcode
         totp_uri = pyotp.totp.TOTP(secret).provisioning_uri(
             name=username,
             issuer_name=MFA_COMPANY_NAME
@@ -104,6 +96,7 @@ class AuthService:
     @staticmethod
     def verify_mfa_token(secret: str, token: str) -> bool:
         """Verify MFA token"""
+        import pyotp
         totp = pyotp.TOTP(secret)
         return totp.verify(token, valid_window=1)  # Allow 1 window tolerance
     
@@ -160,7 +153,7 @@ class AuthService:
             "timestamp": datetime.utcnow(),
             "action": "login_attempt"
         }
-        await db.admin_logs.insert_one(log_entry)
+        await log_action(db, log_entry)
 
 # Dependency to verify authentication
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -176,7 +169,8 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 detail="Invalid token"
             )
         
-        user = await AuthService.get_user_by_username(username)
+        with query_budget():
+            user = await AuthService.get_user_by_username(username)
         if user is None or not user.get("is_active", True):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,284 @@
+import asyncio
+import contextvars
+import logging
+import os
+import socket
+import threading
+import uuid
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from pymongo.errors import PyMongoError
+
+from database import get_database, query_budget
+from tracing import current_span, submit_in_context, tracer
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+BACKUP_COMPRESSION_LEVEL = int(os.environ.get("BACKUP_COMPRESSION_LEVEL", "6"))
+BACKUP_WORKERS = int(os.environ.get("BACKUP_WORKERS", "1"))
+MAX_FINISHED_JOBS = 50
+JOBS_COLLECTION = "backup_jobs"
+PROGRESS_SAVE_SECONDS = float(os.environ.get("BACKUP_PROGRESS_SAVE_SECONDS", "1"))
+STALE_JOB_SECONDS = 60  # an unfinished job nobody saved for this long lost its worker
+
+
+class BackupJob:
+    """State of a background backup job, updated from the worker thread"""
+
+    def __init__(self, kind: str, params: Optional[Dict[str, Any]] = None):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.params = params or {}
+        self.status = "queued"  # queued, running, completed, failed
+        self.files_total = 0
+        self.files_done = 0
+        self.bytes_done = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.future: Optional[Union[Future, asyncio.Future]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    @property
+    def progress(self) -> float:
+        if self.status == "completed":
+            return 1.0
+        if not self.files_total:
+            return 0.0
+        return round(self.files_done / self.files_total, 4)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": self.progress,
+            "files_total": self.files_total,
+            "files_done": self.files_done,
+            "bytes_done": self.bytes_done,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _job_from_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """API view of a persisted job; an unfinished job whose worker went away is reported failed"""
+    doc.pop("_id", None)
+    stale_before = datetime.utcnow() - timedelta(seconds=STALE_JOB_SECONDS)
+    if doc["status"] in ("queued", "running") and doc["updated_at"] < stale_before:
+        doc["status"] = "failed"
+        doc["error"] = f"Worker {doc.get('worker')} stopped before the job finished"
+    return doc
+
+
+class BackupJobManager:
+    """Runs backup work in a dedicated thread pool so the event loop stays free.
+
+    Job state is mirrored to the `backup_jobs` collection (on submit, every
+    PROGRESS_SAVE_SECONDS while running, and when the job finishes), so with
+    several workers a poll that lands on another process still finds the job.
+    """
+
+    def __init__(self, max_workers: int = BACKUP_WORKERS, save_interval: float = PROGRESS_SAVE_SECONDS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="backup")
+        self._jobs: Dict[str, BackupJob] = {}
+        self._lock = threading.Lock()
+        self.save_interval = save_interval
+        self._unsaved: set = set()
+        self._saver: Optional[asyncio.Task] = None
+        self._saver_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def submit(self, kind: str, func: Callable[..., Dict[str, Any]], *args, params: Optional[Dict[str, Any]] = None) -> BackupJob:
+        """Queue `func(job, *args)`; its return value becomes the job result"""
+        job = BackupJob(kind, params)
+        await self._register(job)
+        # The worker thread inherits the caller's context so its span joins the request trace
+        job.future = submit_in_context(self._executor, self._run, job, func, args)
+        return job
+
+    def _run(self, job: BackupJob, func: Callable[..., Dict[str, Any]], args):
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        try:
+            with tracer.span(f"backup_job {job.kind}", attributes={"backup.job_id": job.id}):
+                job.result = func(job, *args)
+            job.status = "completed"
+            logger.info(f"Backup job {job.id} ({job.kind}) completed")
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            logger.error(f"Backup job {job.id} ({job.kind}) failed: {str(e)}")
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._wake_saver_threadsafe()
+
+    async def submit_async(self, kind: str, func: Callable[..., Awaitable[Dict[str, Any]]], *args, params: Optional[Dict[str, Any]] = None) -> BackupJob:
+        """Schedule coroutine `func(job, *args)` on the running loop (for I/O-bound jobs)"""
+        job = BackupJob(kind, params)
+        await self._register(job)
+        # Start from an empty context: the job outlives the request, so the
+        # request's query deadline (pymongo.timeout) must not apply to it
+        # (the trace parent is passed explicitly instead)
+        job.future = contextvars.Context().run(asyncio.ensure_future, self._run_async(job, func, args, current_span()))
+        return job
+
+    async def _run_async(self, job: BackupJob, func: Callable[..., Awaitable[Dict[str, Any]]], args, parent=None):
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        try:
+            with tracer.span(f"backup_job {job.kind}", attributes={"backup.job_id": job.id}, parent=parent):
+                job.result = await func(job, *args)
+            job.status = "completed"
+            logger.info(f"Backup job {job.id} ({job.kind}) completed")
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            logger.error(f"Backup job {job.id} ({job.kind}) failed: {str(e)}")
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._wake_saver_threadsafe()
+
+    async def _register(self, job: BackupJob):
+        with self._lock:
+            self._jobs[job.id] = job
+            self._unsaved.add(job.id)
+            self._prune()
+        # Persisted before the job id is handed out, so any worker can answer the first poll
+        await self._save(job)
+        loop = asyncio.get_running_loop()
+        if self._saver is None or self._saver.done() or self._saver_loop is not loop:
+            self._saver_loop = loop
+            self._wakeup = asyncio.Event()
+            # Empty context: the saver outlives the request that started it (and its query deadline)
+            self._saver = contextvars.Context().run(loop.create_task, self._save_progress(), name="backup-jobs:save")
+
+    def _wake_saver_threadsafe(self):
+        loop, wakeup = self._saver_loop, self._wakeup
+        if loop is None or wakeup is None:
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            pass  # loop already closed (shutdown)
+
+    async def _save_progress(self):
+        """Mirror local jobs to Mongo until every one of them has saved its final state"""
+        while self._unsaved:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.save_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            with self._lock:
+                jobs = [self._jobs[job_id] for job_id in self._unsaved if job_id in self._jobs]
+                self._unsaved.intersection_update(self._jobs)
+            for job in jobs:
+                finished = job.finished
+                await self._save(job)
+                if finished:
+                    self._unsaved.discard(job.id)
+
+    async def _save(self, job: BackupJob):
+        try:
+            with query_budget():
+                await get_database()[JOBS_COLLECTION].replace_one(
+                    {"_id": job.id},
+                    {
+                        "_id": job.id,
+                        **job.to_dict(),
+                        "worker": f"{socket.gethostname()}:{os.getpid()}",
+                        "updated_at": datetime.utcnow(),
+                    },
+                    upsert=True
+                )
+        except (PyMongoError, RuntimeError) as e:
+            logger.error(f"Error saving backup job {job.id}: {str(e)}")
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.finished]
+        if len(finished) <= MAX_FINISHED_JOBS:
+            return
+        finished.sort(key=lambda j: j.finished_at)
+        for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+            self._jobs.pop(job.id, None)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job state: live from memory when this process runs it, else as last persisted"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        try:
+            doc = await get_database()[JOBS_COLLECTION].find_one({"_id": job_id})
+        except (PyMongoError, RuntimeError) as e:
+            logger.error(f"Error loading backup job {job_id}: {str(e)}")
+            return None
+        return _job_from_doc(doc) if doc else None
+
+    async def list(self, limit: int = MAX_FINISHED_JOBS) -> List[Dict[str, Any]]:
+        """Recent jobs of every worker, with live state for this process's own"""
+        with self._lock:
+            jobs = {job.id: job.to_dict() for job in self._jobs.values()}
+        try:
+            cursor = get_database()[JOBS_COLLECTION].find().sort("created_at", -1).limit(limit)
+            async for doc in cursor:
+                if doc["_id"] not in jobs:
+                    job = _job_from_doc(doc)
+                    jobs[job["job_id"]] = job
+        except (PyMongoError, RuntimeError) as e:
+            logger.error(f"Error listing backup jobs: {str(e)}")
+        return sorted(jobs.values(), key=lambda j: j["created_at"], reverse=True)[:limit]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def write_zip(job: BackupJob, src_dir: Path, dest: Path, compression_level: int = BACKUP_COMPRESSION_LEVEL) -> Dict[str, Any]:
+    """Stream `src_dir` into a zip at `dest`, renaming atomically on completion.
+
+    Files are added one at a time (zipfile copies them in chunks), so memory
+    use does not grow with the tree size. Entries are relative to `src_dir`.
+    """
+    files = []
+    for root, dirs, names in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(names):
+            files.append(Path(root) / name)
+    job.files_total = len(files)
+
+    compression = zipfile.ZIP_DEFLATED if compression_level > 0 else zipfile.ZIP_STORED
+    tmp_path = dest.with_name(dest.name + ".partial")
+    try:
+        with zipfile.ZipFile(tmp_path, "w", compression=compression, compresslevel=compression_level or None) as archive:
+            for path in files:
+                archive.write(path, arcname=str(path.relative_to(src_dir)))
+                job.files_done += 1
+                job.bytes_done += path.stat().st_size
+        with open(tmp_path, "rb") as fh:
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, dest)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+    return {"filename": dest.name, "size": dest.stat().st_size, "files": len(files)}
+
+
+backup_jobs = BackupJobManager()
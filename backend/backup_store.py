@@ -0,0 +1,273 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed store: blobs/<ab>/<sha256> plus one JSON manifest per snapshot.
+# Kept outside uploads/ so it is never served by the static mount.
+BACKUP_STORE_DIR = Path(os.environ.get("BACKUP_STORE_DIR", "backup_store"))
+BLOBS_DIR = BACKUP_STORE_DIR / "blobs"
+MANIFESTS_DIR = BACKUP_STORE_DIR / "manifests"
+HASH_CHUNK_SIZE = 1024 * 1024
+# Safety snapshots (taken before every restore) kept per source; older ones are pruned
+SAFETY_SNAPSHOTS_KEEP = int(os.environ.get("SAFETY_SNAPSHOTS_KEEP", "5"))
+
+
+def _ensure_dirs():
+    BLOBS_DIR.mkdir(parents=True, exist_ok=True)
+    MANIFESTS_DIR.mkdir(parents=True, exist_ok=True)
+
+
+_thread_lock = threading.Lock()
+
+
+@contextmanager
+def _store_lock():
+    """Serialize writers of the store across threads and worker processes.
+
+    Garbage collection must not run between a snapshot deciding to reuse a
+    blob and writing the manifest that references it, nor under a restore.
+    """
+    _ensure_dirs()
+    with _thread_lock, open(BACKUP_STORE_DIR / ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _blob_path(digest: str) -> Path:
+    return BLOBS_DIR / digest[:2] / digest
+
+
+def _atomic_write_bytes(path: Path, data: bytes):
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _store_file(path: Path) -> Tuple[str, bool]:
+    """Hash a file and copy it into the blob store if the content is new.
+
+    Returns the digest and whether a new blob was written. The file is read
+    once, in chunks, into a temporary blob that is renamed or discarded.
+    """
+    BLOBS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = BLOBS_DIR / f".incoming-{uuid.uuid4().hex}"
+    sha = hashlib.sha256()
+    try:
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            while True:
+                chunk = src.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+                dst.write(chunk)
+        digest = sha.hexdigest()
+        blob = _blob_path(digest)
+        if blob.exists():
+            return digest, False
+        blob.parent.mkdir(exist_ok=True)
+        os.replace(tmp_path, blob)
+        return digest, True
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def load_manifest(name: str) -> Dict[str, Any]:
+    path = MANIFESTS_DIR / f"{name}.json"
+    if not path.exists():
+        raise FileNotFoundError(f"Snapshot {name} not found")
+    return json.loads(path.read_text())
+
+
+def list_manifests(source: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Snapshot summaries (without the file table), newest first"""
+    if not MANIFESTS_DIR.exists():
+        return []
+    items = []
+    for path in MANIFESTS_DIR.glob("*.json"):
+        manifest = json.loads(path.read_text())
+        if source and manifest.get("source") != source:
+            continue
+        manifest.pop("files", None)
+        items.append(manifest)
+    items.sort(key=lambda m: m["created_at"], reverse=True)
+    return items
+
+
+def _latest_manifest(source: str) -> Optional[Dict[str, Any]]:
+    summaries = list_manifests(source)
+    if not summaries:
+        return None
+    return load_manifest(summaries[0]["name"])
+
+
+def create_snapshot(job, src_dir: Path, name: str, kind: str = "snapshot") -> Dict[str, Any]:
+    """Record `src_dir` as a manifest, storing only content not already in the store.
+
+    Files whose size and mtime match the previous manifest reuse its hash
+    without being read, so an unchanged tree costs one stat per file.
+    """
+    with _store_lock():
+        return _create_snapshot(job, src_dir, name, kind)
+
+
+def _create_snapshot(job, src_dir: Path, name: str, kind: str) -> Dict[str, Any]:
+    src_dir = Path(src_dir)
+    source = src_dir.name
+    previous = _latest_manifest(source)
+    previous_files = previous["files"] if previous else {}
+
+    paths = []
+    for root, dirs, names in os.walk(src_dir):
+        dirs.sort()
+        for filename in sorted(names):
+            paths.append(Path(root) / filename)
+    if job is not None:
+        job.files_total = len(paths)
+
+    files = {}
+    new_blobs = 0
+    new_bytes = 0
+    total_size = 0
+    for path in paths:
+        rel = path.relative_to(src_dir).as_posix()
+        stat = path.stat()
+        known = previous_files.get(rel)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns and _blob_path(known["sha256"]).exists():
+            digest = known["sha256"]
+        else:
+            digest, written = _store_file(path)
+            if written:
+                new_blobs += 1
+                new_bytes += stat.st_size
+        files[rel] = {
+            "sha256": digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "mode": stat.st_mode & 0o777,
+        }
+        total_size += stat.st_size
+        if job is not None:
+            job.files_done += 1
+            job.bytes_done += stat.st_size
+
+    manifest = {
+        "name": name,
+        "kind": kind,
+        "source": source,
+        "parent": previous["name"] if previous else None,
+        "created_at": datetime.utcnow().isoformat(),
+        "file_count": len(files),
+        "total_size": total_size,
+        "new_blobs": new_blobs,
+        "new_bytes": new_bytes,
+        "files": files,
+    }
+    _atomic_write_bytes(MANIFESTS_DIR / f"{name}.json", json.dumps(manifest).encode())
+    logger.info(f"Snapshot {name}: {len(files)} files, {new_blobs} new blobs ({new_bytes} bytes)")
+
+    summary = dict(manifest)
+    summary.pop("files")
+    return summary
+
+
+def restore_snapshot(job, name: str, dest_dir: Path, current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Make `dest_dir` match snapshot `name`, touching only files that differ.
+
+    `current` is a manifest of the destination as it is now (normally the
+    safety snapshot taken just before), used to skip unchanged files.
+    """
+    with _store_lock():
+        return _restore_snapshot(job, name, dest_dir, current)
+
+
+def _restore_snapshot(job, name: str, dest_dir: Path, current: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    target = load_manifest(name)
+    dest_dir = Path(dest_dir)
+    current_files = current["files"] if current else {}
+    target_files = target["files"]
+    if job is not None:
+        job.files_total = len(target_files)
+
+    written = 0
+    for rel, entry in target_files.items():
+        existing = current_files.get(rel)
+        if not existing or existing["sha256"] != entry["sha256"]:
+            path = dest_dir / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + ".restore-tmp")
+            shutil.copyfile(_blob_path(entry["sha256"]), tmp_path)
+            os.chmod(tmp_path, entry.get("mode", 0o644))
+            os.replace(tmp_path, path)
+            written += 1
+        if job is not None:
+            job.files_done += 1
+
+    removed = 0
+    for rel in current_files:
+        if rel not in target_files:
+            try:
+                (dest_dir / rel).unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+
+    return {"snapshot": name, "files": len(target_files), "written": written, "removed": removed}
+
+
+def delete_snapshot(name: str) -> int:
+    """Delete a manifest and garbage-collect blobs no manifest references"""
+    with _store_lock():
+        path = MANIFESTS_DIR / f"{name}.json"
+        if not path.exists():
+            raise FileNotFoundError(f"Snapshot {name} not found")
+        path.unlink()
+        return _collect_garbage()
+
+
+def prune_snapshots(
+    source: str, kind: str = "safety", keep: int = SAFETY_SNAPSHOTS_KEEP, exclude: Iterable[str] = ()
+) -> List[str]:
+    """Delete all but the newest `keep` snapshots of `kind` for `source` (never those in `exclude`), then collect garbage"""
+    with _store_lock():
+        exclude = set(exclude)
+        old = [m["name"] for m in list_manifests(source) if m.get("kind") == kind][keep:]
+        old = [name for name in old if name not in exclude]
+        for name in old:
+            (MANIFESTS_DIR / f"{name}.json").unlink()
+        if old:
+            removed = _collect_garbage()
+            logger.info(f"Pruned {len(old)} {kind} snapshot(s) of {source}, {removed} blobs removed")
+        return old
+
+
+def collect_garbage() -> int:
+    with _store_lock():
+        return _collect_garbage()
+
+
+def _collect_garbage() -> int:
+    referenced = set()
+    for manifest_path in MANIFESTS_DIR.glob("*.json"):
+        for entry in json.loads(manifest_path.read_text())["files"].values():
+            referenced.add(entry["sha256"])
+    removed = 0
+    for blob in BLOBS_DIR.glob("*/*"):
+        if blob.name not in referenced:
+            blob.unlink()
+            removed += 1
+    return removed
@@ -0,0 +1,120 @@
+"""Deterministic seed data for benchmarks"""
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict
+
+BENCH_USERNAME = "bench_admin"
+
+# Fixture sizes per preset; override individual counts from the CLI
+SIZES: Dict[str, Dict[str, int]] = {
+    "small": {"promotions": 50, "brands": 20, "content": 30, "logs": 1000},
+    "medium": {"promotions": 500, "brands": 100, "content": 200, "logs": 20000},
+    "large": {"promotions": 5000, "brands": 500, "content": 1000, "logs": 200000},
+    # Promotion search at catalogue scale: python -m benchmarks.run --size xlarge --scenario search
+    "xlarge": {"promotions": 100000, "brands": 500, "content": 1000, "logs": 200000},
+}
+
+SECTIONS = ["header", "hero", "info", "footer", "general"]
+PROMOTION_TYPES = ["Promoción Especial", "Oferta Diaria", "Descuento", "2x1"]
+ACTIONS = ["login", "create_promotion", "update_promotion", "delete_promotion", "create_brand", "update_content"]
+
+
+def _uid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _promotion(rng: random.Random, now: datetime, i: int) -> dict:
+    start = now - timedelta(days=rng.randint(0, 60))
+    return {
+        "id": _uid(rng),
+        "title": f"Promoción {i}",
+        "discount": f"{rng.choice([10, 15, 20, 25, 30, 50])}%",
+        "type": rng.choice(PROMOTION_TYPES),
+        "description": " ".join(f"palabra{rng.randint(0, 999)}" for _ in range(rng.randint(10, 40))),
+        "features": [f"Beneficio {j}" for j in range(rng.randint(0, 6))],
+        "image_url": f"/uploads/promotions/{_uid(rng)}.jpg",
+        # Most promotions are current so the public listing has real work to do
+        "is_active": rng.random() < 0.8,
+        "start_date": start,
+        "end_date": start + timedelta(days=rng.randint(1, 120)),
+        "created_at": start,
+        "updated_at": start,
+    }
+
+
+def _brand(rng: random.Random, now: datetime, i: int) -> dict:
+    return {
+        "id": _uid(rng),
+        "name": f"Marca {i}",
+        "logo_url": f"/uploads/brands/{_uid(rng)}.png",
+        "color": "#%06x" % rng.getrandbits(24),
+        "is_active": rng.random() < 0.9,
+        "order": i,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _content(rng: random.Random, now: datetime, i: int) -> dict:
+    return {
+        "id": _uid(rng),
+        "section": SECTIONS[i % len(SECTIONS)],
+        "key": f"key_{i}",
+        "value": rng.choice([
+            f"Texto {i} " * rng.randint(1, 20),
+            {"title": f"Título {i}", "items": [f"item {j}" for j in range(rng.randint(1, 8))]},
+            [f"elemento {j}" for j in range(rng.randint(1, 10))],
+        ]),
+        "description": None,
+        "updated_at": now,
+    }
+
+
+def _log(rng: random.Random, now: datetime, i: int) -> dict:
+    action = rng.choice(ACTIONS)
+    entry = {
+        "username": rng.choice(["admin", "editor", BENCH_USERNAME, "system"]),
+        "action": action,
+        "resource_id": _uid(rng),
+        "details": {"n": i},
+        "timestamp": now - timedelta(seconds=rng.randint(0, 90 * 86400)),
+    }
+    if action == "login":
+        entry["success"] = rng.random() < 0.9
+        entry["ip_address"] = f"10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}"
+    return entry
+
+
+async def seed(db, promotions: int, brands: int, content: int, logs: int, seed: int = 42, batch_size: int = 1000):
+    """Replace the benchmark collections with generated documents"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    generators = [
+        ("promotions", promotions, _promotion),
+        ("brands", brands, _brand),
+        ("site_config", content, _content),
+        ("admin_logs", logs, _log),
+    ]
+    for collection, count, make in generators:
+        await db[collection].delete_many({})
+        batch = []
+        for i in range(count):
+            batch.append(make(rng, now, i))
+            if len(batch) >= batch_size:
+                await db[collection].insert_many(batch)
+                batch = []
+        if batch:
+            await db[collection].insert_many(batch)
+
+    # Admin user for authenticated endpoints (token is minted directly, no MFA round-trip)
+    await db.admin_users.delete_many({"username": BENCH_USERNAME})
+    await db.admin_users.insert_one({
+        "id": _uid(rng),
+        "username": BENCH_USERNAME,
+        "email": "bench@example.com",
+        "hashed_password": "!",
+        "is_active": True,
+        "mfa_enabled": False,
+        "created_at": now,
+    })
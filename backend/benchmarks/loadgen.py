@@ -0,0 +1,174 @@
+"""Dependency-free asyncio HTTP/1.1 load generator"""
+import asyncio
+import math
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class Endpoint:
+    def __init__(self, name: str, path: str, weight: int = 1, auth: bool = False, method: str = "GET"):
+        self.name = name
+        self.path = path
+        self.weight = weight
+        self.auth = auth
+        self.method = method
+
+
+class HTTPConnection:
+    """Minimal keep-alive HTTP/1.1 client connection (Content-Length and chunked bodies)"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def request(self, method: str, path: str, headers: Dict[str, str]) -> Tuple[int, int]:
+        """Send a request and read the whole response; returns (status, body bytes)"""
+        if self.writer is None:
+            await self._connect()
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+        status = int(status_line.split()[1])
+        length = None
+        chunked = False
+        keep_alive = True
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            value = value.strip()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding" and "chunked" in value.lower():
+                chunked = True
+            elif name == "connection" and value.lower() == "close":
+                keep_alive = False
+
+        size = 0
+        if chunked:
+            while True:
+                chunk_size = int((await self.reader.readline()).split(b";")[0], 16)
+                if chunk_size == 0:
+                    await self.reader.readline()
+                    break
+                size += len(await self.reader.readexactly(chunk_size + 2)) - 2
+        elif length is not None:
+            size = len(await self.reader.readexactly(length))
+        else:
+            size = len(await self.reader.read())
+            keep_alive = False
+        if not keep_alive:
+            self.close()
+        return status, size
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float, size: int) -> Dict[str, float]:
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / count, 3) if count else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+        "avg_bytes": round(size / count) if count else 0,
+    }
+
+
+async def run_load(
+    host: str,
+    port: int,
+    endpoints: List[Endpoint],
+    concurrency: int = 32,
+    duration: float = 10.0,
+    warmup: float = 2.0,
+    token: Optional[str] = None,
+    accept_encoding: Optional[str] = None,
+    seed: int = 1,
+) -> Dict[str, Dict[str, float]]:
+    """Closed-loop load: `concurrency` virtual users, each issuing one request at a time.
+
+    Requests during the warm-up period are not recorded. Each user picks the
+    next endpoint at random according to the endpoint weights.
+    """
+    latencies: Dict[str, List[float]] = {e.name: [] for e in endpoints}
+    errors: Dict[str, int] = {e.name: 0 for e in endpoints}
+    sizes: Dict[str, int] = {e.name: 0 for e in endpoints}
+    weights = [e.weight for e in endpoints]
+    base_headers = {"Accept": "application/json"}
+    if accept_encoding:
+        base_headers["Accept-Encoding"] = accept_encoding
+
+    started = time.perf_counter()
+    record_from = started + warmup
+    stop_at = record_from + duration
+
+    async def user(n: int):
+        rng = random.Random(seed * 1000 + n)
+        conn = HTTPConnection(host, port)
+        try:
+            while True:
+                now = time.perf_counter()
+                if now >= stop_at:
+                    break
+                endpoint = rng.choices(endpoints, weights)[0]
+                headers = dict(base_headers)
+                if endpoint.auth and token:
+                    headers["Authorization"] = f"Bearer {token}"
+                t0 = time.perf_counter()
+                try:
+                    status, size = await conn.request(endpoint.method, endpoint.path, headers)
+                    ok = status < 400
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                    conn.close()
+                    status, size, ok = 0, 0, False
+                t1 = time.perf_counter()
+                if t0 < record_from:
+                    continue
+                if ok:
+                    latencies[endpoint.name].append((t1 - t0) * 1000)
+                    sizes[endpoint.name] += size
+                else:
+                    errors[endpoint.name] += 1
+        finally:
+            conn.close()
+
+    await asyncio.gather(*(user(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - record_from
+
+    results = {
+        e.name: summarize(latencies[e.name], errors[e.name], elapsed, sizes[e.name])
+        for e in endpoints
+    }
+    all_latencies = [v for values in latencies.values() for v in values]
+    results["_total"] = summarize(all_latencies, sum(errors.values()), elapsed, sum(sizes.values()))
+    return results
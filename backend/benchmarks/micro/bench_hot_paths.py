@@ -0,0 +1,107 @@
+"""Micro-benchmarks for CPU-heavy in-process functions, at realistic input sizes"""
+import io
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from auth import AuthService
+from models.promotion import Promotion
+from routes.admin_upload import optimize_image
+from content_revisions import apply_changes, diff_content
+
+
+def _photo(width: int, height: int, mode: str, fmt: str) -> bytes:
+    """Noisy image (compresses like a photo, unlike a flat fill)"""
+    from PIL import Image
+    rng = random.Random(width * height)
+    channels = len(mode)
+    image = Image.frombytes(mode, (width, height), rng.randbytes(width * height * channels))
+    output = io.BytesIO()
+    image.save(output, format=fmt)
+    return output.getvalue()
+
+
+@pytest.fixture(scope="module")
+def camera_jpeg():
+    return _photo(2400, 1600, "RGB", "JPEG")
+
+
+@pytest.fixture(scope="module")
+def logo_png():
+    return _photo(800, 800, "RGBA", "PNG")
+
+
+@pytest.fixture(scope="module")
+def promotion_docs():
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    # Same shape and count as the public listing (to_list(100))
+    return [
+        {
+            "_id": uuid.uuid4().hex[:24],
+            "id": str(uuid.uuid4()),
+            "title": f"Promoción {i}",
+            "discount": "20%",
+            "type": "Promoción Especial",
+            "description": "Descripción de la promoción " * rng.randint(2, 10),
+            "features": [f"Beneficio {j}" for j in range(rng.randint(0, 6))],
+            "image_url": f"/uploads/promotions/{uuid.uuid4()}.jpg",
+            "is_active": True,
+            "start_date": now - timedelta(days=10),
+            "end_date": now + timedelta(days=10),
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(100)
+    ]
+
+
+@pytest.fixture(scope="module")
+def content_entries():
+    sections = ["header", "hero", "info", "footer", "general"]
+    # A large site: 1000 keys, as stored in a content checkpoint
+    return [
+        [sections[i % len(sections)], f"key_{i}", {"text": f"Valor {i}", "items": list(range(5))}]
+        for i in range(1000)
+    ]
+
+
+def test_optimize_image_camera_jpeg(benchmark, camera_jpeg):
+    result = benchmark(optimize_image, camera_jpeg, rounds=5)
+    assert result[:2] == b"\xff\xd8"
+
+
+def test_optimize_image_rgba_png(benchmark, logo_png):
+    result = benchmark(optimize_image, logo_png, rounds=5)
+    assert result[:2] == b"\xff\xd8"
+
+
+def test_verify_password(benchmark):
+    hashed = AuthService.hash_password("AdminPass123!")
+    assert benchmark(AuthService.verify_password, "AdminPass123!", hashed, rounds=3)
+
+
+def test_generate_qr_code(benchmark):
+    secret = AuthService.generate_mfa_secret()
+    result = benchmark(AuthService.generate_qr_code, secret, "admin", rounds=5)
+    assert result.startswith("data:image/png;base64,")
+
+
+def test_promotion_model_construction(benchmark, promotion_docs):
+    result = benchmark(lambda docs: [Promotion(**doc) for doc in docs], promotion_docs)
+    assert len(result) == 100
+
+
+def test_rebuild_content_from_checkpoint(benchmark, content_entries):
+    result = benchmark(lambda entries: apply_changes({}, entries, []), content_entries)
+    assert len(result) == 5
+
+
+def test_diff_content_revisions(benchmark, content_entries):
+    old = apply_changes({}, content_entries, [])
+    new = apply_changes({}, content_entries[:990], [])
+    new["hero"]["key_1"] = "changed"
+    set_entries, unset_entries = benchmark(diff_content, old, new)
+    assert len(set_entries) == 1 and len(unset_entries) == 10
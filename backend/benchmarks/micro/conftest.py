@@ -0,0 +1,142 @@
+"""Micro-benchmark harness (a small, dependency-free take on pytest-benchmark).
+
+Run from backend/:
+
+    pytest benchmarks/micro                       # measure, compare with baseline.json
+    pytest benchmarks/micro --bench-save          # record a new baseline
+    pytest benchmarks/micro --bench-max-regression 0.1
+
+Files named bench_*.py are collected only here, so the regular test run never
+picks them up. Each benchmark's median time per call is compared with the
+baseline; a slowdown beyond the threshold fails that benchmark. Baselines are
+machine specific: record and compare them on the same host.
+"""
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# The app modules live in backend/ and use top-level imports
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("micro-benchmarks")
+    group.addoption("--bench-save", action="store_true", help="write results as the new baseline")
+    group.addoption("--bench-baseline", type=Path, default=DEFAULT_BASELINE, help="baseline JSON path")
+    group.addoption("--bench-max-regression", type=float, default=0.25, help="allowed median slowdown (0.25 = 25%%)")
+    group.addoption("--bench-min-time", type=float, default=0.2, help="minimum measured seconds per benchmark")
+
+
+def pytest_collect_file(file_path, parent):
+    if file_path.suffix == ".py" and file_path.name.startswith("bench_"):
+        return pytest.Module.from_parent(parent, path=file_path)
+
+
+class Benchmark:
+    """Calibrates iterations per round, then times several rounds of `func`"""
+
+    def __init__(self, name: str, min_time: float):
+        self.name = name
+        self.min_time = min_time
+        self.stats: Dict[str, Any] = {}
+
+    def __call__(self, func: Callable[..., Any], *args, rounds: int = 7, warmup: int = 1, **kwargs) -> Any:
+        for _ in range(warmup):
+            result = func(*args, **kwargs)
+
+        # Enough iterations per round that a round takes ~min_time / rounds
+        iterations = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.min_time / rounds or iterations >= 1_000_000:
+                break
+            iterations *= 10 if elapsed < self.min_time / rounds / 10 else 2
+
+        per_call: List[float] = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                result = func(*args, **kwargs)
+            per_call.append((time.perf_counter() - started) / iterations)
+
+        self.stats = {
+            "rounds": rounds,
+            "iterations": iterations,
+            "min_us": min(per_call) * 1e6,
+            "median_us": statistics.median(per_call) * 1e6,
+            "mean_us": statistics.fmean(per_call) * 1e6,
+            "stdev_us": statistics.stdev(per_call) * 1e6 if rounds > 1 else 0.0,
+            "ops_per_s": 1 / statistics.median(per_call),
+        }
+        return result
+
+
+def _load_baseline(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text()).get("benchmarks", {})
+
+
+@pytest.fixture(scope="session")
+def _bench_session(request):
+    config = request.config
+    session = {"results": {}, "baseline": _load_baseline(config.getoption("--bench-baseline"))}
+    config._bench_session = session
+    return session
+
+
+@pytest.fixture
+def benchmark(request, _bench_session):
+    config = request.config
+    bench = Benchmark(request.node.name, config.getoption("--bench-min-time"))
+    yield bench
+    if not bench.stats:
+        return
+    _bench_session["results"][bench.name] = bench.stats
+
+    if config.getoption("--bench-save"):
+        return
+    previous = _bench_session["baseline"].get(bench.name)
+    if previous:
+        threshold = config.getoption("--bench-max-regression")
+        change = bench.stats["median_us"] / previous["median_us"] - 1
+        bench.stats["change"] = change
+        if change > threshold:
+            pytest.fail(
+                f"{bench.name} regressed {change:+.1%} "
+                f"({previous['median_us']:.1f}us -> {bench.stats['median_us']:.1f}us, threshold {threshold:.0%})"
+            )
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    session = getattr(config, "_bench_session", None)
+    if not session or not session["results"]:
+        return
+    results = session["results"]
+    terminalreporter.section("micro-benchmarks")
+    terminalreporter.write_line(f"{'benchmark':<44} {'median':>12} {'min':>12} {'stdev':>10} {'ops/s':>12} {'vs base':>9}")
+    for name, stats in sorted(results.items()):
+        change = stats.get("change")
+        terminalreporter.write_line(
+            f"{name:<44} {stats['median_us']:>10.1f}us {stats['min_us']:>10.1f}us "
+            f"{stats['stdev_us']:>8.1f}us {stats['ops_per_s']:>12.1f} "
+            f"{(f'{change:+.1%}' if change is not None else '-'):>9}"
+        )
+
+    if config.getoption("--bench-save"):
+        path = config.getoption("--bench-baseline")
+        baseline = {"python": sys.version.split()[0], "platform": sys.platform, "benchmarks": results}
+        path.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+        terminalreporter.write_line(f"Baseline saved to {path}")
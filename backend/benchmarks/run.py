@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""API load benchmark.
+
+Seeds a database with fixtures, starts `server:app`, drives the public and
+admin endpoints with a closed-loop async load generator and reports
+p50/p95/p99 latency and RPS per endpoint. Results can be saved as a baseline
+and later runs are compared against it.
+
+Run from backend/:
+
+    # against a local mongod (a throwaway bench_* database is created and dropped)
+    python -m benchmarks.run --mongo-url mongodb://localhost:27017 --size medium
+
+    # no mongod: in-process server with mongomock-motor as the database
+    python -m benchmarks.run --in-process --size small
+
+    python -m benchmarks.run ... --save-baseline     # record benchmarks/baseline.json
+    python -m benchmarks.run ... --tolerance 0.15    # fail on >15% regressions
+
+Numbers are only comparable between runs on the same machine with the same
+mode, sizes and concurrency (the baseline records them).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.fixtures import BENCH_USERNAME, SIZES, seed
+from benchmarks.loadgen import Endpoint, HTTPConnection, run_load
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+PUBLIC_ENDPOINTS = [
+    Endpoint("public_promotions_active", "/api/public/promotions/active", weight=5),
+    Endpoint("public_brands_active", "/api/public/brands/active", weight=3),
+    Endpoint("public_content", "/api/public/content", weight=3),
+    Endpoint("public_content_section", "/api/public/content/hero", weight=2),
+    Endpoint("public_site_info", "/api/public/site-info", weight=2),
+    Endpoint("public_health", "/api/public/health", weight=1),
+]
+ADMIN_ENDPOINTS = [
+    Endpoint("admin_promotions", "/api/admin/promotions/", weight=2, auth=True),
+    Endpoint("admin_brands", "/api/admin/brands/", weight=2, auth=True),
+    Endpoint("admin_content_sections", "/api/admin/content/sections", weight=1, auth=True),
+    Endpoint("admin_logs_page", "/api/admin/system/logs?limit=50", weight=2, auth=True),
+    Endpoint("admin_logs_actions_per_user", "/api/admin/system/logs/stats/actions-per-user", weight=1, auth=True),
+]
+# Admin promotion search: ranked full-text match and facet-only browsing
+SEARCH_ENDPOINTS = [
+    Endpoint("admin_promotions_search_text", "/api/admin/promotions/search?q=palabra42", weight=2, auth=True),
+    Endpoint("admin_promotions_search_facets", "/api/admin/promotions/search?is_active=true&date_bucket=month", weight=2, auth=True),
+    Endpoint("admin_promotions_search_type_page", "/api/admin/promotions/search?type=Descuento&skip=20", weight=1, auth=True),
+]
+# mongomock-motor has no $text support
+TEXT_SEARCH_ENDPOINTS = {"admin_promotions_search_text"}
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_token() -> str:
+    # Same secret as the server: both read JWT_SECRET_KEY after loading backend/.env
+    from auth import AuthService
+    return AuthService.create_access_token({"sub": BENCH_USERNAME})
+
+
+async def wait_ready(port: int, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        conn = HTTPConnection("127.0.0.1", port)
+        try:
+            status, _ = await conn.request("GET", "/api/public/health", {})
+            if status == 200:
+                return
+        except (OSError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            conn.close()
+        await asyncio.sleep(0.25)
+    raise RuntimeError("Server did not become healthy in time")
+
+
+async def run_subprocess(args, sizes: Dict[str, int], endpoints: List[Endpoint]) -> Dict[str, Dict[str, float]]:
+    """Seed a throwaway database on a real mongod and benchmark a separate server process"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    db_name = f"bench_{os.getpid()}"
+    client = AsyncIOMotorClient(args.mongo_url)
+    await seed(client[db_name], **sizes, seed=args.seed)
+
+    port = free_port()
+    env = dict(os.environ, MONGO_URL=args.mongo_url, DB_NAME=db_name, APP_PROFILE=args.profile)
+    if args.workers > 1:
+        cmd = [sys.executable, "launcher.py", "--profile", args.profile, "--port", str(port), "--workers", str(args.workers)]
+        env["HOST"] = "127.0.0.1"
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port), "--no-access-log"]
+    log = tempfile.NamedTemporaryFile(prefix="bench_server_", suffix=".log", delete=False)
+    server = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        await wait_ready(port)
+        return await run_load(
+            "127.0.0.1", port, endpoints,
+            concurrency=args.concurrency, duration=args.duration, warmup=args.warmup,
+            token=bench_token(), accept_encoding=args.accept_encoding, seed=args.seed,
+        )
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        log.close()
+        print(f"Server log: {log.name}")
+        await client.drop_database(db_name)
+        client.close()
+
+
+async def run_in_process(args, sizes: Dict[str, int], endpoints: List[Endpoint]) -> Dict[str, Dict[str, float]]:
+    """Serve the app from this process with mongomock-motor standing in for mongod.
+
+    Server and load generator share one event loop, so absolute numbers are
+    lower than in subprocess mode; use it for relative comparisons only.
+    """
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("--in-process needs mongomock-motor (pip install mongomock-motor)")
+    import uvicorn
+
+    os.environ.setdefault("MONGO_URL", "mongodb://127.0.0.1:1")
+    os.environ.setdefault("DB_NAME", "bench")
+    os.environ["APP_PROFILE"] = args.profile
+    import server
+
+    db = AsyncMongoMockClient()["bench"]
+    await seed(db, **sizes, seed=args.seed)
+    # The lifespan hands these globals to set_database()
+    server.db = db
+    server.read_db = db
+
+    port = free_port()
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=port, access_log=False, log_level="warning")
+    uv_server = uvicorn.Server(config)
+    serve_task = asyncio.create_task(uv_server.serve())
+    try:
+        await wait_ready(port)
+        return await run_load(
+            "127.0.0.1", port, endpoints,
+            concurrency=args.concurrency, duration=args.duration, warmup=args.warmup,
+            token=bench_token(), accept_encoding=args.accept_encoding, seed=args.seed,
+        )
+    finally:
+        uv_server.should_exit = True
+        await serve_task
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions beyond `tolerance`: lower RPS or higher latency than the baseline"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous:
+            continue
+        for metric in METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change < -tolerance if metric == "rps" else change > tolerance
+            if worse:
+                regressions.append(f"{name}.{metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]], baseline: Optional[Dict]):
+    header = f"{'endpoint':<34} {'reqs':>7} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    if baseline:
+        header += f" {'p95 vs base':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        line = (
+            f"{name:<34} {r['requests']:>7} {r['errors']:>5} {r['rps']:>9.1f} "
+            f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}"
+        )
+        if baseline:
+            old = baseline.get("endpoints", {}).get(name, {}).get("p95_ms")
+            line += f" {((r['p95_ms'] - old) / old):>+12.1%}" if old else f" {'-':>12}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--mongo-url", default=os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017"))
+    mode.add_argument("--in-process", action="store_true", help="use mongomock-motor instead of a mongod")
+    parser.add_argument("--size", choices=sorted(SIZES), default="small")
+    for name in ("promotions", "brands", "content", "logs"):
+        parser.add_argument(f"--{name}", type=int, help=f"override the number of {name} fixtures")
+    parser.add_argument("--scenario", choices=["public", "admin", "search", "mixed"], default="mixed")
+    parser.add_argument("--profile", choices=["full", "public", "admin"], default="full", help="APP_PROFILE of the server")
+    parser.add_argument("--workers", type=int, default=1, help="run the server through launcher.py with N workers")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before recording")
+    parser.add_argument("--accept-encoding", help='e.g. "br, gzip" to include response compression')
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression vs the baseline")
+    parser.add_argument("--output", type=Path, help="also write the results JSON here")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.chdir(BACKEND_DIR)
+    from dotenv import load_dotenv
+    load_dotenv(BACKEND_DIR / ".env")
+
+    sizes = dict(SIZES[args.size])
+    for name in sizes:
+        if getattr(args, name) is not None:
+            sizes[name] = getattr(args, name)
+    endpoints = {
+        "public": PUBLIC_ENDPOINTS,
+        "admin": ADMIN_ENDPOINTS + SEARCH_ENDPOINTS,
+        "search": SEARCH_ENDPOINTS,
+        "mixed": PUBLIC_ENDPOINTS + ADMIN_ENDPOINTS + SEARCH_ENDPOINTS,
+    }[args.scenario]
+    if args.profile == "public":
+        endpoints = [e for e in endpoints if not e.auth]
+    if args.in_process:
+        endpoints = [e for e in endpoints if e.name not in TEXT_SEARCH_ENDPOINTS]
+
+    runner = run_in_process if args.in_process else run_subprocess
+    results = asyncio.run(runner(args, sizes, endpoints))
+
+    report = {
+        "meta": {
+            "date": datetime.utcnow().isoformat(),
+            "mode": "in-process" if args.in_process else "mongod",
+            "scenario": args.scenario,
+            "profile": args.profile,
+            "workers": args.workers,
+            "sizes": sizes,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "accept_encoding": args.accept_encoding,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "endpoints": results,
+    }
+
+    baseline = None
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text())
+    print_table(results, baseline)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if baseline:
+        mismatched = [k for k in ("mode", "scenario", "profile", "workers", "sizes", "concurrency") if baseline["meta"].get(k) != report["meta"][k]]
+        if mismatched:
+            print(f"\nWarning: baseline was recorded with different {', '.join(mismatched)}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
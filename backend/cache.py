@@ -0,0 +1,74 @@
+import functools
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+# Configuration
+PUBLIC_CACHE_TTL = float(os.environ.get("PUBLIC_CACHE_TTL", "30"))
+PUBLIC_CACHE_ENTRIES = int(os.environ.get("PUBLIC_CACHE_ENTRIES", "512"))
+
+
+class TTLCache:
+    """Small LRU cache whose entries expire after `ttl` seconds.
+
+    Used by the public app, where admin writes happen in another process and
+    cannot invalidate it: a short TTL bounds how stale storefront data gets.
+    """
+
+    def __init__(self, ttl: float = PUBLIC_CACHE_TTL, max_entries: int = PUBLIC_CACHE_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = False
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+public_cache = TTLCache()
+
+
+def cached(cache: TTLCache = public_cache):
+    """Cache an async endpoint's return value per arguments while `cache.enabled`"""
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not cache.enabled:
+                return await func(*args, **kwargs)
+            key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+            value = cache.get(key)
+            if value is None:
+                value = await func(*args, **kwargs)
+                cache.put(key, value)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,187 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("DB_BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("DB_BREAKER_RESET_SECONDS", "10"))
+FALLBACK_DIR = Path(os.environ.get("PUBLIC_FALLBACK_DIR", "fallback_cache"))
+FALLBACK_PERSIST_INTERVAL = float(os.environ.get("PUBLIC_FALLBACK_PERSIST_INTERVAL", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """Classic closed/open/half-open breaker.
+
+    After `failure_threshold` consecutive failures it opens and rejects calls
+    for `reset_timeout` seconds; then a single probe call is let through and
+    its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"Circuit '{self.name}' closed")
+        self.state = CLOSED
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.trips += 1
+                logger.warning(f"Circuit '{self.name}' opened after {self.failures} failures")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class LastGoodStore:
+    """Last successful response per key, in memory and (throttled) on disk.
+
+    The disk copy lets a freshly started worker serve the storefront while
+    the database is already down.
+    """
+
+    def __init__(self, directory: Path = FALLBACK_DIR, persist_interval: float = FALLBACK_PERSIST_INTERVAL):
+        self.directory = directory
+        self.persist_interval = persist_interval
+        self._memory: Dict[str, Tuple[float, Any, Any]] = {}  # key -> (stored_at epoch, JSON content, raw result)
+        self._persisted_at: Dict[str, float] = {}
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+
+    def _write(self, key: str, stored_at: float, content: Any):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_name(path.name + ".partial")
+        tmp_path.write_text(json.dumps({"key": key, "stored_at": stored_at, "content": content}))
+        os.replace(tmp_path, path)
+
+    async def put(self, key: str, result: Any):
+        """Remember an endpoint's return value as its last good response.
+
+        Cached endpoints hand back the same object until it is fetched again,
+        so an identical object is skipped instead of being re-encoded.
+        """
+        entry = self._memory.get(key)
+        if entry is not None and entry[2] is result:
+            return
+        content = jsonable_encoder(result)
+        now = time.time()
+        self._memory[key] = (now, content, result)
+        if now - self._persisted_at.get(key, 0) >= self.persist_interval:
+            self._persisted_at[key] = now
+            try:
+                await asyncio.to_thread(self._write, key, now, content)
+            except OSError as e:
+                logger.error(f"Error persisting fallback for {key}: {str(e)}")
+
+    def get(self, key: str) -> Optional[Tuple[float, Any, str]]:
+        """(stored_at, content, source) of the last good response, if any"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            return entry[0], entry[1], "memory"
+        try:
+            data = json.loads(self._path(key).read_text())
+        except (OSError, ValueError):
+            return None
+        self._memory[key] = (data["stored_at"], data["content"], None)
+        return data["stored_at"], data["content"], "disk"
+
+
+public_db_breaker = CircuitBreaker("public-db")
+public_last_good = LastGoodStore()
+
+
+def _stale_response(key: str, store: LastGoodStore, reason: str) -> JSONResponse:
+    entry = store.get(key)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service temporarily unavailable",
+            headers={"Retry-After": str(int(BREAKER_RESET_SECONDS))},
+        )
+    stored_at, content, source = entry
+    age = max(int(time.time() - stored_at), 0)
+    return JSONResponse(
+        content=content,
+        headers={
+            "Warning": '110 - "Response is Stale"',
+            "Age": str(age),
+            "X-Stale-Reason": reason,
+            "X-Stale-Source": source,
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+def stale_fallback(breaker: CircuitBreaker = public_db_breaker, store: LastGoodStore = public_last_good):
+    """Guard a read endpoint with `breaker`; serve its last good response when the DB fails"""
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = f"{func.__qualname__}:{json.dumps(kwargs, sort_keys=True, default=str)}"
+            if not breaker.allow():
+                return _stale_response(key, store, "circuit-open")
+            try:
+                result = await func(*args, **kwargs)
+            except (PyMongoError, asyncio.TimeoutError) as e:
+                breaker.record_failure()
+                logger.warning(f"Serving stale {func.__name__}: {str(e)}")
+                return _stale_response(key, store, "database-error")
+            except BaseException:
+                # Not a database failure (e.g. 404); release a half-open probe slot
+                breaker.probing = False
+                raise
+            breaker.record_success()
+            await store.put(key, result)
+            return result
+        return wrapper
+    return decorator
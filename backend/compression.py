@@ -0,0 +1,251 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Configuration
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "500"))
+GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_CACHE_ENTRIES = int(os.environ.get("COMPRESSION_CACHE_ENTRIES", "256"))
+COMPRESSION_CACHE_MAX_BYTES = int(os.environ.get("COMPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Suffix used for precompressed siblings of static files
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def available_encodings() -> List[str]:
+    """Encodings this process can produce, in order of preference"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    """Whether a media type benefits from compression (images/zips are already compressed)"""
+    if not content_type:
+        return False
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+
+def negotiate_encoding(accept_encoding: str, encodings: Optional[List[str]] = None) -> Optional[str]:
+    """Pick the preferred encoding accepted by the client, honouring q-values"""
+    if not accept_encoding:
+        return None
+    encodings = encodings if encodings is not None else available_encodings()
+
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """Compress a body with the given content-coding"""
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class CompressedBodyCache:
+    """Small thread-safe LRU of compressed bodies keyed by body digest and encoding"""
+
+    def __init__(self, max_entries: int = COMPRESSION_CACHE_ENTRIES, max_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compress(self, body: bytes, encoding: str) -> bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        compressed = compress_bytes(body, encoding)
+        if len(compressed) > self.max_bytes:
+            return compressed
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = compressed
+                self.total_bytes += len(compressed)
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+        return compressed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+compressed_body_cache = CompressedBodyCache()
+
+
+class CompressionMiddleware:
+    """Negotiate gzip/brotli per request for buffered, compressible responses.
+
+    Streaming responses and excluded path prefixes (static mounts that serve
+    precompressed siblings) are passed through untouched.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        exclude_paths: Tuple[str, ...] = ("/uploads",),
+        cache: Optional[CompressedBodyCache] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.exclude_paths = exclude_paths
+        self.cache = cache or compressed_body_cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                # Zero-copy/pathsend extensions and friends go straight through
+                passthrough = True
+                if start_message is not None:
+                    await send(start_message)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or len(body) < self.minimum_size
+                or not is_compressible(headers.get("content-type"))
+            ):
+                # Streaming or not worth compressing: forward as-is
+                passthrough = True
+                if is_compressible(headers.get("content-type")):
+                    headers.add_vary_header("Accept-Encoding")
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = self.cache.get_or_compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag:
+                # Strong validators must differ per representation
+                headers["ETag"] = etag.rstrip('"') + f'-{encoding}"'
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def precompress_file(path: Path) -> List[Path]:
+    """Write .br/.gz siblings for a compressible static file.
+
+    Called when files are written (uploads, backups) so the static mount can
+    serve them without compressing per request. Siblings that would not be
+    smaller than the original are skipped.
+    """
+    path = Path(path)
+    content_type, _ = mimetypes.guess_type(path.name)
+    if not is_compressible(content_type):
+        return []
+
+    data = path.read_bytes()
+    if len(data) < COMPRESSION_MIN_SIZE:
+        return []
+
+    written = []
+    for encoding in available_encodings():
+        sibling = path.with_name(path.name + ENCODING_SUFFIXES[encoding])
+        compressed = compress_bytes(data, encoding)
+        if len(compressed) >= len(data):
+            continue
+        tmp_path = sibling.with_name(sibling.name + ".tmp")
+        tmp_path.write_bytes(compressed)
+        os.replace(tmp_path, sibling)
+        # Keep mtimes aligned so validators follow the original file
+        stat = path.stat()
+        os.utime(sibling, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        written.append(sibling)
+    return written
+
+
+def remove_precompressed(path: Path):
+    """Remove any precompressed siblings of a deleted static file"""
+    path = Path(path)
+    for suffix in ENCODING_SUFFIXES.values():
+        sibling = path.with_name(path.name + suffix)
+        try:
+            sibling.unlink()
+        except FileNotFoundError:
+            pass
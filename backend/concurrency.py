@@ -0,0 +1,63 @@
+"""Optimistic concurrency for admin edits.
+
+Editable documents carry a `version` counter that every write increments.
+Clients send the version they edited as `If-Match` (the value of the ETag
+they read); the write's filter includes that version, so a concurrent edit
+makes it match nothing and the request fails with 412 instead of silently
+overwriting the other change. Without `If-Match` writes are unconditional,
+as before.
+"""
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from fastapi import HTTPException, status
+
+from compression import ENCODING_SUFFIXES
+
+
+def etag(document: Dict[str, Any]) -> str:
+    return f'"{document.get("version", 0)}"'
+
+
+def _version(tag: str) -> Optional[int]:
+    tag = tag.strip().removeprefix("W/").strip('"')
+    # CompressionMiddleware tags encoded representations as "<version>-<encoding>"
+    for encoding in ENCODING_SUFFIXES:
+        tag = tag.removesuffix(f"-{encoding}")
+    try:
+        return int(tag)
+    except ValueError:
+        return None
+
+
+def parse_if_match(header: Optional[str]) -> Optional[FrozenSet[int]]:
+    """Versions named by an If-Match header (None when absent or `*`); any of them may match"""
+    if header is None:
+        return None
+    if header.strip() == "*":
+        return None
+    versions = frozenset(v for v in map(_version, header.split(",")) if v is not None)
+    if not versions:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid If-Match header")
+    return versions
+
+
+def version_filter(expected: Optional[FrozenSet[int]]) -> Dict[str, Any]:
+    """Filter clause pinning the document version (documents written before versioning count as 0)"""
+    if expected is None:
+        return {}
+    versions: List[Optional[int]] = sorted(expected)
+    if 0 in expected:
+        versions.append(None)
+    return {"version": {"$in": versions}}
+
+
+def is_stale(current: Dict[str, Any], expected: Optional[FrozenSet[int]]) -> bool:
+    return expected is not None and current.get("version", 0) not in expected
+
+
+def precondition_failed(current: Dict[str, Any]) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="The resource was modified by someone else; reload and retry",
+        headers={"ETag": etag(current)},
+    )
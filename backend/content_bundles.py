@@ -0,0 +1,343 @@
+"""Draft/publish for the site content.
+
+site_config is the draft area: admin edits change it but do not reach the
+storefront. Publishing records the draft as a content revision and compiles
+it into one immutable bundle (content_bundles) holding the ready-to-send JSON
+of every public content response; then a single conditional write moves the
+`content_pointer` document to the new bundle. Readers see the old bundle or
+the new one, never a mix, and the bundle id doubles as the ETag, so caches
+turn over once per publish instead of once per edit.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from circuit_breaker import BREAKER_RESET_SECONDS, FALLBACK_DIR, public_db_breaker
+from content_revisions import (
+    CONTENT_REFRESH_SECONDS,
+    REVISIONS_COLLECTION,
+    Content,
+    RevisionConflict,
+    content_from_site_config,
+    diff_content,
+    ensure_history,
+    latest_revision,
+    load_content,
+    record_revision,
+)
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+BUNDLES_COLLECTION = "content_bundles"
+POINTER_COLLECTION = "content_pointer"
+POINTER_ID = "published"
+KEEP_BUNDLES = int(os.environ.get("CONTENT_KEEP_BUNDLES", "20"))
+# A revision this old that never went live belongs to a publish that died mid-way
+PUBLISH_STALE_SECONDS = float(os.environ.get("CONTENT_PUBLISH_STALE_SECONDS", "60"))
+BUNDLE_FALLBACK_PATH = FALLBACK_DIR / "content_bundle.json"
+SITE_INFO_SECTIONS = ("header", "general")
+
+
+class PublishConflict(Exception):
+    """Another publish moved the pointer first"""
+
+
+def _encode(value: Any) -> str:
+    return json.dumps(jsonable_encoder(value), ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def compile_bundle(content: Content, revision: int, username: Optional[str]) -> Dict[str, Any]:
+    """Bundle document with every public content response pre-encoded"""
+    published_at = datetime.utcnow()
+    site_info: Dict[str, Any] = {}
+    for section in SITE_INFO_SECTIONS:
+        site_info.update(content.get(section, {}))
+    site_info["last_updated"] = published_at
+    return {
+        "_id": uuid.uuid4().hex,
+        "revision": revision,
+        "created_at": published_at,
+        "created_by": username,
+        "all": _encode(content),
+        # [name, json] pairs: section names never need escaping as field names
+        "sections": [[section, _encode(keys)] for section, keys in content.items()],
+        "site_info": _encode(site_info),
+    }
+
+
+async def get_pointer(db) -> Optional[Dict[str, Any]]:
+    return await db[POINTER_COLLECTION].find_one({"_id": POINTER_ID})
+
+
+async def _swap_pointer(db, previous: Optional[Dict[str, Any]], bundle: Dict[str, Any]):
+    """Point the storefront at `bundle`, unless someone else published since `previous` was read"""
+    fields = {
+        "bundle_id": bundle["_id"],
+        "revision": bundle["revision"],
+        "published_at": bundle["created_at"],
+        "published_by": bundle["created_by"],
+    }
+    if previous is None:
+        try:
+            await db[POINTER_COLLECTION].insert_one({"_id": POINTER_ID, **fields})
+        except DuplicateKeyError:
+            raise PublishConflict("Content was published concurrently")
+        return
+    result = await db[POINTER_COLLECTION].update_one(
+        {"_id": POINTER_ID, "bundle_id": previous["bundle_id"]}, {"$set": fields}
+    )
+    if result.matched_count == 0:
+        raise PublishConflict("Content was published concurrently")
+
+
+async def _prune_bundles(db, keep: int = KEEP_BUNDLES):
+    """Drop old bundles; the revision history can rebuild any of them"""
+    old = db[BUNDLES_COLLECTION].find({}, {"_id": 1}).sort("created_at", -1).skip(keep)
+    ids = [doc["_id"] async for doc in old]
+    if ids:
+        await db[BUNDLES_COLLECTION].delete_many({"_id": {"$in": ids}})
+
+
+async def _published_content(db, pointer: Optional[Dict[str, Any]]) -> Tuple[int, Content]:
+    """(revision, content) the storefront serves; history after the pointer is not live"""
+    await ensure_history(db)
+    return await load_content(db, pointer["revision"] if pointer else None)
+
+
+async def draft_changes(db) -> Tuple[List[List[Any]], List[List[str]]]:
+    """Delta between the published content and the draft"""
+    _, published = await _published_content(db, await get_pointer(db))
+    draft = await content_from_site_config(db)
+    return diff_content(published, draft)
+
+
+async def _drop_abandoned_revision(db, pointer: Optional[Dict[str, Any]], revision: int) -> bool:
+    """Remove `revision` if a publish recorded it, then died before swapping the pointer"""
+    doc = await db[REVISIONS_COLLECTION].find_one({"revision": revision}, {"created_at": 1})
+    if doc is None or doc["created_at"] > datetime.utcnow() - timedelta(seconds=PUBLISH_STALE_SECONDS):
+        return False
+    current = await get_pointer(db)
+    if (current or {}).get("bundle_id") != (pointer or {}).get("bundle_id"):
+        return False
+    await db[REVISIONS_COLLECTION].delete_one({"_id": doc["_id"]})
+    logger.warning(f"Dropped content revision {revision} of an abandoned publish")
+    return True
+
+
+async def _discard_unpublished(db, bundle_id: str, revision: Optional[int]):
+    """Undo a publish that lost the pointer swap, so history only holds live revisions"""
+    try:
+        await db[BUNDLES_COLLECTION].delete_one({"_id": bundle_id})
+        if revision is not None:
+            await db[REVISIONS_COLLECTION].delete_one({"revision": revision})
+    except PyMongoError as e:
+        logger.error(f"Error discarding unpublished content revision {revision}: {str(e)}")
+
+
+async def publish(
+    db,
+    username: Optional[str],
+    expected_revision: Optional[int] = None,
+    action: str = "publish",
+    **details: Any,
+) -> Dict[str, Any]:
+    """Record the draft as a revision and make it live in one pointer swap.
+
+    The new revision is always the one right after the published revision,
+    so of two concurrent publishes only one can record it: the other gets
+    PublishConflict before writing anything.
+    """
+    pointer = await get_pointer(db)
+    if expected_revision is not None and (pointer or {}).get("revision") != expected_revision:
+        raise PublishConflict("Content was published since it was reviewed")
+    base_revision, published = await _published_content(db, pointer)
+    draft = await content_from_site_config(db)
+    set_entries, unset_entries = diff_content(published, draft)
+    if pointer is not None and not set_entries and not unset_entries:
+        return {"revision": base_revision, "bundle_id": pointer["bundle_id"], "set": 0, "unset": 0, "published": False}
+
+    try:
+        revision = await record_revision(db, draft, username, action, base_revision=base_revision, **details)
+    except RevisionConflict:
+        if not await _drop_abandoned_revision(db, pointer, base_revision + 1):
+            raise PublishConflict("Content was published concurrently")
+        revision = await record_revision(db, draft, username, action, base_revision=base_revision, **details)
+    if revision is None:
+        # Nothing changed since the history import: its revision goes live as is
+        revision = base_revision
+    bundle = compile_bundle(draft, revision, username)
+    try:
+        await db[BUNDLES_COLLECTION].insert_one(bundle)
+        await _swap_pointer(db, pointer, bundle)
+    except (PublishConflict, PyMongoError):
+        await _discard_unpublished(db, bundle["_id"], revision if revision != base_revision else None)
+        raise
+    published_bundle.invalidate()
+    try:
+        await _prune_bundles(db)
+    except PyMongoError as e:
+        logger.error(f"Error pruning content bundles: {str(e)}")
+    logger.info(f"Published content revision {revision} as bundle {bundle['_id']}")
+    return {
+        "revision": revision,
+        "bundle_id": bundle["_id"],
+        "set": len(set_entries),
+        "unset": len(unset_entries),
+        "published": True,
+    }
+
+
+async def _write_draft(db, set_entries, unset_entries):
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"section": section, "key": key},
+            {
+                "$set": {"value": value, "updated_at": now},
+                "$inc": {"version": 1},
+                "$setOnInsert": {"id": str(uuid.uuid4())},
+            },
+            upsert=True,
+        )
+        for section, key, value in set_entries
+    ] + [DeleteOne({"section": section, "key": key}) for section, key in unset_entries]
+    if operations:
+        await db.site_config.bulk_write(operations, ordered=False)
+
+
+async def discard_draft(db) -> Dict[str, int]:
+    """Reset the draft to the published content"""
+    _, published = await _published_content(db, await get_pointer(db))
+    draft = await content_from_site_config(db)
+    set_entries, unset_entries = diff_content(draft, published)
+    await _write_draft(db, set_entries, unset_entries)
+    return {"set": len(set_entries), "unset": len(unset_entries)}
+
+
+async def rollback(db, revision: int, username: str) -> Dict[str, Any]:
+    """Publish the content of `revision` again (pending draft edits are replaced)"""
+    await ensure_history(db)
+    if not 1 <= revision <= await latest_revision(db):
+        raise ValueError(f"Unknown revision {revision}")
+    _, target = await load_content(db, revision)
+    draft = await content_from_site_config(db)
+    await _write_draft(db, *diff_content(draft, target))
+    result = await publish(db, username, action="rollback", rollback_of=revision)
+    return {"rolled_back_to": revision, **result}
+
+
+async def ensure_published(db):
+    """Publish the current content once, so the storefront has a bundle to serve"""
+    if await get_pointer(db) is not None:
+        return
+    try:
+        await publish(db, None, action="initial_publish")
+    except PublishConflict:
+        pass  # another worker got there first
+
+
+class LoadedBundle:
+    __slots__ = ("id", "revision", "published_at", "all", "sections", "site_info", "etag")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.id = doc["_id"]
+        self.revision = doc["revision"]
+        self.published_at = doc["created_at"]
+        self.all = doc["all"].encode("utf-8")
+        self.sections = {name: payload.encode("utf-8") for name, payload in doc["sections"]}
+        self.site_info = doc["site_info"].encode("utf-8")
+        self.etag = f'"{self.id}"'
+
+    def section(self, name: str) -> bytes:
+        return self.sections.get(name, b"{}")
+
+
+class PublishedBundle:
+    """Process-local reference to the live bundle.
+
+    At most every CONTENT_REFRESH_SECONDS it reads the pointer (one _id
+    lookup) and loads the bundle only when the pointer moved. Swapping the
+    reference is atomic, so a request sees one bundle from start to finish.
+    While the database is unreachable (or public_db_breaker is open) the
+    current bundle keeps being served; a worker that never loaded one falls
+    back to the copy on disk.
+    """
+
+    def __init__(self, refresh_seconds: float = CONTENT_REFRESH_SECONDS, fallback_path=BUNDLE_FALLBACK_PATH):
+        self.refresh_seconds = refresh_seconds
+        self.fallback_path = fallback_path
+        self.bundle: Optional[LoadedBundle] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    async def get(self, db) -> LoadedBundle:
+        bundle = self.bundle
+        if bundle is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return bundle
+        async with self._lock:
+            if self.bundle is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+                return self.bundle
+            if public_db_breaker.allow():
+                try:
+                    await self._refresh(db)
+                    public_db_breaker.record_success()
+                except PyMongoError as e:
+                    public_db_breaker.record_failure()
+                    logger.warning(f"Serving the current content bundle; refresh failed: {str(e)}")
+            if self.bundle is None:
+                self.bundle = await asyncio.to_thread(self._read_fallback)
+                if self.bundle is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Service temporarily unavailable",
+                        headers={"Retry-After": str(int(BREAKER_RESET_SECONDS))},
+                    )
+            self._checked_at = time.monotonic()
+        return self.bundle
+
+    async def _refresh(self, db):
+        pointer = await get_pointer(db)
+        if pointer is None:
+            # Nothing published yet: serve the draft as it is, without storing it
+            doc = compile_bundle(await content_from_site_config(db), 0, None)
+            doc["_id"] = "unpublished"
+        elif self.bundle is not None and pointer["bundle_id"] == self.bundle.id:
+            return
+        else:
+            doc = await db[BUNDLES_COLLECTION].find_one({"_id": pointer["bundle_id"]})
+            if doc is None:
+                raise PyMongoError(f"Content bundle {pointer['bundle_id']} is missing")
+            await asyncio.to_thread(self._write_fallback, doc)
+        self.bundle = LoadedBundle(doc)
+
+    def _write_fallback(self, doc: Dict[str, Any]):
+        try:
+            self.fallback_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.fallback_path.with_name(self.fallback_path.name + ".partial")
+            tmp_path.write_text(json.dumps(jsonable_encoder(doc)))
+            os.replace(tmp_path, self.fallback_path)
+        except OSError as e:
+            logger.error(f"Error persisting content bundle: {str(e)}")
+
+    def _read_fallback(self) -> Optional[LoadedBundle]:
+        try:
+            return LoadedBundle(json.loads(self.fallback_path.read_text()))
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+published_bundle = PublishedBundle()
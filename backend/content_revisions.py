@@ -0,0 +1,178 @@
+"""Append-only revision history for the site content (site_config values).
+
+Every content change records a revision holding only the keys it set or
+removed. Every CONTENT_CHECKPOINT_EVERY-th revision additionally stores the
+full content, so any revision is rebuilt from one checkpoint plus at most
+N-1 deltas. Entries are stored as [section, key, value] lists rather than
+nested documents, so key names never need escaping.
+
+Revisions are recorded when content is published (see content_bundles);
+a rollback publishes an old revision's content again as a new revision, so
+history is never rewritten.
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+CONTENT_CHECKPOINT_EVERY = int(os.environ.get("CONTENT_CHECKPOINT_EVERY", "20"))
+CONTENT_REFRESH_SECONDS = float(os.environ.get("CONTENT_REFRESH_SECONDS", "2"))
+REVISIONS_COLLECTION = "content_revisions"
+MAX_APPEND_ATTEMPTS = 5
+
+Content = Dict[str, Dict[str, Any]]
+_MISSING = object()
+SetEntry = Sequence[Any]  # [section, key, value]
+UnsetEntry = Sequence[str]  # [section, key]
+
+
+def apply_changes(content: Content, set_entries: Iterable[SetEntry], unset_entries: Iterable[UnsetEntry]) -> Content:
+    """Apply a delta to `content` in place"""
+    for section, key, value in set_entries:
+        content.setdefault(section, {})[key] = value
+    for section, key in unset_entries:
+        keys = content.get(section)
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del content[section]
+    return content
+
+
+def diff_content(old: Content, new: Content) -> Tuple[List[List[Any]], List[List[str]]]:
+    """Delta turning `old` into `new`"""
+    set_entries = [
+        [section, key, value]
+        for section, keys in new.items()
+        for key, value in keys.items()
+        if old.get(section, {}).get(key, _MISSING) != value
+    ]
+    unset_entries = [
+        [section, key]
+        for section, keys in old.items()
+        for key in keys
+        if key not in new.get(section, {})
+    ]
+    return set_entries, unset_entries
+
+
+def _entries(content: Content) -> List[List[Any]]:
+    return [[section, key, value] for section, keys in content.items() for key, value in keys.items()]
+
+
+async def latest_revision(db) -> int:
+    doc = await db[REVISIONS_COLLECTION].find_one({}, {"_id": 0, "revision": 1}, sort=[("revision", -1)])
+    return doc["revision"] if doc else 0
+
+
+async def load_content(db, revision: Optional[int] = None) -> Tuple[int, Content]:
+    """(revision, content) at `revision` (default: the latest)"""
+    collection = db[REVISIONS_COLLECTION]
+    target = revision if revision is not None else await latest_revision(db)
+    checkpoint = await collection.find_one(
+        {"kind": "checkpoint", "revision": {"$lte": target}}, sort=[("revision", -1)]
+    )
+    if checkpoint is None:
+        return target, {}
+    content = apply_changes({}, checkpoint["content"], [])
+    deltas = collection.find(
+        {"revision": {"$gt": checkpoint["revision"], "$lte": target}},
+        {"_id": 0, "set": 1, "unset": 1},
+    ).sort("revision", 1)
+    async for delta in deltas:
+        apply_changes(content, delta["set"], delta["unset"])
+    return target, content
+
+
+async def content_from_site_config(db) -> Content:
+    content: Content = {}
+    async for config in db.site_config.find({}, {"_id": 0, "section": 1, "key": 1, "value": 1}):
+        content.setdefault(config["section"], {})[config["key"]] = config.get("value")
+    return content
+
+
+async def ensure_history(db):
+    """Import the current site_config as revision 1 if there is no history yet"""
+    if await latest_revision(db):
+        return
+    content = await content_from_site_config(db)
+    entries = _entries(content)
+    try:
+        await db[REVISIONS_COLLECTION].insert_one({
+            "revision": 1,
+            "kind": "checkpoint",
+            "created_at": datetime.utcnow(),
+            "username": None,
+            "action": "initial_import",
+            "changed": len(entries),
+            "set": entries,
+            "unset": [],
+            "content": entries,
+        })
+        logger.info(f"Content history started with {len(entries)} keys")
+    except DuplicateKeyError:
+        pass  # another worker got there first
+
+
+class RevisionConflict(Exception):
+    """Another writer recorded the revision first"""
+
+
+async def record_revision(
+    db,
+    content: Content,
+    username: Optional[str],
+    action: str,
+    base_revision: Optional[int] = None,
+    **details: Any,
+) -> Optional[int]:
+    """Append the revision that turns the stored content into `content`; returns its number.
+
+    The delta is computed against the revision it is appended to. With
+    `base_revision` only the number after it is taken (RevisionConflict if
+    another writer has it); otherwise a lost race recomputes the delta
+    against the new latest revision. None when nothing changed.
+    """
+    await ensure_history(db)
+    collection = db[REVISIONS_COLLECTION]
+    for _ in range(MAX_APPEND_ATTEMPTS):
+        previous, stored = await load_content(db, base_revision)
+        set_entries, unset_entries = diff_content(stored, content)
+        if not set_entries and not unset_entries:
+            return None
+        revision = previous + 1
+        doc = {
+            "revision": revision,
+            "kind": "delta",
+            "created_at": datetime.utcnow(),
+            "username": username,
+            "action": action,
+            "changed": len(set_entries) + len(unset_entries),
+            "set": set_entries,
+            "unset": unset_entries,
+            **details,
+        }
+        if revision % CONTENT_CHECKPOINT_EVERY == 0:
+            doc["kind"] = "checkpoint"
+            doc["content"] = _entries(content)
+        try:
+            await collection.insert_one(doc)
+        except DuplicateKeyError:
+            if base_revision is not None:
+                raise RevisionConflict(f"Content revision {revision} was recorded concurrently")
+            continue  # a concurrent writer took this number: diff against it
+        return revision
+    raise RevisionConflict(f"Could not record content revision for {action} after {MAX_APPEND_ATTEMPTS} attempts")
+
+
+async def list_revisions(db, limit: int = 50, before: Optional[int] = None) -> List[Dict[str, Any]]:
+    query = {"revision": {"$lt": before}} if before else {}
+    cursor = db[REVISIONS_COLLECTION].find(
+        query, {"_id": 0, "set": 0, "unset": 0, "content": 0}
+    ).sort("revision", -1).limit(limit)
+    return await cursor.to_list(length=limit)
@@ -0,0 +1,319 @@
+import asyncio
+import calendar
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from pymongo import ReturnDocument
+
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "scheduler_jobs"
+MAX_IDLE_SECONDS = 30  # wake up at least this often to notice leadership changes
+
+ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+
+def _parse_field(spec: str, low: int, high: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in spec.split(","):
+        part, _, step_spec = part.partition("/")
+        step = int(step_spec) if step_spec else 1
+        if step < 1:
+            raise ValueError(f"Invalid step in cron field: {spec}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_spec, end_spec = part.split("-", 1)
+            start, end = int(start_spec), int(end_spec)
+        else:
+            start = int(part)
+            end = high if step_spec else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron field out of range ({low}-{high}): {spec}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronExpression:
+    """Standard five-field cron expression (minute hour day-of-month month day-of-week), UTC.
+
+    Supports `*`, ranges, steps, lists and the @hourly/@daily/... aliases. As
+    in cron, when both day fields are restricted a day matching either runs.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression}")
+        minute, hour, dom, month, dow = fields
+        self.minutes = _parse_field(minute, 0, 59)
+        self.hours = _parse_field(hour, 0, 23)
+        self.days = _parse_field(dom, 1, 31)
+        self.months = _parse_field(month, 1, 12)
+        # 0 and 7 are both Sunday
+        self.weekdays = {d % 7 for d in _parse_field(dow, 0, 7)}
+        self.dom_restricted = dom != "*"
+        self.dow_restricted = dow != "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        in_dom = moment.day in self.days
+        in_dow = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.dom_restricted and self.dow_restricted:
+            return in_dom or in_dow
+        if self.dom_restricted:
+            return in_dom
+        if self.dow_restricted:
+            return in_dow
+        return True
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after `moment`"""
+        t = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                days_left = calendar.monthrange(t.year, t.month)[1] - t.day + 1
+                t = (t + timedelta(days=days_left)).replace(hour=0, minute=0)
+                continue
+            if not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+                continue
+            if t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+                continue
+            return t
+        raise ValueError(f"Cron expression never fires: {self.expression}")
+
+    def count_between(self, start: datetime, end: datetime, cap: int = 1000) -> int:
+        """Number of fire times in (start, end], capped"""
+        count = 0
+        t = start
+        while count < cap:
+            t = self.next_after(t)
+            if t > end:
+                break
+            count += 1
+        return count
+
+
+class CronJob:
+    def __init__(self, name: str, expression: str, func: Callable[[], Awaitable[Any]], catch_up: bool = True, max_runtime: int = 3600):
+        self.name = name
+        self.schedule = CronExpression(expression)
+        self.func = func
+        self.catch_up = catch_up
+        self.max_runtime = max_runtime  # seconds before a "running" flag is considered stale
+        self.next_run_at: Optional[datetime] = None
+        # Timing instrumentation (this process)
+        self.runs = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms: Optional[float] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_ms": self.last_ms,
+            "avg_ms": round(self.total_ms / self.runs, 2) if self.runs else None,
+            "max_ms": self.max_ms,
+        }
+
+
+class CronScheduler:
+    """Runs registered cron jobs with state persisted in Mongo.
+
+    - last/next run times live in `scheduler_jobs`, so a restart knows what it
+      missed and runs each overdue job once (coalesced catch-up)
+    - a job is claimed with a conditional update before running, so it never
+      overlaps with itself, not even across a leadership handover
+    - when an `election` is given, only its leader runs jobs
+    """
+
+    def __init__(self, db, election=None):
+        self.db = db
+        self.election = election
+        self.jobs: Dict[str, CronJob] = {}
+        self.running = False
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+
+    def register(self, name: str, expression: str, func: Callable[[], Awaitable[Any]], **kwargs) -> CronJob:
+        job = CronJob(name, expression, func, **kwargs)
+        self.jobs[name] = job
+        return job
+
+    @property
+    def _collection(self):
+        return self.db[JOBS_COLLECTION]
+
+    async def _load_state(self):
+        now = datetime.utcnow()
+        for job in self.jobs.values():
+            state = await self._collection.find_one({"_id": job.name})
+            scheduled = state.get("next_run_at") if state else None
+            if state and state.get("schedule") != job.schedule.expression:
+                # Schedule changed: recompute from the last run
+                scheduled = job.schedule.next_after(state.get("last_run_at") or now)
+            if scheduled is None:
+                scheduled = job.schedule.next_after(now)
+            if scheduled <= now:
+                missed = job.schedule.count_between(scheduled - timedelta(minutes=1), now)
+                if job.catch_up:
+                    logger.info(f"Job {job.name} missed {missed} run(s) since {scheduled}; catching up once")
+                else:
+                    logger.info(f"Job {job.name} missed {missed} run(s); skipping to next schedule")
+                    scheduled = job.schedule.next_after(now)
+            job.next_run_at = scheduled
+            # Insert-only: the leader owns the persisted schedule, a follower must not rewind it
+            await self._collection.update_one(
+                {"_id": job.name},
+                {"$setOnInsert": {"schedule": job.schedule.expression, "next_run_at": scheduled}},
+                upsert=True
+            )
+
+    async def _claim(self, job: CronJob, scheduled_for: datetime, now: datetime) -> bool:
+        """Mark the job running for `scheduled_for`, unless it already is or that slot already ran.
+
+        After a run the persisted next_run_at moves past the slot, so a deposed
+        leader acting on a stale in-memory schedule cannot run it a second time.
+        """
+        stale_before = now - timedelta(seconds=job.max_runtime)
+        claimed = await self._collection.find_one_and_update(
+            {
+                "_id": job.name,
+                "next_run_at": {"$not": {"$gt": scheduled_for}},
+                "$or": [{"running": {"$ne": True}}, {"running_since": {"$lt": stale_before}}],
+            },
+            {"$set": {"running": True, "running_since": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        return claimed is not None
+
+    async def _resync(self, job: CronJob):
+        """Catch up with a slot another worker already ran"""
+        state = await self._collection.find_one({"_id": job.name})
+        persisted = state.get("next_run_at") if state else None
+        if persisted is not None and persisted > job.next_run_at:
+            # First fire time of our schedule at or after the persisted one
+            job.next_run_at = job.schedule.next_after(persisted - timedelta(minutes=1))
+            logger.info(f"Job {job.name} already ran elsewhere; next run at {job.next_run_at}")
+        else:
+            logger.warning(f"Job {job.name} is still running elsewhere; skipping this tick")
+
+    async def _execute(self, job: CronJob, scheduled_for: datetime):
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        status, error = "ok", None
+        try:
+            with tracer.span(f"cron {job.name}", attributes={"cron.scheduled_for": scheduled_for.isoformat()}, parent=None):
+                await job.func()
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except Exception as e:
+            status, error = "error", str(e)
+            job.failures += 1
+            logger.error(f"Job {job.name} failed: {str(e)}")
+        finally:
+            await self._finish(job, scheduled_for, started_at, started, status, error)
+
+    async def _finish(self, job: CronJob, scheduled_for: datetime, started_at: datetime, started: float, status: str, error: Optional[str]):
+        """Record the outcome and release the claim, whatever ended the run"""
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        job.runs += 1
+        job.total_ms += elapsed_ms
+        job.max_ms = max(job.max_ms, elapsed_ms)
+        job.last_ms = elapsed_ms
+        logger.info(f"Job {job.name} finished in {elapsed_ms} ms ({status})")
+
+        finished_at = datetime.utcnow()
+        fields = {
+            "running": False,
+            "schedule": job.schedule.expression,
+            "last_run_at": started_at,
+            "last_finished_at": finished_at,
+            "last_duration_ms": elapsed_ms,
+            "last_status": status,
+            "last_error": error,
+        }
+        if status != "cancelled":
+            # A cancelled run leaves its slot pending, so the next leader runs it
+            job.next_run_at = job.schedule.next_after(max(finished_at, scheduled_for))
+            fields.update(last_scheduled_for=scheduled_for, next_run_at=job.next_run_at)
+        await self._collection.update_one(
+            {"_id": job.name},
+            {"$set": fields, "$inc": {"runs": 1, "failures": 1 if error else 0}}
+        )
+        self._wakeup.set()
+
+    async def _run_due(self):
+        now = datetime.utcnow()
+        for job in self.jobs.values():
+            if job.next_run_at is None or job.next_run_at > now:
+                continue
+            task = self._tasks.get(job.name)
+            if task is not None and not task.done():
+                continue  # still running locally: never overlap
+            if not await self._claim(job, job.next_run_at, now):
+                await self._resync(job)
+                continue
+            self._tasks[job.name] = asyncio.create_task(self._execute(job, job.next_run_at), name=f"cron:{job.name}")
+
+    async def run(self):
+        self.running = True
+        await self._load_state()
+        while self.running:
+            try:
+                if self.election is None or self.election.is_leader:
+                    await self._run_due()
+                else:
+                    # A follower may become leader later: refresh the persisted schedule then
+                    await self._load_state()
+            except Exception as e:
+                logger.error(f"Error in cron scheduler loop: {str(e)}")
+
+            pending = [j.next_run_at for j in self.jobs.values() if j.next_run_at]
+            delay = MAX_IDLE_SECONDS
+            if pending:
+                delay = min(delay, max((min(pending) - datetime.utcnow()).total_seconds(), 0.5))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+        for task in self._tasks.values():
+            task.cancel()
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": job.name,
+                "schedule": job.schedule.expression,
+                "next_run_at": job.next_run_at,
+                "running": job.name in self._tasks and not self._tasks[job.name].done(),
+                **job.stats(),
+            }
+            for job in self.jobs.values()
+        ]
@@ -0,0 +1,291 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import pymongo
+from pymongo import monitoring
+from pymongo.read_preferences import SecondaryPreferred
+
+# Connection pool configuration (the app's tuned defaults, overridable per environment)
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_MAX_CONNECTING = int(os.environ.get("MONGO_MAX_CONNECTING", "2"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+# Staleness bound for secondary reads (-1: no bound; otherwise at least 90)
+MONGO_MAX_STALENESS_S = int(os.environ.get("MONGO_MAX_STALENESS_S", "-1"))
+
+# Per-route-class query budgets (ms), longest prefix wins; 0 disables
+QUERY_TIMEOUTS_MS = [
+    ("/api/public", int(os.environ.get("MONGO_PUBLIC_TIMEOUT_MS", "2000"))),
+    ("/api/admin/system", int(os.environ.get("MONGO_ADMIN_SYSTEM_TIMEOUT_MS", "30000"))),
+    ("/api/admin", int(os.environ.get("MONGO_ADMIN_TIMEOUT_MS", "10000"))),
+]
+DEFAULT_QUERY_TIMEOUT_MS = int(os.environ.get("MONGO_DEFAULT_TIMEOUT_MS", "5000"))
+# Routes that spend most of their time outside the database (receiving an upload,
+# optimizing images, waiting for a restore): their budget starts at query_budget()
+DEFERRED_BUDGET_PREFIXES = ("/api/admin/upload", "/api/admin/system/backups/restore", "/api/admin/system/snapshots/restore")
+DEFERRED_BUDGET_SUFFIXES = ("/upload-image",)
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# MongoDB connection - injected at startup by the app (or scripts)
+_db = None
+_read_db = None
+
+def set_database(database, read_database=None):
+    """Set database instance for routes and services (and optionally a read-scaled view)"""
+    global _db, _read_db
+    _db = database
+    _read_db = read_database
+
+def get_database():
+    """Get database instance"""
+    if _db is None:
+        raise RuntimeError("Database not initialized. Call set_database() first.")
+    return _db
+
+def get_read_database():
+    """Database for storefront reads: secondary-preferred when configured, else the primary handle"""
+    return _read_db if _read_db is not None else get_database()
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection checkout wait times and pool occupancy.
+
+    Checkout start/finish events fire on the thread doing the checkout, so
+    the start time is kept in a thread-local.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.checked_out = 0
+        self.open_connections = 0
+
+    def _wait_ms(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return (time.perf_counter() - started) * 1000 if started else 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait_ms = self._wait_ms()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            for i, bound in enumerate(WAIT_BUCKETS_MS):
+                if wait_ms <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def connection_check_out_failed(self, event):
+        self._wait_ms()
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = {f"le_{b}ms": n for b, n in zip(WAIT_BUCKETS_MS, self.wait_buckets)}
+            buckets["gt_{}ms".format(WAIT_BUCKETS_MS[-1])] = self.wait_buckets[-1]
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "wait_ms_avg": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else None,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+                "wait_ms_buckets": buckets,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class LazyClient:
+    """Motor client built on first use, once per process.
+
+    PyMongo clients are not fork-safe. The launcher imports the app in the
+    master before forking workers, so the module-level handle must not own a
+    client yet: each worker builds its own the first time it touches the
+    database (a client inherited across fork() is discarded and rebuilt).
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = self._factory()
+                    self._pid = os.getpid()
+        return self._client
+
+    def __getattr__(self, name: str):
+        return getattr(self.get(), name)
+
+    def __getitem__(self, name: str):
+        return LazyDatabase(self, name)
+
+    def get_database(self, name: str, **kwargs):
+        return LazyDatabase(self, name, **kwargs)
+
+    def close(self):
+        if self._client is not None and self._pid == os.getpid():
+            self._client.close()
+        self._client = None
+
+
+class LazyDatabase:
+    """Database handle bound to whichever client the LazyClient holds in this process"""
+
+    def __init__(self, client: LazyClient, name: str, **kwargs):
+        self._lazy_client = client
+        self._name = name
+        self._kwargs = kwargs
+        self._bound: Optional[tuple] = None  # (client, database)
+
+    def resolve(self):
+        client = self._lazy_client.get()
+        bound = self._bound
+        if bound is None or bound[0] is not client:
+            bound = self._bound = (client, client.get_database(self._name, **self._kwargs))
+        return bound[1]
+
+    def __getattr__(self, name: str):
+        return getattr(self.resolve(), name)
+
+    def __getitem__(self, name: str):
+        return self.resolve()[name]
+
+
+def create_client(mongo_url: str) -> LazyClient:
+    """Motor client with pool sizing, fail-fast timeouts, metrics and command tracing (built lazily)"""
+    def factory():
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from metrics import command_metrics
+        from tracing import command_tracer
+        return AsyncIOMotorClient(
+            mongo_url,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            maxConnecting=MONGO_MAX_CONNECTING,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            event_listeners=[pool_metrics, command_metrics, command_tracer],
+        )
+    return LazyClient(factory)
+
+
+def read_database(client, name: str):
+    """Secondary-preferred view of the database for read-only storefront queries"""
+    return client.get_database(name, read_preference=SecondaryPreferred(max_staleness=MONGO_MAX_STALENESS_S))
+
+
+def query_timeout_ms(path: str) -> int:
+    for prefix, timeout_ms in QUERY_TIMEOUTS_MS:
+        if path.startswith(prefix):
+            return timeout_ms
+    return DEFAULT_QUERY_TIMEOUT_MS
+
+
+_deferred_budget_ms: contextvars.ContextVar[int] = contextvars.ContextVar("deferred_budget_ms", default=0)
+
+
+def defers_budget(path: str) -> bool:
+    return path.startswith(DEFERRED_BUDGET_PREFIXES) or path.endswith(DEFERRED_BUDGET_SUFFIXES)
+
+
+@contextmanager
+def query_budget():
+    """Start the request's deferred query budget here (no-op on other routes)"""
+    timeout_ms = _deferred_budget_ms.get()
+    if not timeout_ms:
+        yield
+        return
+    with pymongo.timeout(timeout_ms / 1000):
+        yield
+
+
+class QueryTimeoutMiddleware:
+    """Bound every database operation of a request by its route class budget.
+
+    Uses the driver's client-side operation timeout (pymongo.timeout), which
+    also sends maxTimeMS to the server, so a slow query fails fast instead of
+    holding a pooled connection. Motor propagates the context to its worker
+    threads.
+
+    The budget normally starts when the request arrives. On upload and
+    restore routes (DEFERRED_BUDGET_*) the slow part is not the database, so
+    the handler starts it with query_budget() right before its queries.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timeout_ms = query_timeout_ms(scope["path"])
+        if not timeout_ms:
+            await self.app(scope, receive, send)
+            return
+        if defers_budget(scope["path"]):
+            token = _deferred_budget_ms.set(timeout_ms)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _deferred_budget_ms.reset(token)
+            return
+        with pymongo.timeout(timeout_ms / 1000):
+            await self.app(scope, receive, send)
@@ -0,0 +1,245 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import bson
+from bson import json_util
+
+logger = logging.getLogger(__name__)
+
+# Dumps contain admin_users (password hashes, MFA secrets): keep them out of uploads/
+DB_DUMPS_DIR = Path(os.environ.get("DB_DUMPS_DIR", "db_dumps"))
+DUMP_COLLECTIONS = ["promotions", "brands", "site_config", "admin_users"]
+DUMP_BATCH_SIZE = int(os.environ.get("DB_DUMP_BATCH_SIZE", "1000"))
+DUMP_CONCURRENCY = int(os.environ.get("DB_DUMP_CONCURRENCY", "4"))
+DUMP_FORMATS = {"ndjson": ".ndjson.gz", "bson": ".bson.gz"}
+# Never emptied by a dropping restore: losing them mid-restore locks every admin out,
+# and accounts created after the dump must survive it
+NEVER_DROP = {"admin_users"}
+
+
+def _encode_batch(docs: List[Dict[str, Any]], fmt: str) -> bytes:
+    if fmt == "bson":
+        return b"".join(bson.encode(doc) for doc in docs)
+    return "".join(
+        json_util.dumps(doc, json_options=json_util.CANONICAL_JSON_OPTIONS) + "\n" for doc in docs
+    ).encode("utf-8")
+
+
+def _iter_documents(path: Path, fmt: str) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rb") as fh:
+        if fmt == "bson":
+            yield from bson.decode_file_iter(fh)
+        else:
+            for line in fh:
+                if line.strip():
+                    yield json_util.loads(line, json_options=json_util.CANONICAL_JSON_OPTIONS)
+
+
+def _read_batch(iterator: Iterator[Dict[str, Any]], size: int) -> List[Dict[str, Any]]:
+    batch = []
+    for doc in iterator:
+        batch.append(doc)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+def load_dump_manifest(name: str) -> Dict[str, Any]:
+    path = DB_DUMPS_DIR / name / "manifest.json"
+    if not path.exists():
+        raise FileNotFoundError(f"Dump {name} not found")
+    return json.loads(path.read_text())
+
+
+def list_dumps() -> List[Dict[str, Any]]:
+    if not DB_DUMPS_DIR.exists():
+        return []
+    items = []
+    for path in DB_DUMPS_DIR.glob("*/manifest.json"):
+        items.append(json.loads(path.read_text()))
+    items.sort(key=lambda m: m["started_at"], reverse=True)
+    return items
+
+
+def delete_dump(name: str):
+    path = DB_DUMPS_DIR / name
+    if not (path / "manifest.json").exists():
+        raise FileNotFoundError(f"Dump {name} not found")
+    shutil.rmtree(path)
+
+
+async def _dump_collection(db, job, collection: str, query: Dict[str, Any], path: Path, fmt: str) -> Dict[str, Any]:
+    """Stream one collection to a gzip file, one cursor batch at a time.
+
+    Encoding and compression run in a worker thread per batch, so neither the
+    collection nor the file is ever held in memory as a whole.
+    """
+    tmp_path = path.with_name(path.name + ".partial")
+    count = 0
+    fh = await asyncio.to_thread(gzip.open, tmp_path, "wb")
+    try:
+        cursor = db[collection].find(query).sort("_id", 1).batch_size(DUMP_BATCH_SIZE)
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= DUMP_BATCH_SIZE:
+                await asyncio.to_thread(fh.write, _encode_batch(batch, fmt))
+                count += len(batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(fh.write, _encode_batch(batch, fmt))
+            count += len(batch)
+    finally:
+        await asyncio.to_thread(fh.close)
+    os.replace(tmp_path, path)
+
+    size = path.stat().st_size
+    if job is not None:
+        job.files_done += 1
+        job.bytes_done += size
+    return {"file": path.name, "count": count, "bytes": size}
+
+
+async def create_dump(
+    job,
+    db,
+    mode: str = "full",
+    fmt: str = "ndjson",
+    collections: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Export collections to DB_DUMPS_DIR/<name>/ with a manifest.
+
+    Incremental dumps export documents with `updated_at` in
+    [previous dump's started_at, this dump's started_at), chaining onto the
+    latest dump. Deletions are not captured by incremental dumps.
+    """
+    if fmt not in DUMP_FORMATS:
+        raise ValueError(f"Unsupported dump format: {fmt}")
+    collections = collections or DUMP_COLLECTIONS
+    started_at = datetime.utcnow()
+
+    base = None
+    since = None
+    if mode == "incremental":
+        previous = list_dumps()
+        if not previous:
+            raise ValueError("Incremental dump requires a previous dump")
+        base = previous[0]
+        since = datetime.fromisoformat(base["started_at"])
+    elif mode != "full":
+        raise ValueError(f"Unsupported dump mode: {mode}")
+
+    # A full and a scheduled incremental dump can start within the same second
+    name = f"{mode}_{started_at.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    dump_dir = DB_DUMPS_DIR / name
+    dump_dir.mkdir(parents=True, exist_ok=False)
+    if job is not None:
+        job.files_total = len(collections)
+
+    query: Dict[str, Any] = {}
+    if since is not None:
+        query = {"updated_at": {"$gte": since, "$lt": started_at}}
+
+    semaphore = asyncio.Semaphore(DUMP_CONCURRENCY)
+
+    async def dump_one(collection: str):
+        async with semaphore:
+            path = dump_dir / f"{collection}{DUMP_FORMATS[fmt]}"
+            return collection, await _dump_collection(db, job, collection, query, path, fmt)
+
+    results = await asyncio.gather(*(dump_one(c) for c in collections))
+
+    manifest = {
+        "name": name,
+        "mode": mode,
+        "format": fmt,
+        "base": base["name"] if base else None,
+        "since": since.isoformat() if since else None,
+        "started_at": started_at.isoformat(),
+        "finished_at": datetime.utcnow().isoformat(),
+        "collections": dict(results),
+    }
+    (dump_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    logger.info(f"Database dump {name} written ({sum(r['count'] for _, r in results)} documents)")
+    return manifest
+
+
+def dump_chain(name: str) -> List[Dict[str, Any]]:
+    """Manifests needed to restore `name`: the full dump followed by incrementals"""
+    chain = []
+    manifest = load_dump_manifest(name)
+    while True:
+        chain.append(manifest)
+        if not manifest.get("base"):
+            break
+        manifest = load_dump_manifest(manifest["base"])
+    chain.reverse()
+    return chain
+
+
+async def _restore_collection(db, collection: str, path: Path, fmt: str, replace_existing: bool) -> int:
+    """Load a dump file with insert_many batches.
+
+    For incremental dumps `replace_existing` first removes the batch's _ids so
+    newer versions replace older ones.
+    """
+    iterator = _iter_documents(path, fmt)
+    restored = 0
+    while True:
+        batch = await asyncio.to_thread(_read_batch, iterator, DUMP_BATCH_SIZE)
+        if not batch:
+            break
+        if replace_existing:
+            await db[collection].delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+        await db[collection].insert_many(batch, ordered=False)
+        restored += len(batch)
+    return restored
+
+
+async def restore_dump(job, db, name: str, drop: bool = False, collections: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Restore a dump (and, for incrementals, its chain) into the database.
+
+    With `drop`, collections in the full dump (except NEVER_DROP) are emptied
+    first; otherwise documents are replaced by _id.
+    """
+    chain = dump_chain(name)
+    if job is not None:
+        job.files_total = sum(len(m["collections"]) for m in chain)
+
+    totals: Dict[str, int] = {}
+    for manifest in chain:
+        dump_dir = DB_DUMPS_DIR / manifest["name"]
+        is_full = manifest["mode"] == "full"
+
+        async def restore_one(collection: str, info: Dict[str, Any]):
+            dropped = is_full and drop and collection not in NEVER_DROP
+            if dropped:
+                await db[collection].delete_many({})
+            count = await _restore_collection(
+                db,
+                collection,
+                dump_dir / info["file"],
+                manifest["format"],
+                replace_existing=not dropped,
+            )
+            if job is not None:
+                job.files_done += 1
+            return collection, count
+
+        selected = {
+            c: info for c, info in manifest["collections"].items()
+            if not collections or c in collections
+        }
+        for collection, count in await asyncio.gather(*(restore_one(c, i) for c, i in selected.items())):
+            totals[collection] = totals.get(collection, 0) + count
+
+    logger.info(f"Database dump {name} restored: {totals}")
+    return {"dump": name, "chain": [m["name"] for m in chain], "restored": totals}
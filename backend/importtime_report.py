@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Import-time report for the API (cold start profiling).
+
+Runs `python -X importtime -c "import server"` in a clean interpreter and
+summarizes the output, either per top-level package or per module.
+
+Usage:
+    python importtime_report.py                    # full app, top 25 packages
+    python importtime_report.py --profile public   # storefront-only app
+    python importtime_report.py --modules --top 40 # individual modules
+    python importtime_report.py --raw > import.log # raw -X importtime output
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT_DIR = Path(__file__).parent
+
+
+def run_importtime(profile: str) -> str:
+    env = dict(os.environ, APP_PROFILE=profile, PYTHONDONTWRITEBYTECODE="1")
+    # Dummy connection settings are enough: the Mongo client connects lazily
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "importtime")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=ROOT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        # stderr mixes importtime lines with the traceback; show the tail
+        raise SystemExit(f"Importing server failed:\n{result.stderr[-2000:]}")
+    return result.stderr
+
+
+def parse(output: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for every line of -X importtime output"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def by_package(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        totals[name.split(".")[0]] += self_us
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", default="full", help="app profile to import (APP_PROFILE)")
+    parser.add_argument("--top", type=int, default=25, help="number of entries to show")
+    parser.add_argument("--modules", action="store_true", help="rank modules by cumulative time instead of packages")
+    parser.add_argument("--raw", action="store_true", help="print the raw -X importtime output")
+    args = parser.parse_args()
+
+    output = run_importtime(args.profile)
+    if args.raw:
+        sys.stdout.write(output)
+        return
+
+    rows = parse(output)
+    total_us = sum(self_us for _, self_us, _ in rows)
+    print(f"Profile: {args.profile}  modules: {len(rows)}  total import time: {total_us / 1000:.1f} ms\n")
+
+    if args.modules:
+        ranked = sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]
+        print(f"{'cumulative ms':>14}  {'self ms':>8}  module")
+        for name, self_us, cumulative_us in ranked:
+            print(f"{cumulative_us / 1000:>14.1f}  {self_us / 1000:>8.1f}  {name}")
+    else:
+        ranked = sorted(by_package(rows).items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        print(f"{'self ms':>8}  {'share':>6}  package")
+        for name, self_us in ranked:
+            print(f"{self_us / 1000:>8.1f}  {self_us / total_us:>6.1%}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import logging
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from rollups import dedupe_reports
+
+logger = logging.getLogger(__name__)
+
+ADMIN_LOGS_INDEXES = [
+    # Keyset pagination over (timestamp, _id) for the unfiltered log view
+    IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp_id"),
+    IndexModel([("username", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="username_timestamp_id"),
+    IndexModel([("action", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="action_timestamp_id"),
+    IndexModel([("resource_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="resource_timestamp_id"),
+    # Failed-login aggregation by IP
+    IndexModel([("action", ASCENDING), ("success", ASCENDING), ("ip_address", ASCENDING), ("timestamp", DESCENDING)], name="login_ip_timestamp"),
+]
+
+
+DAILY_REPORTS_INDEXES = [
+    # One report per date; also serves range queries
+    IndexModel([("date", ASCENDING)], name="date_unique", unique=True),
+]
+
+SCHEDULER_LEASES_INDEXES = [
+    # Expired leases are removed by the TTL monitor; correctness relies on expires_at checks
+    IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+]
+
+# Admin writes address documents by id (find_one_and_update / find_one_and_delete)
+PROMOTIONS_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    # Admin search: ranked full-text match (Spanish stemming), newest-first browsing
+    IndexModel(
+        [("title", TEXT), ("description", TEXT), ("type", TEXT), ("features", TEXT)],
+        name="search_text",
+        weights={"title": 10, "type": 5, "features": 3, "description": 1},
+        default_language="spanish",
+    ),
+    IndexModel([("start_date", DESCENDING)], name="start_date_desc"),
+    # Search facets: filters and grouped fields all live in the index, so facet counts never fetch documents
+    IndexModel(
+        [("is_active", ASCENDING), ("type", ASCENDING), ("start_date", DESCENDING), ("end_date", ASCENDING)],
+        name="search_facets",
+    ),
+]
+
+BRANDS_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+]
+
+SITE_CONFIG_INDEXES = [
+    # Also makes concurrent upserts of the same key collide instead of duplicating it
+    IndexModel([("section", ASCENDING), ("key", ASCENDING)], name="section_key_unique", unique=True),
+]
+
+CONTENT_REVISIONS_INDEXES = [
+    # Revision numbers are allocated by inserting latest+1; the index rejects duplicates
+    IndexModel([("revision", DESCENDING)], name="revision_unique", unique=True),
+    IndexModel([("kind", ASCENDING), ("revision", DESCENDING)], name="kind_revision"),
+]
+
+CONTENT_BUNDLES_INDEXES = [
+    # Pruning keeps the newest bundles
+    IndexModel([("created_at", DESCENDING)], name="created_at_desc"),
+]
+
+OUTBOX_INDEXES = [
+    # The dispatcher's claim: due pending messages, and sending ones whose lease ran out
+    IndexModel([("status", ASCENDING), ("available_at", ASCENDING)], name="status_available_at"),
+    IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)], name="status_locked_until"),
+    # Delivered messages are kept for a week; dead letters have no sent_at and stay
+    IndexModel([("sent_at", ASCENDING)], name="sent_at_ttl", expireAfterSeconds=7 * 24 * 3600),
+]
+
+BACKUP_JOBS_INDEXES = [
+    IndexModel([("created_at", DESCENDING)], name="created_at_desc"),
+    # Finished jobs are kept for a month; unfinished ones have no finished_at and stay
+    IndexModel([("finished_at", ASCENDING)], name="finished_at_ttl", expireAfterSeconds=30 * 24 * 3600),
+]
+
+COLLECTION_INDEXES = {
+    "admin_logs": ADMIN_LOGS_INDEXES,
+    "promotions": PROMOTIONS_INDEXES,
+    "brands": BRANDS_INDEXES,
+    "site_config": SITE_CONFIG_INDEXES,
+    "content_revisions": CONTENT_REVISIONS_INDEXES,
+    "content_bundles": CONTENT_BUNDLES_INDEXES,
+    "outbox": OUTBOX_INDEXES,
+    "daily_reports": DAILY_REPORTS_INDEXES,
+    "scheduler_leases": SCHEDULER_LEASES_INDEXES,
+    "backup_jobs": BACKUP_JOBS_INDEXES,
+}
+
+
+# Data fixes a unique index needs before it can be built
+BEFORE_INDEXING = {
+    "daily_reports": dedupe_reports,
+}
+
+
+async def ensure_indexes(db):
+    """Create the indexes backing admin queries (idempotent, safe on every startup)"""
+    failed = []
+    for collection, indexes in COLLECTION_INDEXES.items():
+        try:
+            if collection in BEFORE_INDEXING:
+                await BEFORE_INDEXING[collection](db)
+            await db[collection].create_indexes(indexes)
+        except Exception as e:
+            failed.append(collection)
+            logger.error(f"Error creating indexes on {collection}: {str(e)}")
+    if failed:
+        logger.error(f"Database indexes missing on: {', '.join(failed)}")
+    else:
+        logger.info("Database indexes ensured")
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""Production launcher: pre-forked uvicorn workers sharing one listening socket.
+
+- the app is imported once in the master before forking (LAUNCHER_PRELOAD=1),
+  so workers share its memory copy-on-write
+- each worker also serves a private loopback socket that the master polls at
+  /api/public/health; unresponsive workers are replaced
+- SIGHUP performs a rolling restart: a replacement is started and must pass
+  the health check before the worker it replaces is stopped gracefully
+- worker stdout/stderr go through pipes that the master drains into a
+  rotating log file, so a chatty worker can never block on a full pipe
+
+With preloading, a rolling restart reuses the code loaded by the master; set
+LAUNCHER_PRELOAD=0 so that SIGHUP also picks up new code.
+
+Preloading never creates a MongoDB client in the master: PyMongo clients
+are not fork-safe, so database.create_client returns a lazy handle and each
+worker builds its own client on first use, after the fork.
+
+The public storefront and the admin API can run as separate launchers, each
+with its own port, worker count and limits (see PROFILE_DEFAULTS):
+
+    python launcher.py --profile public   # :8001, one worker per CPU
+    python launcher.py --profile admin    # :8002, few low-priority workers
+"""
+import argparse
+import errno
+import http.client
+import logging
+import os
+import selectors
+import signal
+import socket
+import sys
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import uvicorn
+
+ROOT_DIR = Path(__file__).parent
+
+# Configuration
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", "8001"))
+WORKERS = int(os.environ.get("WEB_CONCURRENCY", "0")) or (os.cpu_count() or 1)
+# Per-profile defaults, overridable with <PROFILE>_<SETTING> (e.g. ADMIN_WORKERS).
+# limit_concurrency/memory_mb of 0 mean unlimited; nice lowers CPU priority.
+PROFILE_DEFAULTS = {
+    "full": {"port": PORT, "workers": WORKERS, "limit_concurrency": 0, "memory_mb": 0, "nice": 0},
+    "public": {"port": PORT, "workers": WORKERS, "limit_concurrency": 0, "memory_mb": 0, "nice": 0},
+    "admin": {"port": 8002, "workers": 2, "limit_concurrency": 32, "memory_mb": 0, "nice": 10},
+}
+PRELOAD = os.environ.get("LAUNCHER_PRELOAD", "1") == "1"
+GRACEFUL_TIMEOUT = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+HEALTH_PATH = "/api/public/health"
+HEALTH_INTERVAL = float(os.environ.get("HEALTH_INTERVAL", "10"))
+HEALTH_TIMEOUT = float(os.environ.get("HEALTH_TIMEOUT", "5"))
+HEALTH_FAILURES = int(os.environ.get("HEALTH_FAILURES", "3"))
+STARTUP_TIMEOUT = float(os.environ.get("WORKER_STARTUP_TIMEOUT", "60"))
+LOG_DIR = Path(os.environ.get("LOG_DIR", ROOT_DIR / "logs"))
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+
+logger = logging.getLogger("launcher")
+worker_output = logging.getLogger("launcher.workers")
+
+
+def profile_settings(profile: str, **overrides) -> Dict[str, int]:
+    settings = {}
+    for name, default in PROFILE_DEFAULTS[profile].items():
+        value = overrides.get(name)
+        if value is None:
+            value = int(os.environ.get(f"{profile.upper()}_{name.upper()}", default))
+        settings[name] = value
+    return settings
+
+
+def setup_logging(log_name: str = "backend.log"):
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    handler = RotatingFileHandler(LOG_DIR / log_name, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    # Worker lines are already formatted by the worker's own logging setup
+    worker_output.addHandler(handler)
+    worker_output.setLevel(logging.INFO)
+    worker_output.propagate = False
+
+    master_handler = RotatingFileHandler(LOG_DIR / log_name, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    master_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    console = logging.StreamHandler()
+    console.setFormatter(master_handler.formatter)
+    logger.addHandler(master_handler)
+    logger.addHandler(console)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def load_app(profile: str = "full"):
+    sys.path.insert(0, str(ROOT_DIR))
+    # server builds its module-level app for APP_PROFILE
+    os.environ["APP_PROFILE"] = profile
+    from server import app
+    return app
+
+
+class Worker:
+    def __init__(self, slot: int, pid: int, health_socket: socket.socket, output_fds: List[int]):
+        self.slot = slot
+        self.pid = pid
+        self.health_socket = health_socket
+        self.health_port = health_socket.getsockname()[1]
+        self.output_fds = output_fds
+        self.started_at = time.monotonic()
+        self.healthy = False
+        self.failures = 0
+        self.stopping_since: Optional[float] = None
+
+
+class Launcher:
+    def __init__(self, app=None, profile: str = "full", settings: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.profile = profile
+        self.settings = settings or profile_settings(profile)
+        self.num_workers = self.settings["workers"]
+        self.workers: Dict[int, Worker] = {}  # pid -> worker
+        self.selector = selectors.DefaultSelector()
+        self.partial: Dict[int, bytes] = {}  # fd -> incomplete line
+        self.running = False
+        self.reload_requested = False
+        self.listener: Optional[socket.socket] = None
+        self._signal_r, self._signal_w = os.pipe()
+
+    # -- sockets --------------------------------------------------------
+
+    def bind(self):
+        sock = socket.socket(socket.AF_INET6 if ":" in HOST else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((HOST, self.settings["port"]))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        self.listener = sock
+        logger.info(
+            f"Listening on {HOST}:{self.settings['port']} with {self.num_workers} {self.profile} workers "
+            f"(preload={PRELOAD}, limits={self.settings})"
+        )
+
+    @staticmethod
+    def _health_socket() -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(16)
+        return sock
+
+    # -- workers --------------------------------------------------------
+
+    def spawn(self, slot: int) -> Worker:
+        health_socket = self._health_socket()
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(out_r)
+            os.close(err_r)
+            self._run_worker(health_socket, out_w, err_w)  # never returns
+        os.close(out_w)
+        os.close(err_w)
+        worker = Worker(slot, pid, health_socket, [out_r, err_r])
+        for fd in worker.output_fds:
+            os.set_blocking(fd, False)
+            self.selector.register(fd, selectors.EVENT_READ, worker)
+        self.workers[pid] = worker
+        logger.info(f"Started worker {pid} (slot {slot}, health port {worker.health_port})")
+        return worker
+
+    def _run_worker(self, health_socket: socket.socket, out_w: int, err_w: int):
+        exit_code = 0
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            # A HUP sent to the whole process group is meant for the master
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.set_wakeup_fd(-1)
+            self.selector.close()
+            inherited = [self._signal_r, self._signal_w]
+            for other in self.workers.values():
+                inherited.extend(other.output_fds)
+                other.health_socket.close()
+            for fd in inherited:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+            os.dup2(out_w, 1)
+            os.dup2(err_w, 2)
+            os.close(out_w)
+            os.close(err_w)
+            sys.stdout.reconfigure(line_buffering=True)
+            sys.stderr.reconfigure(line_buffering=True)
+
+            self._apply_limits()
+            app = self.app if self.app is not None else load_app(self.profile)
+            config = uvicorn.Config(
+                app,
+                proxy_headers=True,
+                limit_concurrency=self.settings["limit_concurrency"] or None,
+                timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+                log_config=None,
+            )
+            uvicorn.Server(config).run(sockets=[self.listener, health_socket])
+        except BaseException as e:
+            print(f"Worker {os.getpid()} crashed: {e!r}", file=sys.stderr, flush=True)
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _apply_limits(self):
+        """Per-profile resource limits, applied in the worker after fork"""
+        if self.settings["nice"]:
+            os.nice(self.settings["nice"])
+        if self.settings["memory_mb"]:
+            import resource  # POSIX only, like fork()
+            limit = self.settings["memory_mb"] * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    def stop_worker(self, worker: Worker):
+        if worker.stopping_since is None:
+            worker.stopping_since = time.monotonic()
+            self._signal(worker.pid, signal.SIGTERM)
+
+    @staticmethod
+    def _signal(pid: int, sig: int):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _forget(self, worker: Worker):
+        for fd in worker.output_fds:
+            self._drain(fd, worker, final=True)
+        worker.health_socket.close()
+        self.workers.pop(worker.pid, None)
+
+    def reap(self):
+        """Collect exited workers and refill their slots"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.get(pid)
+            if worker is None:
+                continue
+            self._forget(worker)
+            if worker.stopping_since is None:
+                logger.warning(f"Worker {pid} exited unexpectedly (status {status}); restarting")
+                if self.running:
+                    self.spawn(worker.slot)
+            else:
+                logger.info(f"Worker {pid} stopped")
+
+    # -- output ---------------------------------------------------------
+
+    def _drain(self, fd: int, worker: Worker, final: bool = False):
+        while True:
+            try:
+                chunk = os.read(fd, 65536)
+            except BlockingIOError:
+                chunk = None
+            except OSError as e:
+                if e.errno != errno.EBADF:
+                    raise
+                return
+            if not chunk:
+                break
+            data = self.partial.pop(fd, b"") + chunk
+            *lines, rest = data.split(b"\n")
+            for line in lines:
+                worker_output.info(f"[{worker.pid}] {line.decode('utf-8', 'replace')}")
+            if rest:
+                self.partial[fd] = rest
+        if chunk == b"" or final:
+            # EOF: flush the remainder and stop watching this pipe
+            rest = self.partial.pop(fd, b"")
+            if rest:
+                worker_output.info(f"[{worker.pid}] {rest.decode('utf-8', 'replace')}")
+            try:
+                self.selector.unregister(fd)
+            except (KeyError, ValueError):
+                pass
+            os.close(fd)
+            worker.output_fds = [f for f in worker.output_fds if f != fd]
+
+    def pump(self, timeout: float):
+        """Drain worker output and handle signals for up to `timeout` seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in self.selector.select(remaining):
+                if key.fileobj == self._signal_r:
+                    self._handle_signals()
+                else:
+                    self._drain(key.fileobj, key.data)
+            self.reap()
+            if not self.running:
+                break
+
+    # -- health ---------------------------------------------------------
+
+    @staticmethod
+    def check_health(worker: Worker) -> Optional[int]:
+        """HTTP status of the worker's health endpoint, or None if it did not answer"""
+        conn = http.client.HTTPConnection("127.0.0.1", worker.health_port, timeout=HEALTH_TIMEOUT)
+        try:
+            conn.request("GET", HEALTH_PATH)
+            return conn.getresponse().status
+        except OSError:
+            return None
+        finally:
+            conn.close()
+
+    def wait_healthy(self, worker: Worker) -> bool:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline and worker.pid in self.workers:
+            if self.check_health(worker) == 200:
+                worker.healthy = True
+                return True
+            self.pump(0.5)
+        return False
+
+    def health_round(self):
+        for worker in list(self.workers.values()):
+            if worker.stopping_since is not None:
+                if time.monotonic() - worker.stopping_since > GRACEFUL_TIMEOUT + 5:
+                    logger.warning(f"Worker {worker.pid} did not stop in time; killing it")
+                    self._signal(worker.pid, signal.SIGKILL)
+                continue
+            health = self.check_health(worker)
+            if not worker.healthy and time.monotonic() - worker.started_at < STARTUP_TIMEOUT:
+                worker.healthy = health is not None
+                continue
+            if health is not None:
+                # Answering at all means the worker is alive; a 503 (database down)
+                # would not be fixed by restarting it
+                if health != 200:
+                    logger.warning(f"Worker {worker.pid} reports unhealthy ({health})")
+                worker.healthy = True
+                worker.failures = 0
+                continue
+            worker.failures += 1
+            logger.warning(f"Worker {worker.pid} failed health check ({worker.failures}/{HEALTH_FAILURES})")
+            if worker.failures >= HEALTH_FAILURES:
+                self.stop_worker(worker)
+                self.spawn(worker.slot)
+
+    # -- control --------------------------------------------------------
+
+    def rolling_restart(self):
+        """Replace workers one at a time, keeping capacity up throughout"""
+        logger.info("Rolling restart started")
+        for old in sorted(self.workers.values(), key=lambda w: w.slot):
+            if old.stopping_since is not None or old.pid not in self.workers:
+                continue
+            new = self.spawn(old.slot)
+            if not self.wait_healthy(new):
+                logger.error(f"Replacement worker {new.pid} is unhealthy; aborting rolling restart")
+                self.stop_worker(new)
+                return
+            self.stop_worker(old)
+            if not self.running:
+                return
+        logger.info("Rolling restart complete")
+
+    def _on_signal(self, signum, frame):
+        os.write(self._signal_w, bytes([signum]))
+
+    def _handle_signals(self):
+        try:
+            received = os.read(self._signal_r, 64)
+        except BlockingIOError:
+            return
+        for signum in received:
+            if signum == signal.SIGHUP:
+                self.reload_requested = True
+            elif signum in (signal.SIGTERM, signal.SIGINT):
+                self.running = False
+
+    def shutdown(self):
+        logger.info("Stopping workers")
+        for worker in list(self.workers.values()):
+            self.stop_worker(worker)
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT + 5
+        while self.workers and time.monotonic() < deadline:
+            for key, _ in self.selector.select(0.2):
+                if key.fileobj != self._signal_r:
+                    self._drain(key.fileobj, key.data)
+            self.reap()
+        for worker in list(self.workers.values()):
+            self._signal(worker.pid, signal.SIGKILL)
+        logger.info("Launcher stopped")
+
+    def run(self):
+        self.bind()
+        os.set_blocking(self._signal_r, False)
+        os.set_blocking(self._signal_w, False)
+        self.selector.register(self._signal_r, selectors.EVENT_READ)
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, self._on_signal)
+
+        self.running = True
+        for slot in range(self.num_workers):
+            self.spawn(slot)
+        while self.running:
+            self.pump(HEALTH_INTERVAL)
+            if not self.running:
+                break
+            if self.reload_requested:
+                self.reload_requested = False
+                self.rolling_restart()
+            else:
+                self.health_round()
+        self.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with pre-forked workers")
+    parser.add_argument("--profile", choices=sorted(PROFILE_DEFAULTS), default=os.environ.get("APP_PROFILE", "full"))
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    settings = profile_settings(args.profile, port=args.port, workers=args.workers)
+    setup_logging("backend.log" if args.profile == "full" else f"backend-{args.profile}.log")
+    if not hasattr(os, "fork"):
+        # No fork() (Windows): fall back to a single uvicorn process
+        logger.warning("fork() not available; running a single worker")
+        uvicorn.run(load_app(args.profile), host=HOST, port=settings["port"])
+        return
+    app = load_app(args.profile) if PRELOAD else None
+    Launcher(app, args.profile, settings).run()
+
+
+if __name__ == "__main__":
+    main()
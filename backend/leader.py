@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+LEASE_SECONDS = int(os.environ.get("SCHEDULER_LEASE_SECONDS", "15"))
+LEASES_COLLECTION = "scheduler_leases"
+
+
+class LeaderElection:
+    """Lease-based leader election on a single Mongo document per role.
+
+    The holder renews its lease every lease/3 seconds. Other instances take
+    over as soon as the lease expires, or immediately if the holder releases
+    it on shutdown. Expired lease documents are also removed by a TTL index.
+    """
+
+    def __init__(self, db, name: str = "scheduler", lease_seconds: int = LEASE_SECONDS):
+        self.db = db
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.renew_interval = max(lease_seconds / 3, 1)
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.running = False
+        self._valid_until = 0.0  # monotonic deadline of our current lease
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        # Trust the lease only until it would have expired, even if renewal hangs
+        return time.monotonic() < self._valid_until
+
+    async def try_acquire(self) -> bool:
+        """Acquire or renew the lease; returns whether this instance holds it"""
+        started = time.monotonic()
+        now = datetime.utcnow()
+        update = {
+            "$set": {
+                "holder": self.instance_id,
+                "expires_at": now + timedelta(seconds=self.lease_seconds),
+                "heartbeat_at": now,
+            }
+        }
+        if not self.is_leader:
+            update["$set"]["acquired_at"] = now
+        try:
+            lease = await self.db[LEASES_COLLECTION].find_one_and_update(
+                {
+                    "_id": self.name,
+                    "$or": [{"holder": self.instance_id}, {"expires_at": {"$lt": now}}],
+                },
+                update,
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Lease exists and is held by someone else
+            lease = None
+
+        was_leader = self.is_leader
+        if lease and lease.get("holder") == self.instance_id:
+            self._valid_until = started + self.lease_seconds
+            if not was_leader:
+                logger.info(f"Acquired '{self.name}' leadership as {self.instance_id}")
+            return True
+
+        self._valid_until = 0.0
+        if was_leader:
+            logger.warning(f"Lost '{self.name}' leadership")
+        return False
+
+    async def release(self):
+        """Give up the lease so another instance can take over immediately"""
+        if not self.is_leader:
+            return
+        self._valid_until = 0.0
+        try:
+            await self.db[LEASES_COLLECTION].delete_one({"_id": self.name, "holder": self.instance_id})
+            logger.info(f"Released '{self.name}' leadership")
+        except Exception as e:
+            logger.error(f"Error releasing leadership: {str(e)}")
+
+    async def run(self):
+        """Campaign/heartbeat loop"""
+        self.running = True
+        while self.running:
+            try:
+                await self.try_acquire()
+            except Exception as e:
+                logger.error(f"Error in leader election: {str(e)}")
+            await asyncio.sleep(self.renew_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name=f"leader:{self.name}")
+
+    async def stop(self):
+        self.running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.release()
+
+    async def status(self):
+        lease = await self.db[LEASES_COLLECTION].find_one({"_id": self.name})
+        return {
+            "instance_id": self.instance_id,
+            "is_leader": self.is_leader,
+            "lease": lease,
+        }
@@ -0,0 +1,150 @@
+"""Event-loop blocking detector.
+
+A heartbeat task on the loop records when it last ran; a watchdog thread
+notices when the heartbeat is overdue, i.e. something is running on the loop
+without yielding. While the loop is still stalled the thread captures the
+loop thread's stack (sys._current_frames) and the request being served, and
+once the loop recovers it logs the stall with its duration. Stalls are also
+exported to /metrics and kept in a short history for the admin API.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+LOOP_WATCHDOG_ENABLED = os.environ.get("LOOP_WATCHDOG_ENABLED", "true").lower() in {"1", "true", "yes"}
+LOOP_BLOCK_THRESHOLD_MS = float(os.environ.get("LOOP_BLOCK_THRESHOLD_MS", "100"))
+LOOP_BLOCK_HISTORY = int(os.environ.get("LOOP_BLOCK_HISTORY", "50"))
+HEARTBEAT_INTERVAL = 0.02
+MAX_STACK_FRAMES = 40
+
+LOOP_BLOCKS = metrics.registry.register(metrics.Histogram(
+    "event_loop_block_duration_seconds", "Event-loop stalls longer than the watchdog threshold, by route",
+    ("route",), buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)))
+
+
+class LoopWatchdog:
+    def __init__(self, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS, history: int = LOOP_BLOCK_HISTORY):
+        self.threshold = threshold_ms / 1000
+        self.blocks: deque = deque(maxlen=history)
+        self.total_blocks = 0
+        # request task -> ASGI scope, so a stall can be attributed to a route
+        self._requests: "weakref.WeakKeyDictionary[asyncio.Task, Dict]" = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start watching the running loop (call from the loop thread)"""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat = asyncio.create_task(self._beat())
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event-loop watchdog started (threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._heartbeat.cancel()
+        self._thread.join(timeout=1)
+        self._thread = None
+
+    def track(self, scope: Dict):
+        """Associate the current task with a request scope"""
+        task = asyncio.current_task()
+        if task is not None:
+            self._requests[task] = scope
+
+    async def _beat(self):
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def running_route(self, loop: asyncio.AbstractEventLoop) -> str:
+        """Route (or task name) of whatever is running on `loop` right now; safe from other threads"""
+        try:
+            task = asyncio.current_task(loop)
+        except RuntimeError:
+            task = None
+        if task is None:
+            return "<loop callback>"
+        scope = self._requests.get(task)
+        if scope is not None:
+            return f"{scope.get('method', '')} {metrics.route_template(scope) if scope.get('endpoint') else scope.get('path', '')}"
+        return f"task:{task.get_name()}"
+
+    def _capture(self) -> Dict[str, Any]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=MAX_STACK_FRAMES) if frame is not None else []
+        return {"route": self.running_route(self._loop), "stack": "".join(stack)}
+
+    def _watch(self):
+        check_every = max(self.threshold / 4, 0.005)
+        stalled_since: Optional[float] = None
+        captured: Optional[Dict[str, Any]] = None
+        while not self._stop.wait(check_every):
+            beat = self._last_beat
+            if stalled_since is None:
+                if time.monotonic() - beat > self.threshold + HEARTBEAT_INTERVAL:
+                    # Still blocked: the stack now is the stack of the blocking call
+                    stalled_since = beat
+                    captured = self._capture()
+            elif beat != stalled_since:
+                self._record(beat - stalled_since - HEARTBEAT_INTERVAL, captured)
+                stalled_since = captured = None
+
+    def _record(self, duration: float, captured: Dict[str, Any]):
+        self.total_blocks += 1
+        LOOP_BLOCKS.observe(duration, captured["route"].split(" ", 1)[-1])
+        self.blocks.append({
+            "at": datetime.utcnow().isoformat(),
+            "duration_ms": round(duration * 1000, 1),
+            **captured,
+        })
+        logger.warning(
+            f"Event loop blocked for {duration * 1000:.0f}ms in {captured['route']}; stack:\n{captured['stack']}"
+        )
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._thread is not None,
+            "threshold_ms": self.threshold * 1000,
+            "total_blocks": self.total_blocks,
+            "recent": list(reversed(self.blocks)),
+        }
+
+
+class LoopWatchdogMiddleware:
+    """Let the watchdog attribute loop stalls to the request that caused them"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            loop_watchdog.track(scope)
+        await self.app(scope, receive, send)
+
+
+loop_watchdog = LoopWatchdog()
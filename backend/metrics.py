@@ -0,0 +1,377 @@
+"""In-process metrics with Prometheus text exposition.
+
+Deliberately tiny (no prometheus_client dependency): counters, gauges and
+histograms with labels, plus collectors that read existing stats (pool,
+caches, executors) only when /metrics is scraped. Metrics are per process;
+with several workers each one reports its own values (see the `pid` label
+on app_info).
+"""
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", "0.5"))
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labelvalues, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labelvalues: str):
+        self._values[labelvalues] = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._values[()] = self._values.get((), 0.0) + amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labelvalues, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(labelvalues)
+            if data is None:
+                data = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            data[index] += 1
+            data[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for labelvalues, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), data[:-1]):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(data[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]):
+        """`collector()` is called at scrape time and returns freshly built metrics"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                for metric in collector():
+                    lines.extend(metric.render())
+            except Exception as e:
+                logger.error(f"Error in metrics collector {collector.__name__}: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template, method and status", ("method", "route", "status")))
+HTTP_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")))
+HTTP_IN_PROGRESS = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served"))
+MONGO_COMMANDS = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and command",
+    ("collection", "command", "status")))
+LOOP_LAG = registry.register(Histogram(
+    "event_loop_lag_seconds", "Delay of a periodic event-loop timer beyond its schedule",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)))
+LOOP_LAG_LAST = registry.register(Gauge(
+    "event_loop_lag_last_seconds", "Most recent event-loop lag sample"))
+IMAGE_OPTIMIZE = registry.register(Histogram(
+    "image_optimize_duration_seconds", "Time spent optimizing uploaded images"))
+
+HTTP_IN_PROGRESS.set(0)
+
+
+_route_templates: Dict[int, str] = {}
+
+
+def route_template(scope) -> str:
+    """Route path template of a routed request scope (e.g. /api/admin/promotions/{promotion_id})"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    template = _route_templates.get(id(endpoint))
+    if template is None:
+        template = "unmatched"
+        for route in getattr(scope.get("app"), "routes", ()):
+            if getattr(route, "endpoint", None) is endpoint or getattr(route, "app", None) is endpoint:
+                template = getattr(route, "path_format", None) or route.path
+                break
+        _route_templates[id(endpoint)] = template
+    return template
+
+
+class MetricsMiddleware:
+    """Time every HTTP request and label it with its route template (not the raw path)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            route = route_template(scope)
+            HTTP_LATENCY.observe(time.perf_counter() - started, scope["method"], route)
+            HTTP_REQUESTS.inc(scope["method"], route, str(status_code))
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Mongo command timings per collection/command (durations come from the driver)"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, int], str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event) -> Tuple[str, int]:
+        return (str(event.connection_id), event.request_id)
+
+    def started(self, event):
+        value = event.command.get(event.command_name)
+        collection = value if isinstance(value, str) else event.command.get("collection", "")
+        with self._lock:
+            self._pending[self._key(event)] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, status: str):
+        with self._lock:
+            collection = self._pending.pop(self._key(event), "")
+        MONGO_COMMANDS.observe(event.duration_micros / 1e6, collection, event.command_name, status)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+
+command_metrics = CommandMetrics()
+
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    """Sleep `interval` repeatedly and record how late each wake-up is"""
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lag = max(time.perf_counter() - expected, 0.0)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+
+
+_lag_task: Optional[asyncio.Task] = None
+
+
+def start_loop_monitor():
+    global _lag_task
+    if _lag_task is None:
+        _lag_task = asyncio.create_task(monitor_loop_lag())
+
+
+def stop_loop_monitor():
+    global _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        _lag_task = None
+
+
+# Executors whose queue depth is exported; name -> callable returning the executor
+_executors: Dict[str, Callable[[], Optional[ThreadPoolExecutor]]] = {}
+
+
+def watch_executor(name: str, getter: Callable[[], Optional[ThreadPoolExecutor]]):
+    _executors[name] = getter
+
+
+def collect_executors() -> Iterable[Metric]:
+    queued = Gauge("executor_queue_depth", "Work items waiting for a thread", ("executor",))
+    threads = Gauge("executor_threads", "Threads started by the executor", ("executor",))
+    for name, getter in _executors.items():
+        executor = getter()
+        if executor is None:
+            continue
+        queued.set(executor._work_queue.qsize(), name)
+        threads.set(len(executor._threads), name)
+    return [queued, threads]
+
+
+# Caches exposing hits/misses; name -> object
+_caches: Dict[str, object] = {}
+
+
+def watch_cache(name: str, cache):
+    _caches[name] = cache
+
+
+def collect_caches() -> Iterable[Metric]:
+    hits = Counter("cache_hits_total", "Cache hits", ("cache",))
+    misses = Counter("cache_misses_total", "Cache misses", ("cache",))
+    ratio = Gauge("cache_hit_ratio", "Hits / lookups since start", ("cache",))
+    for name, cache in _caches.items():
+        hits.inc(name, amount=cache.hits)
+        misses.inc(name, amount=cache.misses)
+        lookups = cache.hits + cache.misses
+        ratio.set(cache.hits / lookups if lookups else 0.0, name)
+    return [hits, misses, ratio]
+
+
+_pool = None
+
+
+def watch_pool(pool_metrics):
+    """Export a database.PoolMetrics listener"""
+    global _pool
+    _pool = pool_metrics
+
+
+def collect_pool() -> Iterable[Metric]:
+    if _pool is None:
+        return []
+    snapshot = _pool.snapshot()
+    size = Gauge("mongodb_pool_connections", "Connections in the driver pool", ("state",))
+    size.set(snapshot["open_connections"], "open")
+    size.set(snapshot["checked_out"], "checked_out")
+    size.set(snapshot["max_pool_size"], "max")
+    checkouts = Counter("mongodb_pool_checkouts_total", "Successful connection checkouts")
+    checkouts.inc(amount=snapshot["checkouts"])
+    failures = Counter("mongodb_pool_checkout_failures_total", "Failed connection checkouts", ("reason",))
+    for reason, count in snapshot["checkout_failures"].items():
+        failures.inc(reason, amount=count)
+    wait = Gauge("mongodb_pool_wait_seconds", "Checkout wait time", ("stat",))
+    wait.set((snapshot["wait_ms_avg"] or 0.0) / 1000, "avg")
+    wait.set(snapshot["wait_ms_max"] / 1000, "max")
+    return [size, checkouts, failures, wait]
+
+
+def collect_process() -> Iterable[Metric]:
+    info = Gauge("app_info", "Process serving these metrics", ("pid",))
+    info.set(1, str(os.getpid()))
+    return [info]
+
+
+registry.add_collector(collect_process)
+registry.add_collector(collect_executors)
+registry.add_collector(collect_caches)
+registry.add_collector(collect_pool)
@@ -10,6 +10,7 @@ class Brand(BaseModel):
     color: str = "#3b82f6"  # Hex color
     is_active: bool = True
     order: int = 0
+    version: int = 0  # bumped on every update; exposed as the ETag
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -14,6 +14,7 @@ class Promotion(BaseModel):
     is_active: bool = True
     start_date: datetime
     end_date: datetime
+    version: int = 0  # bumped on every update; exposed as the ETag
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -9,6 +9,7 @@ class SiteConfig(BaseModel):
     key: str
     value: Any  # Can store strings, objects, arrays
     description: Optional[str] = None
+    version: int = 0  # bumped on every update; exposed as the ETag
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class SiteConfigCreate(BaseModel):
@@ -0,0 +1,380 @@
+"""Durable outbox for notifications (promotion events).
+
+Request handlers only insert a message into the `outbox` collection; a
+background dispatcher delivers it. Delivery latency and SMTP outages
+therefore never reach admin saves.
+
+- messages are claimed one by one with a conditional update that sets a
+  lease (`locked_until`), so several workers can dispatch side by side and a
+  crashed worker's claims come back after OUTBOX_LOCK_SECONDS
+- each batch is handed to the transport at once (one SMTP connection per batch)
+- a failed message is retried with exponential backoff and jitter; after
+  OUTBOX_MAX_ATTEMPTS it is dead-lettered (status "dead") until requeued
+- sent messages expire through a TTL index (see indexes.py)
+"""
+import asyncio
+import logging
+import os
+import random
+import smtplib
+import socket
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from metrics import Counter, registry
+from tracing import SpanContext, current_span, tracer
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+OUTBOX_TRANSPORT = os.environ.get("OUTBOX_TRANSPORT", "")  # smtp | file | log (default: smtp when SMTP_HOST is set)
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_SECONDS = float(os.environ.get("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.environ.get("OUTBOX_BACKOFF_BASE_SECONDS", "30"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.environ.get("OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+OUTBOX_LOCK_SECONDS = int(os.environ.get("OUTBOX_LOCK_SECONDS", "120"))
+OUTBOX_FILE_DIR = os.environ.get("OUTBOX_FILE_DIR", "outbox_mail")
+SMTP_HOST = os.environ.get("SMTP_HOST", "")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
+SMTP_USER = os.environ.get("SMTP_USER", "")
+SMTP_PASS = os.environ.get("SMTP_PASS", "")
+SMTP_TIMEOUT = float(os.environ.get("SMTP_TIMEOUT", "20"))
+PROMO_MAIL_FROM = os.environ.get("PROMO_MAIL_FROM", SMTP_USER)
+PROMO_MAIL_TO = os.environ.get("PROMO_MAIL_TO", "")
+OUTBOX_COLLECTION = "outbox"
+
+PENDING, SENDING, SENT, DEAD = "pending", "sending", "sent", "dead"
+
+OUTBOX_MESSAGES = registry.register(Counter(
+    "outbox_messages_total", "Outbox deliveries by topic and outcome", ("topic", "outcome")))
+
+PROMOTION_EVENT_SUBJECTS = {
+    "created": "Nueva promoción",
+    "updated": "Promoción actualizada",
+    "deleted": "Promoción eliminada",
+}
+
+
+def _format_date(value: Any) -> str:
+    return value.strftime("%d/%m/%Y") if isinstance(value, datetime) else str(value or "-")
+
+
+def render_promotion(payload: Dict[str, Any]) -> EmailMessage:
+    promotion = payload["promotion"]
+    message = EmailMessage()
+    message["Subject"] = f"{PROMOTION_EVENT_SUBJECTS.get(payload['event'], 'Promoción')}: {promotion.get('title')}"
+    message.set_content("\n".join([
+        f"Título: {promotion.get('title')}",
+        f"Descuento: {promotion.get('discount') or '-'}",
+        f"Vigencia: {_format_date(promotion.get('start_date'))} - {_format_date(promotion.get('end_date'))}",
+        f"Activa: {'sí' if promotion.get('is_active') else 'no'}",
+        f"Modificada por: {payload.get('username') or 'sistema'}",
+    ]))
+    return message
+
+
+# Topic prefix -> function building the e-mail for a message payload
+RENDERERS = {
+    "promotion": render_promotion,
+}
+
+
+def render(doc: Dict[str, Any]) -> EmailMessage:
+    message = RENDERERS[doc["topic"].split(".", 1)[0]](doc["payload"])
+    message["From"] = PROMO_MAIL_FROM
+    message["To"] = doc.get("recipient") or PROMO_MAIL_TO
+    # Stable id: a retried delivery is recognisable as the same message
+    domain = PROMO_MAIL_FROM.rpartition("@")[2] or socket.gethostname()
+    message["Message-ID"] = f"<{doc['_id']}@{domain}>"
+    return message
+
+
+class LogTransport:
+    """Logs messages instead of sending them (default without SMTP settings)"""
+
+    name = "log"
+
+    def deliver(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        for message in messages:
+            logger.info(f"Outbox message to {message['To']}: {message['Subject']}")
+        return [None] * len(messages)
+
+
+class FileTransport:
+    """Writes each message as an .eml file; a local stand-in for SMTP"""
+
+    name = "file"
+
+    def __init__(self, directory: str = OUTBOX_FILE_DIR):
+        self.directory = Path(directory)
+
+    def deliver(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        errors: List[Optional[str]] = []
+        for message in messages:
+            name = message["Message-ID"].strip("<>").replace("@", "_")
+            try:
+                (self.directory / f"{name}.eml").write_bytes(bytes(message))
+                errors.append(None)
+            except OSError as e:
+                errors.append(str(e))
+        return errors
+
+
+class SMTPTransport:
+    """One SMTP session (STARTTLS when offered) per batch"""
+
+    name = "smtp"
+
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, username: str = SMTP_USER, password: str = SMTP_PASS, timeout: float = SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+
+    def deliver(self, messages: List[EmailMessage]) -> List[Optional[str]]:
+        try:
+            if self.port == 465:
+                smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+            else:
+                smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        except (OSError, smtplib.SMTPException) as e:
+            return [f"connect: {str(e)}"] * len(messages)
+        errors: List[Optional[str]] = []
+        try:
+            if self.port != 465 and smtp.has_extn("starttls"):
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            for message in messages:
+                try:
+                    smtp.send_message(message)
+                    errors.append(None)
+                except smtplib.SMTPRecipientsRefused as e:
+                    errors.append(f"refused: {e.recipients}")
+                except smtplib.SMTPResponseException as e:
+                    errors.append(f"{e.smtp_code}: {e.smtp_error!r}")
+        except (OSError, smtplib.SMTPException) as e:
+            # The session broke: everything not sent yet fails with it
+            errors.extend([str(e)] * (len(messages) - len(errors)))
+        finally:
+            try:
+                smtp.quit()
+            except (OSError, smtplib.SMTPException):
+                smtp.close()
+        return errors
+
+
+def get_transport(name: str = OUTBOX_TRANSPORT):
+    name = name or ("smtp" if SMTP_HOST and not SMTP_HOST.startswith("<") else "log")
+    if name == "smtp":
+        return SMTPTransport()
+    if name == "file":
+        return FileTransport()
+    return LogTransport()
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before retry number `attempts`: exponential, capped, jittered"""
+    cap = min(OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX_SECONDS)
+    return random.uniform(cap / 2, cap)
+
+
+async def enqueue(db, topic: str, payload: Dict[str, Any], recipient: Optional[str] = None) -> str:
+    """Store a message for delivery; the only outbox cost a request pays"""
+    now = datetime.utcnow()
+    span = current_span()
+    doc = {
+        "_id": str(uuid.uuid4()),
+        "topic": topic,
+        "payload": payload,
+        "recipient": recipient,
+        "status": PENDING,
+        "attempts": 0,
+        "created_at": now,
+        "available_at": now,
+        "traceparent": span.traceparent if span else None,
+    }
+    await db[OUTBOX_COLLECTION].insert_one(doc)
+    outbox_dispatcher.wake()
+    return doc["_id"]
+
+
+async def notify_promotion(db, event: str, promotion: Dict[str, Any], username: Optional[str] = None) -> Optional[str]:
+    """Queue a promotion notification (best-effort: never fails the admin action)"""
+    fields = ("id", "title", "discount", "start_date", "end_date", "is_active")
+    try:
+        return await enqueue(db, f"promotion.{event}", {
+            "event": event,
+            "username": username,
+            "promotion": {k: promotion.get(k) for k in fields},
+        })
+    except PyMongoError as e:
+        logger.error(f"Error queueing promotion notification: {str(e)}")
+        return None
+
+
+class OutboxDispatcher:
+    def __init__(self, transport=None, batch_size: int = OUTBOX_BATCH_SIZE, poll_seconds: float = OUTBOX_POLL_SECONDS):
+        self.transport = transport or get_transport()
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.db = None
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def _claim(self, now: datetime) -> Optional[Dict[str, Any]]:
+        return await self.db[OUTBOX_COLLECTION].find_one_and_update(
+            {
+                "$or": [
+                    {"status": PENDING, "available_at": {"$lte": now}},
+                    {"status": SENDING, "locked_until": {"$lt": now}},
+                ]
+            },
+            {"$set": {
+                "status": SENDING,
+                "locked_until": now + timedelta(seconds=OUTBOX_LOCK_SECONDS),
+                "claimed_by": self.worker_id,
+            }},
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def dispatch_batch(self) -> int:
+        """Claim and deliver up to batch_size due messages; returns how many were claimed"""
+        now = datetime.utcnow()
+        batch = []
+        while len(batch) < self.batch_size:
+            doc = await self._claim(now)
+            if doc is None:
+                break
+            batch.append(doc)
+        if not batch:
+            return 0
+
+        messages, deliverable, errors = [], [], {}
+        for doc in batch:
+            try:
+                messages.append(render(doc))
+                deliverable.append(doc)
+            except Exception as e:
+                errors[doc["_id"]] = f"render: {str(e)}"
+        with tracer.span("outbox deliver", attributes={"outbox.batch": len(batch), "outbox.transport": self.transport.name}):
+            results = await asyncio.to_thread(self.transport.deliver, messages) if messages else []
+        errors.update((doc["_id"], error) for doc, error in zip(deliverable, results) if error)
+
+        for doc in batch:
+            await self._settle(doc, errors.get(doc["_id"]))
+        return len(batch)
+
+    async def _settle(self, doc: Dict[str, Any], error: Optional[str]):
+        # Each message gets a short span in the trace of the request that queued it
+        with tracer.span(f"outbox {doc['topic']}", parent=SpanContext.from_traceparent(doc.get("traceparent"))) as span:
+            now = datetime.utcnow()
+            attempts = doc["attempts"] + 1
+            update: Dict[str, Any] = {"attempts": attempts, "claimed_by": None, "locked_until": None}
+            if error is None:
+                update.update(status=SENT, sent_at=now, last_error=None)
+                outcome = "sent"
+            elif attempts >= OUTBOX_MAX_ATTEMPTS or error.startswith("render:"):
+                update.update(status=DEAD, dead_at=now, last_error=error)
+                outcome = "dead"
+                logger.error(f"Outbox message {doc['_id']} ({doc['topic']}) dead-lettered: {error}")
+            else:
+                update.update(status=PENDING, available_at=now + timedelta(seconds=backoff_seconds(attempts)), last_error=error)
+                outcome = "retry"
+                logger.warning(f"Outbox message {doc['_id']} failed (attempt {attempts}): {error}")
+            if span is not None:
+                span.set_attribute("outbox.outcome", outcome)
+                span.set_attribute("outbox.attempts", attempts)
+            OUTBOX_MESSAGES.inc(doc["topic"], outcome)
+            # Only settle our own claim: if the lease ran out another worker owns it now
+            await self.db[OUTBOX_COLLECTION].update_one(
+                {"_id": doc["_id"], "claimed_by": self.worker_id, "status": SENDING},
+                {"$set": update},
+            )
+
+    async def _idle_seconds(self) -> float:
+        """Sleep until the next retry is due, but at most poll_seconds"""
+        try:
+            doc = await self.db[OUTBOX_COLLECTION].find_one(
+                {"status": PENDING}, {"available_at": 1}, sort=[("available_at", 1)]
+            )
+        except PyMongoError:
+            return self.poll_seconds
+        if doc is None:
+            return self.poll_seconds
+        due = (doc["available_at"] - datetime.utcnow()).total_seconds()
+        return min(max(due, 0.05), self.poll_seconds)
+
+    async def run(self):
+        self.running = True
+        logger.info(f"Outbox dispatcher started (transport: {self.transport.name})")
+        while self.running:
+            try:
+                claimed = await self.dispatch_batch()
+            except PyMongoError as e:
+                logger.error(f"Error in outbox dispatcher: {str(e)}")
+                claimed = 0
+            if claimed < self.batch_size:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=await self._idle_seconds())
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self, db):
+        if self._task is None:
+            self.db = db
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self.run(), name="outbox")
+
+    async def stop(self):
+        self.running = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Outbox dispatcher stopped")
+
+
+async def outbox_status(db, dead_limit: int = 20) -> Dict[str, Any]:
+    counts = {PENDING: 0, SENDING: 0, SENT: 0, DEAD: 0}
+    async for row in db[OUTBOX_COLLECTION].aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    dead = await db[OUTBOX_COLLECTION].find(
+        {"status": DEAD}, {"payload": 0}
+    ).sort("dead_at", -1).limit(dead_limit).to_list(dead_limit)
+    return {"transport": outbox_dispatcher.transport.name, "counts": counts, "dead_letters": dead}
+
+
+async def requeue(db, message_id: Optional[str] = None) -> int:
+    """Send dead-lettered messages (one, or all) through the dispatcher again"""
+    query: Dict[str, Any] = {"status": DEAD}
+    if message_id:
+        query["_id"] = message_id
+    result = await db[OUTBOX_COLLECTION].update_many(
+        query, {"$set": {"status": PENDING, "attempts": 0, "available_at": datetime.utcnow()}}
+    )
+    if result.modified_count:
+        outbox_dispatcher.wake()
+    return result.modified_count
+
+
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,102 @@
+"""On-demand sampling profiler for the live process.
+
+A background thread snapshots thread stacks (sys._current_frames) at a fixed
+interval and aggregates them into the collapsed-stack format used by
+flamegraph.pl / speedscope ("frame;frame;frame count" per line). Nothing is
+instrumented, so overhead is bounded by the sampling rate; duration, depth
+and the number of distinct stacks are capped so the output stays small.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from loop_watchdog import loop_watchdog
+
+# Limits
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "60"))
+PROFILE_MIN_INTERVAL_MS = 5.0
+PROFILE_MAX_DEPTH = 64
+PROFILE_MAX_STACKS = 5000
+TRUNCATED_STACK = "[other stacks]"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})".replace(";", ":")
+
+
+def collapse(frame, max_depth: int = PROFILE_MAX_DEPTH) -> str:
+    """Stack of `frame` as root-first frames joined by ';'"""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """One profile at a time; `run()` blocks the calling (non-loop) thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = False
+
+    def run(
+        self,
+        seconds: float,
+        interval_ms: float,
+        loop: asyncio.AbstractEventLoop,
+        loop_thread_id: int,
+        route: Optional[str] = None,
+        all_threads: bool = False,
+    ) -> Dict:
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        self.running = True
+        try:
+            return self._sample(seconds, interval_ms / 1000, loop, loop_thread_id, route, all_threads)
+        finally:
+            self.running = False
+            self._lock.release()
+
+    def _sample(self, seconds, interval, loop, loop_thread_id, route, all_threads) -> Dict:
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks: Counter = Counter()
+        samples = matched = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            samples += 1
+            frames = sys._current_frames()
+            for thread_id, frame in frames.items():
+                if thread_id == own_id or (thread_id != loop_thread_id and not all_threads):
+                    continue
+                prefix = names.get(thread_id, str(thread_id))
+                if thread_id == loop_thread_id:
+                    running = loop_watchdog.running_route(loop)
+                    if route and route not in running:
+                        continue
+                    # The route becomes the root frame, so each route gets its own tower
+                    prefix = f"{prefix};{running.replace(';', ':')}"
+                key = f"{prefix};{collapse(frame)}"
+                if key not in stacks and len(stacks) >= PROFILE_MAX_STACKS:
+                    key = TRUNCATED_STACK
+                stacks[key] += 1
+                matched += 1
+            del frames
+            time.sleep(max(interval - (time.perf_counter() - started) % interval, 0))
+        return {
+            "samples": samples,
+            "matched": matched,
+            "seconds": round(time.perf_counter() - started, 3),
+            "collapsed": "".join(f"{stack} {count}\n" for stack, count in stacks.most_common()),
+        }
+
+
+sampling_profiler = SamplingProfiler()
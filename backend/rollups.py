@@ -0,0 +1,148 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+# admin_logs older than this are deleted by the cleanup job, so they cannot be re-counted
+AUDIT_LOG_RETENTION_DAYS = int(os.environ.get("AUDIT_LOG_RETENTION_DAYS", "90"))
+
+
+def day_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%d")
+
+
+def _day_bounds(day: str):
+    start = datetime.strptime(day, "%Y-%m-%d")
+    return start, start + timedelta(days=1)
+
+
+async def record_event(db, entry: Dict[str, Any]):
+    """Fold one audit event into its day's counters with a single $inc upsert"""
+    timestamp = entry.get("timestamp") or datetime.utcnow()
+    action = entry.get("action", "unknown")
+    increments = {"total": 1, f"actions.{action}": 1}
+    if action == "login_attempt" and entry.get("success") is False:
+        increments["failed_logins"] = 1
+    day = day_key(timestamp)
+    await db.daily_metrics.update_one(
+        {"_id": day},
+        {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}, "$setOnInsert": {"date": day}},
+        upsert=True
+    )
+
+
+async def rebuild_rollup(db, day: str) -> Dict[str, Any]:
+    """Recompute a day's counters from admin_logs (used to backfill days before rollups existed)"""
+    start, end = _day_bounds(day)
+    pipeline = [
+        {"$match": {"timestamp": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": "$action",
+            "count": {"$sum": 1},
+            "failed": {"$sum": {"$cond": [{"$eq": ["$success", False]}, 1, 0]}},
+        }},
+    ]
+    rows = await db.admin_logs.aggregate(pipeline).to_list(length=None)
+    actions = {row["_id"] or "unknown": row["count"] for row in rows}
+    failed_logins = sum(row["failed"] for row in rows if row["_id"] == "login_attempt")
+    rollup = {
+        "date": day,
+        "total": sum(actions.values()),
+        "actions": actions,
+        "failed_logins": failed_logins,
+        "updated_at": datetime.utcnow(),
+    }
+    await db.daily_metrics.replace_one({"_id": day}, rollup, upsert=True)
+    rollup["_id"] = day
+    return rollup
+
+
+async def build_daily_report(db, day: str, rebuild: bool = False) -> Dict[str, Any]:
+    """Produce (idempotently) the report for `day`; one document per date.
+
+    Promotion counts are evaluated at the end of the day (or now, for today).
+    """
+    start, end = _day_bounds(day)
+    reference = min(end, datetime.utcnow())
+
+    rollup = None if rebuild else await db.daily_metrics.find_one({"_id": day})
+    if rollup is None:
+        rollup = await rebuild_rollup(db, day)
+
+    active_promotions = await db.promotions.count_documents({
+        "is_active": True,
+        "start_date": {"$lte": reference},
+        "end_date": {"$gte": reference}
+    })
+    total_promotions = await db.promotions.count_documents({"created_at": {"$lt": end}})
+
+    report = {
+        "date": day,
+        "active_promotions": active_promotions,
+        "total_promotions": total_promotions,
+        "daily_admin_actions": rollup.get("total", 0),
+        "actions": rollup.get("actions", {}),
+        "failed_logins": rollup.get("failed_logins", 0),
+        "generated_at": datetime.utcnow()
+    }
+    await db.daily_reports.replace_one({"date": day}, report, upsert=True)
+    return report
+
+
+async def backfill_reports(db, start_day: str, end_day: str, rebuild: bool = False) -> Tuple[List[str], List[str]]:
+    """Build reports for every date in [start_day, end_day]; returns (built, skipped).
+
+    Days at or before the audit log retention horizon have (partly) lost
+    their logs: their report is only rebuilt from a stored rollup, and days
+    without one are skipped so an existing report is never zeroed.
+    """
+    horizon = day_key(datetime.utcnow() - timedelta(days=AUDIT_LOG_RETENTION_DAYS))
+    current, _ = _day_bounds(start_day)
+    last, _ = _day_bounds(end_day)
+    days, skipped = [], []
+    while current <= last:
+        day = day_key(current)
+        current += timedelta(days=1)
+        if day <= horizon:
+            if await db.daily_metrics.find_one({"_id": day}, {"_id": 1}) is None:
+                skipped.append(day)
+                continue
+            await build_daily_report(db, day)
+        else:
+            await build_daily_report(db, day, rebuild=rebuild)
+        days.append(day)
+    logger.info(f"Backfilled {len(days)} daily reports ({start_day} to {end_day}), skipped {len(skipped)} past log retention")
+    return days, skipped
+
+
+async def dedupe_reports(db) -> int:
+    """Keep the newest report of each date, so the unique date index can be built"""
+    pipeline = [
+        {"$sort": {"generated_at": -1}},
+        {"$group": {"_id": "$date", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    duplicates = []
+    async for group in db.daily_reports.aggregate(pipeline, allowDiskUse=True):
+        duplicates.extend(group["ids"][1:])
+    if duplicates:
+        await db.daily_reports.delete_many({"_id": {"$in": duplicates}})
+        logger.warning(f"Removed {len(duplicates)} duplicate daily reports")
+    return len(duplicates)
+
+
+async def get_reports(db, start_day: str, end_day: str) -> List[Dict[str, Any]]:
+    """Reports in a date range, served from the unique date index"""
+    cursor = db.daily_reports.find({"date": {"$gte": start_day, "$lte": end_day}}, {"_id": 0}).sort("date", 1)
+    return await cursor.to_list(length=None)
+
+
+async def get_rollups(db, start_day: str, end_day: str) -> List[Dict[str, Any]]:
+    cursor = db.daily_metrics.find({"_id": {"$gte": start_day, "$lte": end_day}}).sort("_id", 1)
+    rows = await cursor.to_list(length=None)
+    for row in rows:
+        row.pop("_id", None)
+    return rows
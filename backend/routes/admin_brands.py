@@ -1,15 +1,29 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Response
+from typing import FrozenSet, List, Optional
 from datetime import datetime
+from pymongo import ReturnDocument
 
 from models.brand import Brand, BrandCreate, BrandUpdate
 from auth import get_current_user, get_database
+from audit import log_action
+from concurrency import etag, is_stale, parse_if_match, precondition_failed, version_filter
 import uuid
 
 
 router = APIRouter(prefix="/api/admin/brands", tags=["Admin Brands"])
 
 
+async def _write_miss(db, brand_id: str, expected_versions: Optional[FrozenSet[int]]) -> HTTPException:
+    """Why a filtered write matched nothing: unknown id or stale If-Match"""
+    current = await db.brands.find_one({"id": brand_id}, {"_id": 0, "version": 1})
+    if current and is_stale(current, expected_versions):
+        return precondition_failed(current)
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Brand not found"
+    )
+
+
 @router.get("/", response_model=List[Brand])
 async def get_all_brands(current_user: dict = Depends(get_current_user)):
     """Get all brands ordered by order field"""
@@ -29,6 +43,7 @@ async def get_active_brands(current_user: dict = Depends(get_current_user)):
 @router.get("/{brand_id}", response_model=Brand)
 async def get_brand(
     brand_id: str,
+    response: Response,
     current_user: dict = Depends(get_current_user)
 ):
     """Get specific brand"""
@@ -39,6 +54,7 @@ async def get_brand(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Brand not found"
         )
+    response.headers["ETag"] = etag(brand)
     return Brand(**brand)
 
 
@@ -58,7 +74,7 @@ async def create_brand(
     await db.brands.insert_one(brand_obj.dict())
 
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "create_brand",
         "resource_id": brand_obj.id,
@@ -73,33 +89,29 @@ async def create_brand(
 async def update_brand(
     brand_id: str,
     brand_update: BrandUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Update existing brand"""
+    """Update existing brand in one atomic round-trip (honours If-Match)"""
     db = get_database()
-    # Check if brand exists
-    existing_brand = await db.brands.find_one({"id": brand_id})
-    if not existing_brand:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Brand not found"
-        )
+    expected_versions = parse_if_match(if_match)
 
     # Prepare update data
     update_data = {k: v for k, v in brand_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
 
-    # Update brand
-    await db.brands.update_one(
-        {"id": brand_id},
-        {"$set": update_data}
+    # Update brand and get the post-image
+    updated_brand = await db.brands.find_one_and_update(
+        {"id": brand_id, **version_filter(expected_versions)},
+        {"$set": update_data, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER
     )
-
-    # Get updated brand
-    updated_brand = await db.brands.find_one({"id": brand_id})
+    if not updated_brand:
+        raise await _write_miss(db, brand_id, expected_versions)
 
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "update_brand",
         "resource_id": brand_id,
@@ -107,28 +119,25 @@ async def update_brand(
         "timestamp": datetime.utcnow()
     })
 
+    response.headers["ETag"] = etag(updated_brand)
     return Brand(**updated_brand)
 
 
 @router.delete("/{brand_id}")
 async def delete_brand(
     brand_id: str,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Delete brand"""
+    """Delete brand (atomically; honours If-Match)"""
     db = get_database()
-    brand = await db.brands.find_one({"id": brand_id})
+    expected_versions = parse_if_match(if_match)
+    brand = await db.brands.find_one_and_delete({"id": brand_id, **version_filter(expected_versions)})
     if not brand:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Brand not found"
-        )
-
-    # Delete from database
-    await db.brands.delete_one({"id": brand_id})
+        raise await _write_miss(db, brand_id, expected_versions)
 
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "delete_brand",
         "resource_id": brand_id,
@@ -150,11 +159,11 @@ async def reorder_brands(
         for item in brand_orders:
             await db.brands.update_one(
                 {"id": item["id"]},
-                {"$set": {"order": item["order"], "updated_at": datetime.utcnow()}}
+                {"$set": {"order": item["order"], "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
             )
 
         # Log the action
-        await db.admin_logs.insert_one({
+        await log_action(db, {
             "username": current_user["username"],
             "action": "reorder_brands",
             "details": {"count": len(brand_orders)},
@@ -179,11 +188,11 @@ async def bulk_activate_brands(
     db = get_database()
     result = await db.brands.update_many(
         {"id": {"$in": brand_ids}},
-        {"$set": {"is_active": True, "updated_at": datetime.utcnow()}}
+        {"$set": {"is_active": True, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
     )
 
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "bulk_activate_brands",
         "details": {"count": result.modified_count, "ids": brand_ids},
@@ -202,11 +211,11 @@ async def bulk_deactivate_brands(
     db = get_database()
     result = await db.brands.update_many(
         {"id": {"$in": brand_ids}},
-        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
+        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
     )
 
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "bulk_deactivate_brands",
         "details": {"count": result.modified_count, "ids": brand_ids},
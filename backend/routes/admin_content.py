@@ -1,9 +1,15 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Response
+from typing import List, Dict, Any, Optional
 from datetime import datetime
+from pymongo import ReturnDocument
+import uuid
 
 from models.site_config import SiteConfig, SiteConfigCreate, SiteConfigUpdate
 from auth import get_current_user, get_database
+from audit import log_action
+from concurrency import parse_if_match, precondition_failed, version_filter, etag
+from content_revisions import list_revisions, load_content, latest_revision
+from content_bundles import PublishConflict, discard_draft, draft_changes, get_pointer, publish, rollback
 
 router = APIRouter(prefix="/api/admin/content", tags=["Admin Content Management"])
 
@@ -73,7 +79,7 @@ async def create_section_config(
     await db.site_config.insert_one(config_obj.dict())
     
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "create_site_config",
         "resource_id": config_obj.id,
@@ -88,67 +94,53 @@ async def update_section_config(
     section_name: str,
     config_key: str,
     config_update: SiteConfigUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Update configuration in a section"""
+    """Update (or create) configuration in a section in one atomic round-trip (honours If-Match)"""
     db = get_database()
-    # Find existing config
-    existing_config = await db.site_config.find_one({
-        "section": section_name,
-        "key": config_key
-    })
-    
-    if not existing_config:
-        # Create new config if it doesn't exist
-        config_dict = {
-            "section": section_name,
-            "key": config_key,
-            "value": config_update.value,
-            "description": config_update.description,
-            "updated_at": datetime.utcnow()
-        }
-        config_obj = SiteConfig(**config_dict)
-        await db.site_config.insert_one(config_obj.dict())
-        
-        # Log the action
-        await db.admin_logs.insert_one({
-            "username": current_user["username"],
-            "action": "create_site_config",
-            "resource_id": config_obj.id,
-            "details": {"section": section_name, "key": config_key},
-            "timestamp": datetime.utcnow()
-        })
-        
-        return config_obj
+    expected_versions = parse_if_match(if_match)
     
-    # Update existing config
     update_data = {"updated_at": datetime.utcnow()}
     if config_update.value is not None:
         update_data["value"] = config_update.value
     if config_update.description is not None:
         update_data["description"] = config_update.description
     
-    await db.site_config.update_one(
-        {"section": section_name, "key": config_key},
-        {"$set": update_data}
+    # A missing config is created, unless the client expects a specific version
+    new_id = str(uuid.uuid4())
+    on_insert = {"id": new_id}
+    if "value" not in update_data:
+        on_insert["value"] = None
+    config = await db.site_config.find_one_and_update(
+        {"section": section_name, "key": config_key, **version_filter(expected_versions)},
+        {"$set": update_data, "$inc": {"version": 1}, "$setOnInsert": on_insert},
+        upsert=expected_versions is None,
+        return_document=ReturnDocument.AFTER
     )
+    if not config:
+        current = await db.site_config.find_one({"section": section_name, "key": config_key}, {"_id": 0, "version": 1})
+        if current:
+            raise precondition_failed(current)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Configuration not found"
+        )
     
-    # Get updated config
-    updated_config = await db.site_config.find_one({
-        "section": section_name,
-        "key": config_key
-    })
+    action = "create_site_config" if config["id"] == new_id else "update_site_config"
     
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
-        "action": "update_site_config",
-        "resource_id": updated_config["id"],
+        "action": action,
+        "resource_id": config["id"],
         "details": {"section": section_name, "key": config_key},
         "timestamp": datetime.utcnow()
     })
     
-    return SiteConfig(**updated_config)
+    response.headers["ETag"] = etag(config)
+    return SiteConfig(**config)
 
 @router.put("/bulk-update")
 async def bulk_update_content(
@@ -170,6 +162,7 @@ async def bulk_update_content(
                             "value": value,
                             "updated_at": datetime.utcnow()
                         },
+                        "$inc": {"version": 1},
                         "$setOnInsert": {
                             "id": f"{section_name}_{key}_{datetime.utcnow().timestamp()}",
                             "section": section_name,
@@ -181,7 +174,7 @@ async def bulk_update_content(
                 updated_count += 1
         
         # Log the action
-        await db.admin_logs.insert_one({
+        await log_action(db, {
             "username": current_user["username"],
             "action": "bulk_update_content",
             "details": {"sections": list(updates.keys()), "count": updated_count},
@@ -221,7 +214,7 @@ async def delete_section_config(
     })
     
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "delete_site_config",
         "resource_id": config["id"],
@@ -381,7 +374,7 @@ async def initialize_default_content(current_user: dict = Depends(get_current_us
             created_count += 1
     
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "initialize_default_content",
         "details": {"created_count": created_count},
@@ -391,4 +384,120 @@ async def initialize_default_content(current_user: dict = Depends(get_current_us
     return {
         "message": f"Initialized {created_count} default configurations",
         "total_configs": len(default_configs)
-    }
\ No newline at end of file
+    }
+
+@router.get("/revisions")
+async def get_content_revisions(
+    limit: int = 50,
+    before: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Content revision history, newest first (pass the last `revision` as `before` for the next page)"""
+    db = get_database()
+    limit = max(1, min(limit, 200))
+    revisions = await list_revisions(db, limit=limit, before=before)
+    return {"latest": await latest_revision(db), "revisions": revisions}
+
+@router.get("/revisions/{revision}")
+async def get_content_revision(revision: int, current_user: dict = Depends(get_current_user)):
+    """Full content as it was at a revision"""
+    db = get_database()
+    if not 1 <= revision <= await latest_revision(db):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Revision not found"
+        )
+    _, content = await load_content(db, revision)
+    return {"revision": revision, "content": content}
+
+@router.post("/revisions/{revision}/rollback")
+async def rollback_content(revision: int, current_user: dict = Depends(get_current_user)):
+    """Publish the content of a revision again (recorded as a new revision; replaces the draft)"""
+    db = get_database()
+    try:
+        result = await rollback(db, revision, current_user["username"])
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except PublishConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    
+    # Log the action
+    await log_action(db, {
+        "username": current_user["username"],
+        "action": "rollback_content",
+        "details": result,
+        "timestamp": datetime.utcnow()
+    })
+    
+    return result
+
+@router.get("/draft/changes")
+async def get_draft_changes(current_user: dict = Depends(get_current_user)):
+    """Edits in the draft that are not published yet"""
+    db = get_database()
+    set_entries, unset_entries = await draft_changes(db)
+    pointer = await get_pointer(db)
+    return {
+        "published_revision": pointer["revision"] if pointer else None,
+        "set": [{"section": section, "key": key, "value": value} for section, key, value in set_entries],
+        "unset": [{"section": section, "key": key} for section, key in unset_entries],
+    }
+
+@router.post("/draft/discard")
+async def discard_draft_changes(current_user: dict = Depends(get_current_user)):
+    """Reset the draft to the published content"""
+    db = get_database()
+    result = await discard_draft(db)
+    
+    # Log the action
+    await log_action(db, {
+        "username": current_user["username"],
+        "action": "discard_content_draft",
+        "details": result,
+        "timestamp": datetime.utcnow()
+    })
+    
+    return result
+
+@router.get("/published")
+async def get_published_content_info(current_user: dict = Depends(get_current_user)):
+    """Which revision and bundle the storefront is serving"""
+    pointer = await get_pointer(get_database())
+    if not pointer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nothing published yet"
+        )
+    pointer.pop("_id")
+    return pointer
+
+@router.post("/publish")
+async def publish_content(
+    expected_revision: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Publish the draft: every section goes live together (pass the reviewed `published_revision` as `expected_revision`)"""
+    db = get_database()
+    try:
+        result = await publish(db, current_user["username"], expected_revision=expected_revision)
+    except PublishConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    
+    # Log the action
+    await log_action(db, {
+        "username": current_user["username"],
+        "action": "publish_content",
+        "details": result,
+        "timestamp": datetime.utcnow()
+    })
+    
+    return result
@@ -1,30 +1,52 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Header, Response
+from typing import FrozenSet, List, Optional
 from datetime import datetime
+from pymongo import ReturnDocument
 
 from models.promotion import Promotion, PromotionCreate, PromotionUpdate
 from auth import get_current_user, get_database
+from audit import log_action
+from compression import precompress_file, remove_precompressed
+from concurrency import etag, is_stale, parse_if_match, precondition_failed, version_filter
+from cache import TTLCache
+from database import query_budget
+from outbox import notify_promotion
+import asyncio
 import uuid
 import os
 import shutil
 from pathlib import Path
 
-# Optional email notifications on promotion events
-try:
-    from ..email_service import send_promotion_notification
-except Exception:
-    # If relative import fails (when executed as module), try absolute path
-    try:
-        from email_service import send_promotion_notification
-    except Exception:
-        send_promotion_notification = None
 
 router = APIRouter(prefix="/api/admin/promotions", tags=["Admin Promotions"])
 
+# Granularity of the start_date facet in /search
+DATE_BUCKET_FORMATS = {"month": "%Y-%m", "year": "%Y"}
+# Facet counts in /search are reused for this long (writes through this worker clear them)
+SEARCH_FACET_TTL = float(os.environ.get("PROMOTION_SEARCH_FACET_TTL", "30"))
+# Covers every field the search filters and facets read (see indexes.py)
+SEARCH_FACETS_INDEX = "search_facets"
+
+search_facet_cache = TTLCache(ttl=SEARCH_FACET_TTL, max_entries=256)
+search_facet_cache.enabled = True
+
 # Create uploads directory if it doesn't exist
 UPLOAD_DIR = Path("uploads/promotions")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+
+async def _write_miss(db, promotion_id: str, expected_versions: Optional[FrozenSet[int]], default: HTTPException) -> HTTPException:
+    """Why a filtered write matched nothing: unknown id, stale If-Match, or `default`"""
+    current = await db.promotions.find_one({"id": promotion_id}, {"_id": 0, "version": 1})
+    if not current:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Promotion not found"
+        )
+    if is_stale(current, expected_versions):
+        return precondition_failed(current)
+    return default
+
 @router.get("/", response_model=List[Promotion])
 async def get_all_promotions(current_user: dict = Depends(get_current_user)):
     """Get all promotions (active and inactive)"""
@@ -45,8 +67,90 @@ async def get_active_promotions(current_user: dict = Depends(get_current_user)):
     promotions = await db.promotions.find(query).sort("created_at", -1).to_list(100)
     return [Promotion(**promo) for promo in promotions]
 
+@router.get("/search")
+async def search_promotions(
+    q: Optional[str] = None,
+    type: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    date_bucket: str = "month",
+    skip: int = 0,
+    limit: int = 20,
+    current_user: dict = Depends(get_current_user)
+):
+    """Full-text search (title, description, type, features) with exact facet counts.
+
+    `date_from`/`date_to` keep promotions running at some point of the range;
+    results are ranked by relevance when `q` is given, else newest first.
+    """
+    if date_bucket not in DATE_BUCKET_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"date_bucket must be one of: {', '.join(DATE_BUCKET_FORMATS)}"
+        )
+    db = get_database()
+    skip = max(skip, 0)
+    limit = max(1, min(limit, 100))
+    
+    match = {}
+    if q and q.strip():
+        match["$text"] = {"$search": q.strip()}
+    if type:
+        match["type"] = type
+    if is_active is not None:
+        match["is_active"] = is_active
+    if date_to:
+        match["start_date"] = {"$lte": date_to}
+    if date_from:
+        match["end_date"] = {"$gte": date_from}
+    
+    key = (q.strip() if q else None, type, is_active, date_from, date_to, date_bucket)
+    facets = search_facet_cache.get(key)
+    if facets is None:
+        facets = await _search_facets(db, match, date_bucket)
+        search_facet_cache.put(key, facets)
+
+    # The page alone: the text score, or the start_date index, orders it without a blocking sort
+    if "$text" in match:
+        order = [("score", {"$meta": "textScore"}), ("start_date", -1)]
+    else:
+        order = [("start_date", -1)]
+    page = await db.promotions.find(match, {"_id": 0}).sort(order).skip(skip).limit(limit).to_list(limit)
+
+    return {
+        # Every match has an is_active value (or none), so that facet adds up to the total
+        "total": sum(bucket["count"] for bucket in facets["is_active"]),
+        "skip": skip,
+        "limit": limit,
+        "results": [Promotion(**promo) for promo in page],
+        "facets": facets,
+    }
+
+async def _search_facets(db, match: dict, date_bucket: str) -> dict:
+    """Exact facet counts, one grouped aggregation per facet, run side by side"""
+    groups = {
+        "type": "$type",
+        "is_active": "$is_active",
+        "start_date": {"$dateToString": {"format": DATE_BUCKET_FORMATS[date_bucket], "date": "$start_date"}},
+    }
+    orders = {"type": {"count": -1, "_id": 1}, "is_active": {"_id": 1}, "start_date": {"_id": -1}}
+    # Without $text the compound index holds every field used, so each facet is a covered index scan
+    options = {} if "$text" in match else {"hint": SEARCH_FACETS_INDEX}
+
+    async def facet(name: str):
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": groups[name], "count": {"$sum": 1}}},
+            {"$sort": orders[name]},
+        ]
+        buckets = await db.promotions.aggregate(pipeline, **options).to_list(None)
+        return name, [{"value": bucket["_id"], "count": bucket["count"]} for bucket in buckets]
+
+    return dict(await asyncio.gather(*(facet(name) for name in groups)))
+
 @router.get("/{promotion_id}", response_model=Promotion)
-async def get_promotion(promotion_id: str, current_user: dict = Depends(get_current_user)):
+async def get_promotion(promotion_id: str, response: Response, current_user: dict = Depends(get_current_user)):
     """Get specific promotion"""
     db = get_database()
     promotion = await db.promotions.find_one({"id": promotion_id})
@@ -55,6 +159,7 @@ async def get_promotion(promotion_id: str, current_user: dict = Depends(get_curr
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Promotion not found"
         )
+    response.headers["ETag"] = etag(promotion)
     return Promotion(**promotion)
 
 @router.post("/", response_model=Promotion)
@@ -78,9 +183,10 @@ async def create_promotion(
     
     promotion_obj = Promotion(**promotion_dict)
     result = await db.promotions.insert_one(promotion_obj.dict())
+    search_facet_cache.clear()
     
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "create_promotion",
         "resource_id": promotion_obj.id,
@@ -88,16 +194,8 @@ async def create_promotion(
         "timestamp": datetime.utcnow()
     })
 
-    # Notify via email (best-effort)
-    if send_promotion_notification:
-        try:
-            await send_promotion_notification(
-                db=db,
-                event="created",
-                promotion=promotion_obj.dict()
-            )
-        except Exception:
-            pass
+    # Queue an email notification (delivered in the background by the outbox)
+    await notify_promotion(db, "created", promotion_obj.dict(), current_user["username"])
     
     return promotion_obj
 
@@ -105,42 +203,46 @@ async def create_promotion(
 async def update_promotion(
     promotion_id: str,
     promotion_update: PromotionUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Update existing promotion"""
+    """Update existing promotion in one atomic round-trip (honours If-Match)"""
     db = get_database()
-    # Check if promotion exists
-    existing_promotion = await db.promotions.find_one({"id": promotion_id})
-    if not existing_promotion:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Promotion not found"
-        )
+    expected_versions = parse_if_match(if_match)
     
     # Prepare update data
     update_data = {k: v for k, v in promotion_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    # Validate dates if provided
-    start_date = update_data.get("start_date", existing_promotion["start_date"])
-    end_date = update_data.get("end_date", existing_promotion["end_date"])
-    if start_date >= end_date:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Start date must be before end date"
-        )
-    
-    # Update promotion
-    await db.promotions.update_one(
-        {"id": promotion_id},
-        {"$set": update_data}
+    # Validate dates: directly when both change, otherwise against the stored one in the filter
+    query = {"id": promotion_id, **version_filter(expected_versions)}
+    start_date = update_data.get("start_date")
+    end_date = update_data.get("end_date")
+    invalid_dates = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Start date must be before end date"
     )
+    if start_date and end_date:
+        if start_date >= end_date:
+            raise invalid_dates
+    elif start_date:
+        query["end_date"] = {"$gt": start_date}
+    elif end_date:
+        query["start_date"] = {"$lt": end_date}
     
-    # Get updated promotion
-    updated_promotion = await db.promotions.find_one({"id": promotion_id})
+    # Update promotion and get the post-image
+    updated_promotion = await db.promotions.find_one_and_update(
+        query,
+        {"$set": update_data, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_promotion:
+        raise await _write_miss(db, promotion_id, expected_versions, invalid_dates)
+    search_facet_cache.clear()
     
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "update_promotion",
         "resource_id": promotion_id,
@@ -148,32 +250,29 @@ async def update_promotion(
         "timestamp": datetime.utcnow()
     })
 
-    # Notify via email (best-effort)
-    if send_promotion_notification and any(k in update_data for k in ["title", "discount", "start_date", "end_date", "is_active"]):
-        try:
-            await send_promotion_notification(
-                db=db,
-                event="updated",
-                promotion=updated_promotion
-            )
-        except Exception:
-            pass
+    # Queue an email notification (delivered in the background by the outbox)
+    if any(k in update_data for k in ["title", "discount", "start_date", "end_date", "is_active"]):
+        await notify_promotion(db, "updated", updated_promotion, current_user["username"])
     
+    response.headers["ETag"] = etag(updated_promotion)
     return Promotion(**updated_promotion)
 
 @router.delete("/{promotion_id}")
 async def delete_promotion(
     promotion_id: str,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Delete promotion"""
+    """Delete promotion (atomically; honours If-Match)"""
     db = get_database()
-    promotion = await db.promotions.find_one({"id": promotion_id})
+    expected_versions = parse_if_match(if_match)
+    promotion = await db.promotions.find_one_and_delete({"id": promotion_id, **version_filter(expected_versions)})
     if not promotion:
-        raise HTTPException(
+        raise await _write_miss(db, promotion_id, expected_versions, HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Promotion not found"
-        )
+        ))
+    search_facet_cache.clear()
     
     # Delete associated image file if exists
     if promotion.get("image_url"):
@@ -181,14 +280,12 @@ async def delete_promotion(
             image_path = Path(promotion["image_url"].replace("/uploads/", "uploads/"))
             if image_path.exists():
                 image_path.unlink()
+            remove_precompressed(image_path)
         except Exception as e:
             print(f"Error deleting image file: {e}")
     
-    # Delete from database
-    await db.promotions.delete_one({"id": promotion_id})
-    
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "delete_promotion",
         "resource_id": promotion_id,
@@ -196,16 +293,8 @@ async def delete_promotion(
         "timestamp": datetime.utcnow()
     })
 
-    # Notify via email (best-effort)
-    if send_promotion_notification:
-        try:
-            await send_promotion_notification(
-                db=db,
-                event="deleted",
-                promotion=promotion
-            )
-        except Exception:
-            pass
+    # Queue an email notification (delivered in the background by the outbox)
+    await notify_promotion(db, "deleted", promotion, current_user["username"])
     
     return {"message": "Promotion deleted successfully"}
 
@@ -218,7 +307,8 @@ async def upload_promotion_image(
     """Upload image for promotion"""
     db = get_database()
     # Check if promotion exists
-    promotion = await db.promotions.find_one({"id": promotion_id})
+    with query_budget():
+        promotion = await db.promotions.find_one({"id": promotion_id})
     if not promotion:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -244,6 +334,7 @@ async def upload_promotion_image(
             old_image_path = Path(promotion["image_url"].replace("/uploads/", "uploads/"))
             if old_image_path.exists():
                 old_image_path.unlink()
+            remove_precompressed(old_image_path)
         except Exception as e:
             print(f"Error deleting old image: {e}")
     
@@ -251,6 +342,7 @@ async def upload_promotion_image(
     try:
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
+        precompress_file(file_path)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -259,19 +351,20 @@ async def upload_promotion_image(
     
     # Update promotion with image URL
     image_url = f"/uploads/promotions/{filename}"
-    await db.promotions.update_one(
-        {"id": promotion_id},
-        {"$set": {"image_url": image_url, "updated_at": datetime.utcnow()}}
-    )
-    
-    # Log the action
-    await db.admin_logs.insert_one({
-        "username": current_user["username"],
-        "action": "upload_promotion_image",
-        "resource_id": promotion_id,
-        "details": {"filename": filename},
-        "timestamp": datetime.utcnow()
-    })
+    with query_budget():
+        await db.promotions.update_one(
+            {"id": promotion_id},
+            {"$set": {"image_url": image_url, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
+        )
+        
+        # Log the action
+        await log_action(db, {
+            "username": current_user["username"],
+            "action": "upload_promotion_image",
+            "resource_id": promotion_id,
+            "details": {"filename": filename},
+            "timestamp": datetime.utcnow()
+        })
     
     return {
         "message": "Image uploaded successfully",
@@ -288,11 +381,12 @@ async def bulk_activate_promotions(
     db = get_database()
     result = await db.promotions.update_many(
         {"id": {"$in": promotion_ids}},
-        {"$set": {"is_active": True, "updated_at": datetime.utcnow()}}
+        {"$set": {"is_active": True, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
     )
+    search_facet_cache.clear()
     
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "bulk_activate_promotions",
         "details": {"count": result.modified_count, "ids": promotion_ids},
@@ -310,11 +404,12 @@ async def bulk_deactivate_promotions(
     db = get_database()
     result = await db.promotions.update_many(
         {"id": {"$in": promotion_ids}},
-        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
+        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
     )
+    search_facet_cache.clear()
     
     # Log the action
-    await db.admin_logs.insert_one({
+    await log_action(db, {
         "username": current_user["username"],
         "action": "bulk_deactivate_promotions",
         "details": {"count": result.modified_count, "ids": promotion_ids},
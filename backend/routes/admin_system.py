@@ -1,32 +1,218 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.responses import FileResponse
-from typing import List, Dict
-from datetime import datetime
+from fastapi.responses import FileResponse, PlainTextResponse
+from typing import List, Dict, Optional
+from datetime import datetime, timedelta
 from pathlib import Path
+import asyncio
+import base64
+import json
+import re
 import shutil
 import os
+import threading
+import uuid
 
+from bson import ObjectId
+
+import scheduler
 from auth import get_current_user, get_database
+from database import QUERY_TIMEOUTS_MS, DEFAULT_QUERY_TIMEOUT_MS, pool_metrics
+from loop_watchdog import loop_watchdog
+from outbox import outbox_status, requeue
+from profiler import PROFILE_MAX_SECONDS, PROFILE_MIN_INTERVAL_MS, sampling_profiler
+from compression import precompress_file, remove_precompressed
+from backup_jobs import BACKUP_COMPRESSION_LEVEL, backup_jobs, write_zip
+from backup_store import create_snapshot, delete_snapshot, list_manifests, load_manifest, prune_snapshots, restore_snapshot
+from rollups import backfill_reports, day_key, get_reports, get_rollups
+from db_dump import DUMP_FORMATS, create_dump, delete_dump, dump_chain, list_dumps, restore_dump
 
 router = APIRouter(prefix="/api/admin/system", tags=["Admin System"])
 
 BACKUPS_DIR = Path("uploads/backups")
 BACKUPS_DIR.mkdir(parents=True, exist_ok=True)
+SNAPSHOT_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+LOG_FIELDS = {"username", "action", "resource_id", "details", "timestamp", "ip_address", "success"}
+MAX_LOG_PAGE = 500
+
+
+def _encode_log_cursor(timestamp: datetime, log_id: str) -> str:
+    raw = json.dumps({"t": timestamp.isoformat(), "id": log_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_log_cursor(cursor: str) -> Dict:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {"timestamp": datetime.fromisoformat(data["t"]), "_id": ObjectId(data["id"])}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.get("/logs/login")
 async def get_login_logs(limit: int = 50, current_user: dict = Depends(get_current_user)):
     """Return recent login attempts from admin_logs."""
     db = get_database()
-    cursor = db.admin_logs.find({"action": "login_attempt"}).sort("timestamp", -1).limit(limit)
-    logs = await cursor.to_list(length=limit)
-    # Normalize ObjectId etc.
-    for l in logs:
-        l["id"] = str(l.get("_id"))
-        l.pop("_id", None)
+    pipeline = [
+        {"$match": {"action": "login_attempt"}},
+        {"$sort": {"timestamp": -1}},
+        {"$limit": limit},
+        # Normalize ObjectId server-side
+        {"$addFields": {"id": {"$toString": "$_id"}}},
+        {"$project": {"_id": 0}},
+    ]
+    logs = await db.admin_logs.aggregate(pipeline).to_list(length=limit)
     return {"logs": logs}
 
 
+@router.get("/logs")
+async def query_admin_logs(
+    username: Optional[str] = None,
+    action: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Query the audit log with filters, field projection and keyset pagination.
+
+    Results are ordered by (timestamp, _id) descending; pass `next_cursor`
+    back as `cursor` to fetch the following page.
+    """
+    db = get_database()
+    limit = max(1, min(limit, MAX_LOG_PAGE))
+
+    match: Dict = {}
+    if username:
+        match["username"] = username
+    if action:
+        match["action"] = action
+    if resource_id:
+        match["resource_id"] = resource_id
+    if since or until:
+        match["timestamp"] = {}
+        if since:
+            match["timestamp"]["$gte"] = since
+        if until:
+            match["timestamp"]["$lt"] = until
+    if cursor:
+        after = _decode_log_cursor(cursor)
+        match["$or"] = [
+            {"timestamp": {"$lt": after["timestamp"]}},
+            {"timestamp": after["timestamp"], "_id": {"$lt": after["_id"]}},
+        ]
+
+    projection: Dict = {"_id": 0, "id": {"$toString": "$_id"}, "timestamp": 1}
+    selected = LOG_FIELDS
+    if fields:
+        selected = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = selected - LOG_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    for field in selected:
+        projection[field] = 1
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"timestamp": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": projection},
+    ]
+    logs = await db.admin_logs.aggregate(pipeline).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        last = logs[-1]
+        next_cursor = _encode_log_cursor(last["timestamp"], last["id"])
+    if fields and "timestamp" not in selected:
+        for log in logs:
+            log.pop("timestamp", None)
+
+    return {"logs": logs, "count": len(logs), "next_cursor": next_cursor}
+
+
+@router.get("/logs/stats/actions-per-user")
+async def get_actions_per_user_per_day(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    username: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Count admin actions per user per day (with a per-action breakdown), computed in Mongo."""
+    db = get_database()
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(days=30)
+    match: Dict = {"timestamp": {"$gte": since, "$lt": until}}
+    if username:
+        match["username"] = username
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "username": "$username",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                "action": "$action",
+            },
+            "count": {"$sum": 1},
+        }},
+        {"$group": {
+            "_id": {"username": "$_id.username", "day": "$_id.day"},
+            "total": {"$sum": "$count"},
+            "actions": {"$push": {"action": "$_id.action", "count": "$count"}},
+        }},
+        {"$project": {"_id": 0, "username": "$_id.username", "day": "$_id.day", "total": 1, "actions": 1}},
+        {"$sort": {"day": -1, "username": 1}},
+    ]
+    rows = await db.admin_logs.aggregate(pipeline).to_list(length=None)
+    return {"since": since, "until": until, "rows": rows}
+
+
+@router.get("/logs/stats/failed-logins")
+async def get_failed_logins_per_ip(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 50,
+    current_user: dict = Depends(get_current_user)
+):
+    """Count failed login attempts per IP address, computed in Mongo."""
+    db = get_database()
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(days=1)
+
+    pipeline = [
+        {"$match": {
+            "action": "login_attempt",
+            "success": False,
+            "timestamp": {"$gte": since, "$lt": until},
+        }},
+        {"$group": {
+            "_id": "$ip_address",
+            "failed_attempts": {"$sum": 1},
+            "usernames": {"$addToSet": "$username"},
+            "first_attempt": {"$min": "$timestamp"},
+            "last_attempt": {"$max": "$timestamp"},
+        }},
+        {"$sort": {"failed_attempts": -1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "ip_address": "$_id",
+            "failed_attempts": 1,
+            "usernames": 1,
+            "first_attempt": 1,
+            "last_attempt": 1,
+        }},
+    ]
+    rows = await db.admin_logs.aggregate(pipeline).to_list(length=limit)
+    return {"since": since, "until": until, "rows": rows}
+
+
 @router.get("/backups")
 async def list_backups(current_user: dict = Depends(get_current_user)):
     items = []
@@ -43,41 +229,140 @@ async def list_backups(current_user: dict = Depends(get_current_user)):
     return {"backups": items}
 
 
-@router.post("/backups/create")
-async def create_backup(current_user: dict = Depends(get_current_user)):
-    """Create a zip backup of the frontend directory."""
+def _run_frontend_backup(job, src_dir: Path, dest: Path, compression_level: int):
+    result = write_zip(job, src_dir, dest, compression_level)
+    precompress_file(dest)
+    return result
+
+
+@router.post("/backups/create", status_code=status.HTTP_202_ACCEPTED)
+async def create_backup(
+    compression_level: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Start a background job that zips the frontend directory."""
+    level = BACKUP_COMPRESSION_LEVEL if compression_level is None else compression_level
+    if not 0 <= level <= 9:
+        raise HTTPException(status_code=400, detail="compression_level must be between 0 and 9")
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    base_name = BACKUPS_DIR / f"frontend_{timestamp}"
+    dest = BACKUPS_DIR / f"frontend_{timestamp}.zip"
     src_dir = Path("frontend")
     if not src_dir.exists():
         raise HTTPException(status_code=404, detail="Frontend directory not found")
-    try:
-        archive_path = shutil.make_archive(str(base_name), "zip", root_dir=str(src_dir))
-        fname = Path(archive_path).name
-        return {"message": "Backup created", "filename": fname}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating backup: {str(e)}")
+    job = await backup_jobs.submit(
+        "frontend_backup",
+        _run_frontend_backup,
+        src_dir,
+        dest,
+        level,
+        params={"filename": dest.name, "compression_level": level},
+    )
+    return {"message": "Backup started", "job_id": job.id, "filename": dest.name, "status": job.status}
+
+
+@router.get("/backups/jobs")
+async def list_backup_jobs(current_user: dict = Depends(get_current_user)):
+    """List recent backup jobs with their progress."""
+    return {"jobs": await backup_jobs.list()}
+
+
+@router.get("/backups/jobs/{job_id}")
+async def get_backup_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Return status and progress of a backup job."""
+    job = await backup_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Backup job not found")
+    return job
+
+
+def _take_safety_snapshot(dest: Path):
+    """Cheap safety copy: a manifest whose unchanged files are already in the store"""
+    if not dest.exists():
+        return None
+    # Two restores can start within the same second
+    name = f"safety_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    create_snapshot(None, dest, name, kind="safety")
+    return load_manifest(name)
+
+
+def _run_zip_restore(job, zip_path: Path, dest: Path):
+    safety = _take_safety_snapshot(dest)
+    # Archive entries are relative to the frontend directory
+    if dest.exists():
+        shutil.rmtree(dest)
+    shutil.unpack_archive(str(zip_path), extract_dir=str(dest))
+    # Prune only once the restore is done, so a failed one can still be undone
+    prune_snapshots(dest.name, kind="safety")
+    return {"restored": zip_path.name, "safety_snapshot": safety["name"] if safety else None}
+
+
+def _run_snapshot_restore(job, name: str, dest: Path):
+    safety = _take_safety_snapshot(dest)
+    result = restore_snapshot(job, name, dest, current=safety)
+    # After the restore: the restored snapshot may itself be an old safety snapshot
+    prune_snapshots(dest.name, kind="safety", exclude=(name,))
+    result["safety_snapshot"] = safety["name"] if safety else None
+    return result
 
 
 @router.post("/backups/restore")
 async def restore_backup(filename: str, current_user: dict = Depends(get_current_user)):
     """Restore the frontend directory from a backup zip."""
-    zip_path = BACKUPS_DIR / filename
+    zip_path = BACKUPS_DIR / Path(filename).name
     if not zip_path.exists():
         raise HTTPException(status_code=404, detail="Backup not found")
     dest = Path("frontend")
+    job = await backup_jobs.submit("frontend_restore", _run_zip_restore, zip_path, dest, params={"filename": zip_path.name})
+    await asyncio.wrap_future(job.future)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Error restoring backup: {job.error}")
+    return {"message": "Restored successfully", **job.result}
+
+
+@router.get("/snapshots")
+async def list_snapshots(current_user: dict = Depends(get_current_user)):
+    """List incremental snapshots of the frontend directory."""
+    snapshots = await asyncio.to_thread(list_manifests, "frontend")
+    return {"snapshots": snapshots}
+
+
+@router.post("/snapshots/create", status_code=status.HTTP_202_ACCEPTED)
+async def create_frontend_snapshot(current_user: dict = Depends(get_current_user)):
+    """Start an incremental, deduplicated snapshot of the frontend directory."""
+    src_dir = Path("frontend")
+    if not src_dir.exists():
+        raise HTTPException(status_code=404, detail="Frontend directory not found")
+    name = f"snapshot_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+    job = await backup_jobs.submit("frontend_snapshot", create_snapshot, src_dir, name, params={"name": name})
+    return {"message": "Snapshot started", "job_id": job.id, "name": name, "status": job.status}
+
+
+@router.post("/snapshots/restore")
+async def restore_frontend_snapshot(name: str, current_user: dict = Depends(get_current_user)):
+    """Restore the frontend directory from a snapshot, rewriting only changed files."""
+    if not SNAPSHOT_NAME_RE.match(name):
+        raise HTTPException(status_code=400, detail="Invalid snapshot name")
     try:
-        # optional: create safety copy
-        safety_dir = BACKUPS_DIR / f"safety_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
-        if dest.exists():
-            shutil.copytree(dest, safety_dir / "frontend")
-        # remove current and unpack
-        if dest.exists():
-            shutil.rmtree(dest)
-        shutil.unpack_archive(str(zip_path), extract_dir=str(dest.parent))
-        return {"message": "Restored successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error restoring backup: {str(e)}")
+        await asyncio.to_thread(load_manifest, name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    job = await backup_jobs.submit("frontend_snapshot_restore", _run_snapshot_restore, name, Path("frontend"), params={"name": name})
+    await asyncio.wrap_future(job.future)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Error restoring snapshot: {job.error}")
+    return {"message": "Restored successfully", **job.result}
+
+
+@router.delete("/snapshots/{name}")
+async def delete_frontend_snapshot(name: str, current_user: dict = Depends(get_current_user)):
+    """Delete a snapshot and garbage-collect blobs nothing references anymore."""
+    if not SNAPSHOT_NAME_RE.match(name):
+        raise HTTPException(status_code=400, detail="Invalid snapshot name")
+    try:
+        removed_blobs = await asyncio.to_thread(delete_snapshot, name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return {"message": "Snapshot deleted", "removed_blobs": removed_blobs}
 
 
 @router.delete("/backups/{filename}")
@@ -87,8 +372,204 @@ async def delete_backup(filename: str, current_user: dict = Depends(get_current_
         raise HTTPException(status_code=404, detail="Backup not found")
     try:
         p.unlink()
+        remove_precompressed(p)
         return {"message": "Backup deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting backup: {str(e)}")
 
 
+@router.get("/db-dumps")
+async def list_database_dumps(current_user: dict = Depends(get_current_user)):
+    """List logical database dumps, newest first."""
+    dumps = await asyncio.to_thread(list_dumps)
+    return {"dumps": dumps}
+
+
+@router.post("/db-dumps/create", status_code=status.HTTP_202_ACCEPTED)
+async def create_database_dump(
+    mode: str = "full",
+    format: str = "ndjson",
+    current_user: dict = Depends(get_current_user)
+):
+    """Start a streaming export of the business collections (full or incremental)."""
+    if mode not in ("full", "incremental"):
+        raise HTTPException(status_code=400, detail="mode must be 'full' or 'incremental'")
+    if format not in DUMP_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(DUMP_FORMATS)}")
+    if mode == "incremental" and not await asyncio.to_thread(list_dumps):
+        raise HTTPException(status_code=400, detail="Incremental dump requires a previous dump")
+    db = get_database()
+    job = await backup_jobs.submit_async("db_dump", create_dump, db, mode, format, params={"mode": mode, "format": format})
+    return {"message": "Database dump started", "job_id": job.id, "status": job.status}
+
+
+@router.post("/db-dumps/restore", status_code=status.HTTP_202_ACCEPTED)
+async def restore_database_dump(
+    name: str,
+    drop: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """Start restoring a dump (with its incremental chain) using insert_many batches."""
+    if not SNAPSHOT_NAME_RE.match(name):
+        raise HTTPException(status_code=400, detail="Invalid dump name")
+    try:
+        await asyncio.to_thread(dump_chain, name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Dump not found")
+    db = get_database()
+    job = await backup_jobs.submit_async("db_restore", restore_dump, db, name, drop, params={"name": name, "drop": drop})
+    return {"message": "Database restore started", "job_id": job.id, "status": job.status}
+
+
+@router.delete("/db-dumps/{name}")
+async def delete_database_dump(name: str, current_user: dict = Depends(get_current_user)):
+    if not SNAPSHOT_NAME_RE.match(name):
+        raise HTTPException(status_code=400, detail="Invalid dump name")
+    try:
+        await asyncio.to_thread(delete_dump, name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Dump not found")
+    return {"message": "Dump deleted"}
+
+
+def _parse_day(value: Optional[str], default: datetime) -> str:
+    if not value:
+        return day_key(default)
+    try:
+        return day_key(datetime.strptime(value, "%Y-%m-%d"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must use YYYY-MM-DD")
+
+
+@router.get("/reports")
+async def get_daily_reports(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Daily reports in a date range (YYYY-MM-DD, inclusive; default last 30 days)."""
+    db = get_database()
+    now = datetime.utcnow()
+    end_day = _parse_day(end, now)
+    start_day = _parse_day(start, now - timedelta(days=30))
+    return {"reports": await get_reports(db, start_day, end_day)}
+
+
+@router.get("/metrics/daily")
+async def get_daily_metrics(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Per-day, per-action counters maintained as audit events are written."""
+    db = get_database()
+    now = datetime.utcnow()
+    end_day = _parse_day(end, now)
+    start_day = _parse_day(start, now - timedelta(days=30))
+    return {"metrics": await get_rollups(db, start_day, end_day)}
+
+
+@router.post("/reports/backfill")
+async def backfill_daily_reports(
+    start: str,
+    end: Optional[str] = None,
+    rebuild: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """(Re)build reports for past dates; `rebuild` recomputes rollups from admin_logs."""
+    db = get_database()
+    start_day = _parse_day(start, datetime.utcnow())
+    end_day = _parse_day(end, datetime.utcnow())
+    if start_day > end_day:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (datetime.strptime(end_day, "%Y-%m-%d") - datetime.strptime(start_day, "%Y-%m-%d")).days > 366:
+        raise HTTPException(status_code=400, detail="Backfill range is limited to one year")
+    days, skipped = await backfill_reports(db, start_day, end_day, rebuild=rebuild)
+    return {"message": f"Generated {len(days)} reports", "days": days, "skipped": skipped}
+
+
+@router.get("/scheduler")
+async def get_scheduler_status(current_user: dict = Depends(get_current_user)):
+    """Leader-election state and cron jobs of the background scheduler as seen by this instance."""
+    instance = scheduler.scheduler_instance
+    if instance is None:
+        return {"running": False}
+    db = get_database()
+    persisted = {
+        doc["_id"]: doc
+        async for doc in db.scheduler_jobs.find({}, {"_id": 1, "last_run_at": 1, "last_duration_ms": 1, "last_status": 1, "last_error": 1})
+    }
+    jobs = [
+        {**job, **{k: v for k, v in persisted.get(job["name"], {}).items() if k != "_id"}}
+        for job in instance.cron.status()
+    ]
+    return {"running": instance.running, **await instance.election.status(), "jobs": jobs}
+
+
+@router.get("/outbox")
+async def get_outbox_status(current_user: dict = Depends(get_current_user)):
+    """Notification outbox: messages per status and the latest dead letters."""
+    return await outbox_status(get_database())
+
+
+@router.post("/outbox/requeue")
+async def requeue_outbox_messages(message_id: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Retry dead-lettered notifications (one by `message_id`, or all)."""
+    requeued = await requeue(get_database(), message_id)
+    if message_id and not requeued:
+        raise HTTPException(status_code=404, detail="Dead-lettered message not found")
+    return {"requeued": requeued}
+
+
+@router.get("/database/pool")
+async def get_database_pool_stats(current_user: dict = Depends(get_current_user)):
+    """Connection pool occupancy and checkout wait times for this worker."""
+    return {
+        **pool_metrics.snapshot(),
+        "query_timeouts_ms": {**dict(QUERY_TIMEOUTS_MS), "default": DEFAULT_QUERY_TIMEOUT_MS},
+    }
+
+
+@router.get("/event-loop/blocks")
+async def get_event_loop_blocks(current_user: dict = Depends(get_current_user)):
+    """Recent event-loop stalls on this worker, with the blocking stack and route."""
+    return loop_watchdog.status()
+
+
+@router.post("/profile")
+async def profile_worker(
+    seconds: float = 10,
+    interval_ms: float = 10,
+    route: Optional[str] = None,
+    all_threads: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """Sample this worker's stacks for `seconds` and return them as collapsed stacks (flamegraph input).
+
+    `route` keeps only event-loop samples taken while a matching route
+    (substring of e.g. "GET /api/public/promotions/active") was running.
+    """
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {PROFILE_MAX_SECONDS:g}")
+    if sampling_profiler.running:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+    interval_ms = max(interval_ms, PROFILE_MIN_INTERVAL_MS)
+
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(
+            None, sampling_profiler.run, seconds, interval_ms, loop, threading.get_ident(), route, all_threads
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    filename = f"profile_{os.getpid()}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.collapsed"
+    return PlainTextResponse(
+        result["collapsed"],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Profile-Samples": str(result["samples"]),
+            "X-Profile-Matched": str(result["matched"]),
+            "X-Profile-Seconds": str(result["seconds"]),
+        },
+    )
@@ -6,10 +6,13 @@ import os
 import shutil
 from pathlib import Path
 import uuid
-from PIL import Image
 import io
 
 from auth import get_current_user, get_database
+from database import query_budget
+from audit import log_action
+from compression import precompress_file, remove_precompressed
+from metrics import IMAGE_OPTIMIZE
 
 router = APIRouter(prefix="/api/admin/upload", tags=["Admin File Upload"])
 
@@ -45,6 +48,8 @@ def validate_mime_type(file: UploadFile) -> bool:
 
 def optimize_image(image_content: bytes, max_width: int = 1200, quality: int = 85) -> bytes:
     """Optimize image for web use"""
+    # Pillow is heavy to import; load it on the first upload only
+    from PIL import Image
     try:
         # Open image
         image = Image.open(io.BytesIO(image_content))
@@ -103,7 +108,8 @@ async def upload_image(
         
         # Optimize image if requested
         if optimize:
-            content = optimize_image(content)
+            with IMAGE_OPTIMIZE.time():
+                content = optimize_image(content)
             file_ext = ".jpg"  # Always save optimized as JPEG
         else:
             file_ext = Path(file.filename).suffix.lower()
@@ -118,24 +124,26 @@ async def upload_image(
         # Save file
         with open(file_path, "wb") as f:
             f.write(content)
+        precompress_file(file_path)
         
         # Create URL for frontend access
         file_url = f"/uploads/{category}/{unique_filename}"
         
-        # Log upload
+        # Log upload (the query budget starts now, not when the upload began)
         db = get_database()
-        await db.admin_logs.insert_one({
-            "username": current_user["username"],
-            "action": "upload_image",
-            "details": {
-                "filename": file.filename,
-                "saved_as": unique_filename,
-                "category": category,
-                "size": len(content),
-                "optimized": optimize
-            },
-            "timestamp": datetime.utcnow()
-        })
+        with query_budget():
+            await log_action(db, {
+                "username": current_user["username"],
+                "action": "upload_image",
+                "details": {
+                    "filename": file.filename,
+                    "saved_as": unique_filename,
+                    "category": category,
+                    "size": len(content),
+                    "optimized": optimize
+                },
+                "timestamp": datetime.utcnow()
+            })
         
         return {
             "success": True,
@@ -190,7 +198,8 @@ async def upload_multiple_images(
                 continue
             
             if optimize:
-                content = optimize_image(content)
+                with IMAGE_OPTIMIZE.time():
+                    content = optimize_image(content)
                 file_ext = ".jpg"
             else:
                 file_ext = Path(file.filename).suffix.lower()
@@ -201,6 +210,7 @@ async def upload_multiple_images(
             
             with open(file_path, "wb") as f:
                 f.write(content)
+            precompress_file(file_path)
             
             file_url = f"/uploads/{category}/{unique_filename}"
             
@@ -220,17 +230,18 @@ async def upload_multiple_images(
     
     # Log bulk upload
     db = get_database()
-    await db.admin_logs.insert_one({
-        "username": current_user["username"],
-        "action": "bulk_upload_images",
-        "details": {
-            "total_files": len(files),
-            "successful": len(results),
-            "failed": len(errors),
-            "category": category
-        },
-        "timestamp": datetime.utcnow()
-    })
+    with query_budget():
+        await log_action(db, {
+            "username": current_user["username"],
+            "action": "bulk_upload_images",
+            "details": {
+                "total_files": len(files),
+                "successful": len(results),
+                "failed": len(errors),
+                "category": category
+            },
+            "timestamp": datetime.utcnow()
+        })
     
     return {
         "success": len(results),
@@ -257,10 +268,11 @@ async def delete_image(
     
     try:
         file_path.unlink()  # Delete file
+        remove_precompressed(file_path)
         
         # Log deletion
         db = get_database()
-        await db.admin_logs.insert_one({
+        await log_action(db, {
             "username": current_user["username"],
             "action": "delete_image",
             "details": {
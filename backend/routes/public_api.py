@@ -1,17 +1,23 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, Response, status
 from typing import List, Dict, Any
 from datetime import datetime
+from pymongo.errors import PyMongoError
 
 from models.promotion import Promotion
 from models.brand import Brand
-from auth import get_database
+from database import get_database, get_read_database
+from cache import cached
+from circuit_breaker import public_db_breaker, stale_fallback
+from content_bundles import published_bundle
 
 router = APIRouter(prefix="/api/public", tags=["Public API"])
 
 @router.get("/promotions/active", response_model=List[Promotion])
+@stale_fallback()
+@cached()
 async def get_active_promotions():
     """Get currently active promotions (public endpoint)"""
-    db = get_database()
+    db = get_read_database()
     now = datetime.utcnow()
     query = {
         "is_active": True,
@@ -23,72 +29,67 @@ async def get_active_promotions():
     return [Promotion(**promo) for promo in promotions]
 
 @router.get("/brands/active", response_model=List[Brand])
+@stale_fallback()
+@cached()
 async def get_active_brands():
     """Get active brands (public endpoint)"""
-    db = get_database()
+    db = get_read_database()
     brands = await db.brands.find({"is_active": True}).sort("order", 1).to_list(100)
     return [Brand(**brand) for brand in brands]
 
+# Content endpoints serve the pre-encoded JSON of the published bundle
+# (see content_bundles); the bundle id is the ETag, so it changes once per publish
+
+def _not_modified(request: Request, etag: str) -> bool:
+    # CompressionMiddleware tags encoded variants as "<etag>-<encoding>"
+    for tag in request.headers.get("if-none-match", "").split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag == etag or tag.startswith(etag[:-1] + "-"):
+            return True
+    return False
+
+def _bundle_response(request: Request, bundle, payload: bytes) -> Response:
+    headers = {"ETag": bundle.etag}
+    if _not_modified(request, bundle.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
 @router.get("/content/{section_name}")
-async def get_section_content(section_name: str):
+async def get_section_content(section_name: str, request: Request):
     """Get public content for a specific section"""
-    db = get_database()
-    configs = await db.site_config.find({"section": section_name}).to_list(100)
-    
-    if not configs:
-        return {}
-    
-    section_content = {}
-    for config in configs:
-        section_content[config["key"]] = config["value"]
-    
-    return section_content
+    bundle = await published_bundle.get(get_read_database())
+    return _bundle_response(request, bundle, bundle.section(section_name))
 
 @router.get("/content")
-async def get_all_public_content():
+async def get_all_public_content(request: Request):
     """Get all public content organized by sections"""
-    db = get_database()
-    sections = {}
-    configs = await db.site_config.find().to_list(1000)
-    
-    for config in configs:
-        section = config["section"]
-        if section not in sections:
-            sections[section] = {}
-        sections[section][config["key"]] = config["value"]
-    
-    return sections
+    bundle = await published_bundle.get(get_read_database())
+    return _bundle_response(request, bundle, bundle.all)
 
 @router.get("/site-info")
-async def get_site_info():
+async def get_site_info(request: Request):
     """Get basic site information for SEO and metadata"""
-    db = get_database()
-    header_content = await db.site_config.find({"section": "header"}).to_list(10)
-    general_content = await db.site_config.find({"section": "general"}).to_list(10)
-    
-    site_info = {}
-    for config in header_content + general_content:
-        site_info[config["key"]] = config["value"]
-    
-    # Add some computed fields
-    site_info["last_updated"] = datetime.utcnow()
-    
-    return site_info
+    bundle = await published_bundle.get(get_read_database())
+    return _bundle_response(request, bundle, bundle.site_info)
 
 @router.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (a cheap ping, which also probes the public DB circuit)"""
     try:
         # Test database connection
         db = get_database()
-        await db.list_collection_names()
+        await db.command("ping")
+        public_db_breaker.record_success()
         return {
             "status": "healthy",
             "timestamp": datetime.utcnow(),
-            "database": "connected"
+            "database": "connected",
+            "circuit": public_db_breaker.state
         }
     except Exception as e:
+        if isinstance(e, PyMongoError):
+            public_db_breaker.record_failure()
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Database connection failed: {str(e)}"
-        )
\ No newline at end of file
+        )
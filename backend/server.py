@@ -1,35 +1,35 @@
-from fastapi import FastAPI, APIRouter, Request
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, APIRouter, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.datastructures import MutableHeaders
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
+from pymongo.errors import PyMongoError
 from typing import List
 import uuid
 from datetime import datetime
 
-# Import routes
-from routes.admin_auth import router as admin_auth_router
-from routes.admin_promotions import router as admin_promotions_router
-from routes.admin_brands import router as admin_brands_router
-from routes.admin_content import router as admin_content_router
-from routes.admin_upload import router as admin_upload_router
-from routes.public_api import router as public_api_router
-from routes.admin_system import router as admin_system_router
-from scheduler import start_scheduler
+from compression import CompressionMiddleware
+from database import QueryTimeoutMiddleware, create_client, read_database
+import metrics
+from loop_watchdog import LOOP_WATCHDOG_ENABLED, LoopWatchdogMiddleware, loop_watchdog
+from tracing import TracingMiddleware, tracer
+from static_files import UploadsStaticFiles
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection (pool sizing and timeouts from env, see database.py)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = create_client(mongo_url)
 db = client[os.environ['DB_NAME']]
+# Storefront reads may be served by secondaries
+read_db = read_database(client, os.environ['DB_NAME'])
 
 # Configure logging
 logging.basicConfig(
@@ -44,30 +44,57 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Óptica Villalba API...")
     
-    # Initialize auth service with database
-    from auth import set_database
-    set_database(db)
+    # Initialize the shared database handle
+    from database import set_database
+    set_database(db, read_db)
     
-    # Start the promotion scheduler
-    await start_scheduler(db)
+    # Event-loop lag sampling for /metrics
+    metrics.start_loop_monitor()
+    if LOOP_WATCHDOG_ENABLED:
+        loop_watchdog.start()
+    tracer.start()
     
-    logger.info("API startup complete")
+    # Public-only replicas neither own indexes nor run background jobs
+    runs_jobs = app.state.profile != "public"
+    if runs_jobs:
+        # Make sure query-backing indexes exist
+        from indexes import ensure_indexes
+        await ensure_indexes(db)
+        
+        # Make sure the storefront has a published content bundle
+        from content_bundles import ensure_published
+        await ensure_published(db)
+        
+        # Start the promotion scheduler
+        from scheduler import start_scheduler
+        await start_scheduler(db)
+        
+        # Deliver queued notifications in the background
+        from outbox import outbox_dispatcher
+        outbox_dispatcher.start(db)
+    
+    logger.info(f"API startup complete (profile: {app.state.profile})")
     
     yield
     
     # Shutdown
-    from scheduler import stop_scheduler
-    await stop_scheduler()
+    metrics.stop_loop_monitor()
+    loop_watchdog.stop()
+    if runs_jobs:
+        from scheduler import stop_scheduler
+        await stop_scheduler()
+        from outbox import outbox_dispatcher
+        await outbox_dispatcher.stop()
+        from backup_jobs import backup_jobs
+        backup_jobs.shutdown()
     client.close()
+    tracer.shutdown()
     logger.info("API shutdown complete")
 
 # Security/config flags
 ENVIRONMENT = os.environ.get("ENVIRONMENT", os.environ.get("ENV", "development")).lower()
 FORCE_HTTPS = os.environ.get("FORCE_HTTPS", "false").lower() in {"1", "true", "yes"}
 
-# Create the main app without a prefix
-app = FastAPI(title="Óptica Villalba API", version="1.0.0", lifespan=lifespan)
-
 # Create a router with the /api prefix for existing endpoints
 api_router = APIRouter(prefix="/api")
 
@@ -97,21 +124,6 @@ async def get_status_checks():
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
-# Include all routers
-app.include_router(api_router)  # Existing routes
-app.include_router(admin_auth_router)  # Admin authentication
-app.include_router(admin_promotions_router)  # Admin promotions
-app.include_router(admin_brands_router)  # Admin brands
-app.include_router(admin_content_router)  # Admin content management
-app.include_router(admin_upload_router)  # Admin file uploads
-app.include_router(public_api_router)  # Public API endpoints
-app.include_router(admin_system_router)  # Admin system (logs, backups)
-
-# Create uploads directory and serve static files
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-
 # CORS configuration from env (comma-separated)
 raw_origins = os.environ.get(
     "ALLOWED_ORIGINS",
@@ -119,32 +131,173 @@ raw_origins = os.environ.get(
 )
 ALLOWED_ORIGINS = [o.strip() for o in raw_origins.split(",") if o.strip()]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=ALLOWED_ORIGINS,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+class SecurityHeadersMiddleware:
+    """Add hardening headers to every response.
+
+    Implemented as a plain ASGI middleware (rather than @app.middleware) so
+    streamed and zero-copy file responses are not buffered through it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        is_https = (scope.get("scheme") or "").lower() == "https"
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                # Basic hardening headers
+                headers.setdefault("X-Frame-Options", "DENY")
+                headers.setdefault("X-Content-Type-Options", "nosniff")
+                headers.setdefault("Referrer-Policy", "no-referrer")
+                # Apply HSTS only if https
+                if is_https:
+                    headers.setdefault("Strict-Transport-Security", "max-age=63072000; includeSubDomains; preload")
+                # Minimal CSP (relaxed for dev); tighten in production as needed
+                if ENVIRONMENT == "production":
+                    headers.setdefault("Content-Security-Policy", "default-src 'self'; img-src 'self' data:; style-src 'self' 'unsafe-inline'; script-src 'self'")
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+async def database_error_handler(request: Request, exc: PyMongoError):
+    """Turn query/pool timeouts into a fast 503 instead of a generic 500"""
+    if getattr(exc, "timeout", False):
+        logger.warning(f"Database timeout on {request.url.path}: {str(exc)}")
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": "Database query timed out"},
+            headers={"Retry-After": "1"},
+        )
+    logger.error(f"Database error on {request.url.path}: {str(exc)}")
+    return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"detail": "Database error"})
+
+
+async def metrics_endpoint(request: Request):
+    """Prometheus text exposition of this process's metrics"""
+    if metrics.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {metrics.METRICS_TOKEN}":
+        return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Invalid metrics token"})
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def register_metrics(profile: str):
+    """Point the metric collectors at this process's pools, caches and executors"""
+    import asyncio
+    from motor.frameworks import asyncio as motor_asyncio
+    from cache import public_cache
+    from compression import compressed_body_cache
+    from database import pool_metrics
+
+    metrics.watch_pool(pool_metrics)
+    metrics.watch_cache("public_responses", public_cache)
+    metrics.watch_cache("compressed_bodies", compressed_body_cache)
+    metrics.watch_executor("motor", lambda: motor_asyncio._EXECUTOR)
+    metrics.watch_executor("default", lambda: getattr(asyncio.get_running_loop(), "_default_executor", None))
+    if profile != "public":
+        from backup_jobs import backup_jobs
+        metrics.watch_executor("backup", lambda: backup_jobs._executor)
+        from routes.admin_promotions import search_facet_cache
+        metrics.watch_cache("promotion_search_facets", search_facet_cache)
+
+
+# full: everything in one process (development, small installs)
+# public: storefront API only, cached, no auth imports; scale out freely
+# admin: admin panel API, scheduler and background jobs
+APP_PROFILES = ("full", "public", "admin")
+
+
+def include_routers(app: FastAPI, profile: str):
+    """Import and mount the routers for a profile.
+
+    Routers are imported here rather than at module load so a public-only app
+    never imports the admin routes or their dependencies.
+    """
+    if profile == "admin":
+        # Storefront reads are served by the public app; keep its health check
+        # so the launcher can probe admin workers the same way
+        from routes.public_api import health_check
+        app.add_api_route("/api/public/health", health_check, methods=["GET"], tags=["Public API"])
+    else:
+        from routes.public_api import router as public_api_router
+        app.include_router(public_api_router)  # Public API endpoints
+    if profile == "public":
+        return
+
+    from routes.admin_auth import router as admin_auth_router
+    from routes.admin_promotions import router as admin_promotions_router
+    from routes.admin_brands import router as admin_brands_router
+    from routes.admin_content import router as admin_content_router
+    from routes.admin_upload import router as admin_upload_router
+    from routes.admin_system import router as admin_system_router
+    app.include_router(api_router)  # Existing routes
+    app.include_router(admin_auth_router)  # Admin authentication
+    app.include_router(admin_promotions_router)  # Admin promotions
+    app.include_router(admin_brands_router)  # Admin brands
+    app.include_router(admin_content_router)  # Admin content management
+    app.include_router(admin_upload_router)  # Admin file uploads
+    app.include_router(admin_system_router)  # Admin system (logs, backups)
+
+
+def create_app(profile: str = "full") -> FastAPI:
+    """Build the application for one of APP_PROFILES"""
+    if profile not in APP_PROFILES:
+        raise ValueError(f"Unknown app profile: {profile}")
+
+    app = FastAPI(title="Óptica Villalba API", version="1.0.0", lifespan=lifespan)
+    app.state.profile = profile
+
+    # Response caching only where no admin writes happen in-process
+    from cache import public_cache
+    public_cache.enabled = profile == "public"
+
+    include_routers(app, profile)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+    register_metrics(profile)
+    app.add_exception_handler(PyMongoError, database_error_handler)
+
+    # Create uploads directory and serve static files
+    Path("uploads").mkdir(exist_ok=True)
+    app.mount("/uploads", UploadsStaticFiles(directory="uploads"), name="uploads")
+
+    # Per-route-class query budgets (innermost: wraps only the route handlers)
+    app.add_middleware(QueryTimeoutMiddleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=ALLOWED_ORIGINS,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Negotiated gzip/brotli for API responses; /uploads serves precompressed siblings
+    app.add_middleware(CompressionMiddleware, exclude_paths=("/uploads",))
+
+    # Optionally force HTTPS (useful behind reverse proxy)
+    if FORCE_HTTPS or ENVIRONMENT == "production":
+        app.add_middleware(HTTPSRedirectMiddleware)
+
+    app.add_middleware(SecurityHeadersMiddleware)
+
+    # Lets the event-loop watchdog name the route behind a stall
+    app.add_middleware(LoopWatchdogMiddleware)
+
+    # Server span per request (continues an incoming traceparent)
+    app.add_middleware(TracingMiddleware)
+
+    # Outermost, so recorded latency covers every other middleware
+    app.add_middleware(metrics.MetricsMiddleware)
+    return app
+
+
+app = create_app(os.environ.get("APP_PROFILE", "full"))
 
-# Optionally force HTTPS (useful behind reverse proxy)
-if FORCE_HTTPS or ENVIRONMENT == "production":
-    app.add_middleware(HTTPSRedirectMiddleware)
-
-@app.middleware("http")
-async def security_headers(request: Request, call_next):
-    response = await call_next(request)
-    # Basic hardening headers
-    response.headers.setdefault("X-Frame-Options", "DENY")
-    response.headers.setdefault("X-Content-Type-Options", "nosniff")
-    response.headers.setdefault("Referrer-Policy", "no-referrer")
-    # Apply HSTS only if https
-    if (request.url.scheme or "").lower() == "https":
-        response.headers.setdefault("Strict-Transport-Security", "max-age=63072000; includeSubDomains; preload")
-    # Minimal CSP (relaxed for dev); tighten in production as needed
-    if ENVIRONMENT == "production":
-        response.headers.setdefault("Content-Security-Policy", "default-src 'self'; img-src 'self' data:; style-src 'self' 'unsafe-inline'; script-src 'self'")
-    return response
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,189 @@
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Receive, Scope, Send
+
+from compression import ENCODING_SUFFIXES, is_compressible, negotiate_encoding
+
+# Upload names embed a uuid4 (admin_upload, promotion images) and backups a
+# timestamp, so a given URL never changes content and can be cached forever.
+UNIQUE_NAME_RE = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|_\d{8}_\d{6}",
+    re.IGNORECASE,
+)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+def cache_control_for(filename: str) -> str:
+    """Cache policy for a served upload based on whether its name is unique"""
+    if UNIQUE_NAME_RE.search(os.path.basename(filename)):
+        return IMMUTABLE_CACHE_CONTROL
+    return REVALIDATE_CACHE_CONTROL
+
+
+def parse_range_header(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into an inclusive (start, end) pair.
+
+    Returns None when the header should be ignored (malformed or multiple
+    ranges, which are answered with the full body) and raises ValueError when
+    the range cannot be satisfied.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        elif last:
+            # Suffix range: the final N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse with single byte-range support and zero-copy sends.
+
+    When the ASGI server advertises `http.response.zerocopy` the file
+    descriptor is handed to it (sendfile); `http.response.pathsend` is used for
+    whole-file responses. Otherwise the file is streamed in chunks without
+    being read into memory.
+    """
+
+    def __init__(self, path, *, range_header: Optional[str] = None, if_range: Optional[str] = None, **kwargs):
+        stat_result = kwargs.pop("stat_result", None) or os.stat(path)
+        super().__init__(path, stat_result=stat_result, **kwargs)
+        self.headers["accept-ranges"] = "bytes"
+        size = stat_result.st_size
+        self.byte_range = (0, size - 1)
+
+        if not range_header or self.status_code != 200:
+            return
+        if if_range and if_range not in (self.headers.get("etag"), self.headers.get("last-modified")):
+            # Representation changed since the client's partial copy: send it all
+            return
+        try:
+            parsed = parse_range_header(range_header, size)
+        except ValueError:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+            self.byte_range = (0, -1)
+            return
+        if parsed is None:
+            return
+
+        start, end = parsed
+        self.status_code = 206
+        self.byte_range = (start, end)
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        start, end = self.byte_range
+        count = end - start + 1
+        extensions = scope.get("extensions") or {}
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        if scope["method"].upper() == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopy" in extensions:
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": file,
+                    "offset": start,
+                    "count": count,
+                    "more_body": False,
+                })
+        elif "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                if start:
+                    await file.seek(start)
+                remaining = count
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    # File shrank underneath us; terminate the response cleanly
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        if self.background is not None:
+            await self.background()
+
+
+class UploadsStaticFiles(StaticFiles):
+    """Static mount for /uploads.
+
+    Serves precompressed .br/.gz siblings produced at write time by
+    compression.precompress_file (no per-request compression), marks
+    uniquely-named files as immutable, and answers conditional and byte-range
+    requests.
+    """
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        media_type, _ = mimetypes.guess_type(str(full_path))
+        served_path = full_path
+        headers = {"Cache-Control": cache_control_for(str(full_path))}
+
+        if is_compressible(media_type):
+            # Caches must not hand an identity body to clients that accept a sibling
+            headers["Vary"] = "Accept-Encoding"
+            encoding = negotiate_encoding(
+                request_headers.get("accept-encoding", ""),
+                encodings=list(ENCODING_SUFFIXES),
+            )
+            if encoding is not None:
+                sibling = f"{full_path}{ENCODING_SUFFIXES[encoding]}"
+                try:
+                    stat_result = os.stat(sibling)
+                    served_path = sibling
+                    headers["Content-Encoding"] = encoding
+                except OSError:
+                    pass
+
+        response = RangeFileResponse(
+            served_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            media_type=media_type or "application/octet-stream",
+            headers=headers,
+            range_header=request_headers.get("range"),
+            if_range=request_headers.get("if-range"),
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,392 @@
+"""Lightweight distributed tracing with OTLP/JSON export.
+
+Spans live in a contextvar, so they follow asyncio tasks (create_task copies
+the context) and Motor/asyncio.to_thread executor calls (both copy it too).
+Work handed to other threads without the context takes an explicit
+`parent=`. Finished spans are batched by a background thread and written as
+OTLP/JSON ExportTraceServiceRequest lines to a file (the format of the
+OpenTelemetry collector's file exporter) and/or POSTed to an OTLP/HTTP
+collector at OTEL_EXPORTER_OTLP_ENDPOINT.
+
+Incoming W3C `traceparent` headers are honoured; the root span of each
+request is sampled with TRACE_SAMPLE_RATIO and children follow its decision.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "false").lower() in {"1", "true", "yes"}
+TRACE_SAMPLE_RATIO = float(os.environ.get("TRACE_SAMPLE_RATIO", "1.0"))
+TRACE_EXPORT_FILE = os.environ.get("TRACE_EXPORT_FILE", str(Path(__file__).parent / "traces" / "spans.jsonl"))
+TRACE_FILE_MAX_MB = int(os.environ.get("TRACE_FILE_MAX_MB", "100"))
+OTLP_ENDPOINT = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "")
+SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "optica-villalba-api")
+TRACE_QUEUE_SIZE = 10000
+TRACE_BATCH_SIZE = 512
+TRACE_EXPORT_INTERVAL = 2.0
+
+# OTLP enums
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_UNSET = object()
+
+
+class SpanContext:
+    """Identity of a span created elsewhere (e.g. parsed from `traceparent`)"""
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> Optional["SpanContext"]:
+        if not header:
+            return None
+        parts = header.strip().split("-")
+        if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            flags = int(parts[3][:2], 16)
+            int(parts[1], 16), int(parts[2], 16)
+        except ValueError:
+            return None
+        if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+            return None
+        return cls(parts[1], parts[2], bool(flags & 1))
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int, sampled: bool, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.sampled = sampled
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Dict[str, Any]] = []
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException):
+        self.set_error(str(exc))
+        self.events.append({
+            "name": "exception",
+            "time_ns": time.time_ns(),
+            "attributes": {"exception.type": type(exc).__name__, "exception.message": str(exc)},
+        })
+
+    def end(self, end_ns: Optional[int] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        if self.sampled:
+            tracer.exporter.enqueue(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status, "message": self.status_message} if self.status_message else {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.events:
+            span["events"] = [
+                {"name": e["name"], "timeUnixNano": str(e["time_ns"]), "attributes": _otlp_attributes(e["attributes"])}
+                for e in self.events
+            ]
+        return span
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+class OTLPExporter:
+    """Batches finished spans on a background thread; drops spans when the queue is full"""
+
+    def __init__(self, path: Optional[str] = TRACE_EXPORT_FILE, endpoint: str = OTLP_ENDPOINT):
+        self.path = Path(path) if path else None
+        self.endpoint = endpoint.rstrip("/")
+        self.dropped = 0
+        self.exported = 0
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def enqueue(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="trace-exporter", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def _loop(self):
+        while not self._stop.wait(TRACE_EXPORT_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        while True:
+            batch: List[Span] = []
+            try:
+                while len(batch) < TRACE_BATCH_SIZE:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                return
+            try:
+                self.export(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                logger.error(f"Error exporting {len(batch)} spans: {str(e)}")
+
+    def export(self, spans: List[Span]):
+        payload = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": [s.to_otlp() for s in spans]}],
+            }]
+        }, separators=(",", ":"))
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.exists() and self.path.stat().st_size > TRACE_FILE_MAX_MB * 1024 * 1024:
+                self.path.replace(self.path.with_suffix(self.path.suffix + ".1"))
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(payload + "\n")
+        if self.endpoint:
+            import urllib.request
+            request = urllib.request.Request(
+                f"{self.endpoint}/v1/traces",
+                data=payload.encode(),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            urllib.request.urlopen(request, timeout=5).close()
+
+
+_current_span: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    span = _current_span.get()
+    return span if isinstance(span, Span) else None
+
+
+class Tracer:
+    def __init__(self, enabled: bool = TRACING_ENABLED, sample_ratio: float = TRACE_SAMPLE_RATIO):
+        self.enabled = enabled
+        self.sample_ratio = sample_ratio
+        self.exporter = OTLPExporter()
+
+    def start_span(self, name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None, parent=_UNSET) -> Optional[Span]:
+        """New span under `parent` (default: the current span; None: a new trace)"""
+        if not self.enabled:
+            return None
+        if parent is _UNSET:
+            parent = _current_span.get()
+        if parent is not None:
+            return Span(name, parent.trace_id, parent.span_id, kind, parent.sampled, attributes)
+        sampled = self.sample_ratio >= 1.0 or random.random() < self.sample_ratio
+        return Span(name, os.urandom(16).hex(), None, kind, sampled, attributes)
+
+    @contextmanager
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None, parent=_UNSET):
+        """Run the block inside a new current span"""
+        span = self.start_span(name, kind, attributes, parent)
+        if span is None:
+            yield None
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if not isinstance(e, asyncio.CancelledError):
+                span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def start(self):
+        if self.enabled:
+            self.exporter.start()
+
+    def shutdown(self):
+        if self.enabled:
+            self.exporter.shutdown()
+
+
+tracer = Tracer()
+
+
+def traced(name: Optional[str] = None, kind: int = SPAN_KIND_INTERNAL):
+    """Decorator: run each call of a (sync or async) function in its own span"""
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(span_name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """executor.submit() that carries the caller's contextvars (and current span) to the worker thread"""
+    return executor.submit(contextvars.copy_context().run, functools.partial(fn, *args, **kwargs))
+
+
+class TracingMiddleware:
+    """Server span per HTTP request, continuing an incoming `traceparent` if present"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                parent = SpanContext.from_traceparent(value.decode("latin-1"))
+                break
+
+        method = scope["method"]
+        attributes = {"http.request.method": method, "url.path": scope.get("path", "")}
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with tracer.span(method, SPAN_KIND_SERVER, attributes, parent=parent) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = metrics.route_template(scope)
+                span.name = f"{method} {route}"
+                span.set_attribute("http.route", route)
+                span.set_attribute("http.response.status_code", status_code)
+                if status_code >= 500:
+                    span.set_error(f"HTTP {status_code}")
+
+
+class CommandTracer(monitoring.CommandListener):
+    """Client span per Mongo command issued under a traced operation"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, int], Span] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if not tracer.enabled or _current_span.get() is None:
+            return
+        value = event.command.get(event.command_name)
+        collection = value if isinstance(value, str) else event.command.get("collection", "")
+        span = tracer.start_span(
+            f"{event.command_name} {collection}".strip(),
+            SPAN_KIND_CLIENT,
+            {
+                "db.system": "mongodb",
+                "db.name": event.database_name,
+                "db.operation": event.command_name,
+                "db.mongodb.collection": collection if isinstance(collection, str) else None,
+                "server.address": str(event.connection_id[0]),
+            },
+        )
+        with self._lock:
+            self._pending[(str(event.connection_id), event.request_id)] = span
+
+    def _finish(self, event, error: Optional[str] = None):
+        with self._lock:
+            span = self._pending.pop((str(event.connection_id), event.request_id), None)
+        if span is None:
+            return
+        if error:
+            span.set_error(error)
+        span.end(span.start_ns + event.duration_micros * 1000)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, str(event.failure.get("errmsg", "command failed")))
+
+
+command_tracer = CommandTracer()
@@ -0,0 +1,21 @@
+"""Shared pytest setup for tests/ and backend/test_server.py."""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent / "backend"
+
+# The app modules live in backend/ and use top-level imports
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+# Without a local mongod, connection checks fail fast instead of waiting 30s
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017/?serverSelectionTimeoutMS=1000")
+os.environ.setdefault("DB_NAME", "optica_villalba_test")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
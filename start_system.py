@@ -9,12 +9,37 @@ import sys
 import os
 import signal
 import threading
+import logging
+from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
 # Variables globales para los procesos
 backend_process = None
 admin_process = None
 
+# Directorio de logs de los servicios
+LOG_DIR = Path(__file__).parent / "logs"
+
+def drain_output(process, name):
+    """Vaciar la salida del proceso en un log rotativo para que el pipe nunca se llene"""
+    LOG_DIR.mkdir(exist_ok=True)
+    service_logger = logging.getLogger(f"start_system.{name}")
+    service_logger.setLevel(logging.INFO)
+    service_logger.propagate = False
+    if not service_logger.handlers:
+        handler = RotatingFileHandler(LOG_DIR / f"{name}.log", maxBytes=10 * 1024 * 1024, backupCount=3, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        service_logger.addHandler(handler)
+
+    def reader():
+        for line in iter(process.stdout.readline, b""):
+            service_logger.info(line.decode("utf-8", "replace").rstrip())
+        process.stdout.close()
+
+    thread = threading.Thread(target=reader, name=f"drain-{name}", daemon=True)
+    thread.start()
+    return thread
+
 def signal_handler(signum, frame):
     """Manejar Ctrl+C para detener todos los procesos"""
     print("\n🛑 Deteniendo todos los servicios...")
@@ -44,14 +69,14 @@ def start_backend():
         return False
     
     try:
-        # Iniciar el servidor backend en segundo plano
+        # Iniciar el servidor backend (workers múltiples) en segundo plano
         backend_process = subprocess.Popen(
-            [sys.executable, "server.py"],
+            [sys.executable, "launcher.py"],
             cwd=backend_dir,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            shell=True
+            stderr=subprocess.STDOUT
         )
+        drain_output(backend_process, "backend_console")
         
         # Esperar un momento para que el servidor se inicie
         time.sleep(3)
@@ -86,9 +111,9 @@ def start_admin():
             [npm_cmd, "start"],
             cwd=admin_dir,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            shell=True
+            stderr=subprocess.STDOUT
         )
+        drain_output(admin_process, "admin")
         
         # Esperar un momento para que el servidor se inicie
         time.sleep(5)
@@ -0,0 +1,31 @@
+"""Fixtures for API and module tests: an in-memory Mongo and the full app."""
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import database
+
+
+@pytest.fixture
+def db():
+    """Fresh in-memory database wired in as the app's database"""
+    handle = AsyncMongoMockClient()["optica_villalba_test"]
+    database.set_database(handle)
+    yield handle
+    database.set_database(None)
+
+
+@pytest.fixture
+def admin_user():
+    return {"username": "admin"}
+
+
+@pytest.fixture
+def client(db, admin_user):
+    """TestClient for the full app, authenticated as `admin_user` (no lifespan: jobs stay off)"""
+    import server
+    from auth import get_current_user
+
+    server.app.dependency_overrides[get_current_user] = lambda: admin_user
+    yield TestClient(server.app)
+    server.app.dependency_overrides.clear()
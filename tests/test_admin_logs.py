@@ -0,0 +1,54 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+BASE = datetime(2026, 3, 1, 12, 0)
+
+
+@pytest.fixture
+def logs(db):
+    entries = [
+        {"username": "admin" if i % 2 else "ana", "action": "update_promotion", "resource_id": f"promo-{i}",
+         # Two entries share a timestamp: the _id tiebreak must keep them apart
+         "timestamp": BASE - timedelta(minutes=min(i, 3))}
+        for i in range(6)
+    ]
+    entries.append({"username": "ana", "action": "login_attempt", "success": False, "ip_address": "10.0.0.1", "timestamp": BASE})
+    asyncio.run(db.admin_logs.insert_many(entries))
+
+
+def test_keyset_pagination_visits_every_log_once(client, logs):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "action": "update_promotion"}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/admin/system/logs", params=params).json()
+        seen.extend(page["logs"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(seen) == 6
+    assert len({log["id"] for log in seen}) == 6
+    keys = [(log["timestamp"], log["id"]) for log in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_log_filters_and_projection(client, logs):
+    page = client.get("/api/admin/system/logs", params={"username": "ana", "fields": "action"}).json()
+
+    assert page["count"] == 4
+    assert all(set(log) == {"id", "action"} for log in page["logs"])
+    assert client.get("/api/admin/system/logs", params={"fields": "password"}).status_code == 400
+    assert client.get("/api/admin/system/logs", params={"cursor": "nope"}).status_code == 400
+
+
+def test_failed_logins_are_grouped_by_ip(client, logs):
+    rows = client.get(
+        "/api/admin/system/logs/stats/failed-logins",
+        params={"since": (BASE - timedelta(hours=1)).isoformat(), "until": (BASE + timedelta(hours=1)).isoformat()},
+    ).json()["rows"]
+
+    assert [(row["ip_address"], row["failed_attempts"]) for row in rows] == [("10.0.0.1", 1)]
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+from backup_jobs import JOBS_COLLECTION, BackupJobManager
+
+
+async def wait_saved(db, job_id, status):
+    for _ in range(100):
+        doc = await db[JOBS_COLLECTION].find_one({"_id": job_id})
+        if doc and doc["status"] == status:
+            return doc
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never saved as {status}")
+
+
+async def test_another_worker_can_poll_a_job(db):
+    release = threading.Event()
+
+    def work(job):
+        job.files_total = 2
+        job.files_done = 1
+        release.wait(5)
+        job.files_done = 2
+        return {"files": 2}
+
+    runner = BackupJobManager(save_interval=0.01)
+    poller = BackupJobManager()
+    try:
+        job = await runner.submit("frontend_backup", work, params={"filename": "frontend.zip"})
+
+        await wait_saved(db, job.id, "running")
+        running = await poller.get(job.id)
+        assert running["status"] == "running"
+        assert running["params"] == {"filename": "frontend.zip"}
+
+        release.set()
+        await asyncio.wrap_future(job.future)
+        await wait_saved(db, job.id, "completed")
+        finished = await poller.get(job.id)
+        assert finished["progress"] == 1.0
+        assert finished["result"] == {"files": 2}
+        assert [j["job_id"] for j in await poller.list()] == [job.id]
+    finally:
+        release.set()
+        runner.shutdown()
+        poller.shutdown()
+
+
+async def test_job_of_a_dead_worker_is_reported_failed(db):
+    stale = datetime.utcnow() - timedelta(minutes=10)
+    await db[JOBS_COLLECTION].insert_one({
+        "_id": "lost",
+        "job_id": "lost",
+        "status": "running",
+        "created_at": stale,
+        "updated_at": stale,
+        "worker": "web-2:41",
+    })
+
+    job = await BackupJobManager().get("lost")
+
+    assert job["status"] == "failed"
+    assert "web-2:41" in job["error"]
+    assert await BackupJobManager().get("missing") is None
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+import backup_store
+from backup_store import create_snapshot, delete_snapshot, list_manifests, prune_snapshots, restore_snapshot
+
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup_store, "BACKUP_STORE_DIR", tmp_path / "store")
+    monkeypatch.setattr(backup_store, "BLOBS_DIR", tmp_path / "store" / "blobs")
+    monkeypatch.setattr(backup_store, "MANIFESTS_DIR", tmp_path / "store" / "manifests")
+
+
+@pytest.fixture
+def frontend(tmp_path):
+    src = tmp_path / "frontend"
+    src.mkdir()
+    (src / "index.html").write_text("<h1>Óptica</h1>")
+    (src / "app.js").write_text("console.log('v1')")
+    return src
+
+
+class PausingJob:
+    """Blocks the snapshot after its first file, while it holds the store lock"""
+
+    def __init__(self):
+        self.paused = threading.Event()
+        self.resume = threading.Event()
+        self.files_total = 0
+        self.bytes_done = 0
+        self._files_done = 0
+
+    @property
+    def files_done(self):
+        return self._files_done
+
+    @files_done.setter
+    def files_done(self, value):
+        self._files_done = value
+        self.paused.set()
+        self.resume.wait(5)
+
+
+def test_garbage_collection_waits_for_a_running_snapshot(frontend):
+    create_snapshot(None, frontend, "snapshot_1")
+    job = PausingJob()
+    snapshot = threading.Thread(target=create_snapshot, args=(job, frontend, "snapshot_2"))
+    snapshot.start()
+    assert job.paused.wait(5)
+
+    # snapshot_2 reuses snapshot_1's blobs; deleting snapshot_1 now must not collect them
+    delete = threading.Thread(target=delete_snapshot, args=("snapshot_1",))
+    delete.start()
+    delete.join(0.2)
+    assert delete.is_alive()
+
+    job.resume.set()
+    snapshot.join(5)
+    delete.join(5)
+
+    restored = frontend.parent / "restored"
+    restore_snapshot(None, "snapshot_2", restored)
+    assert (restored / "index.html").read_text() == "<h1>Óptica</h1>"
+
+
+def test_safety_snapshots_are_pruned_and_their_blobs_collected(frontend):
+    create_snapshot(None, frontend, "snapshot_1")
+    for i in range(3):
+        (frontend / "app.js").write_text(f"console.log('safety {i}')")
+        create_snapshot(None, frontend, f"safety_{i}", kind="safety")
+
+    pruned = prune_snapshots("frontend", kind="safety", keep=1)
+
+    assert sorted(pruned) == ["safety_0", "safety_1"]
+    assert sorted(m["name"] for m in list_manifests("frontend")) == ["safety_2", "snapshot_1"]
+    # Blobs: two files of snapshot_1 plus safety_2's app.js
+    assert len(list(backup_store.BLOBS_DIR.glob("*/*"))) == 3
+
+
+def test_restoring_the_oldest_safety_snapshot_keeps_it_until_restored(frontend):
+    from routes.admin_system import _run_snapshot_restore
+
+    for i in range(backup_store.SAFETY_SNAPSHOTS_KEEP):
+        (frontend / "app.js").write_text(f"console.log('safety {i}')")
+        create_snapshot(None, frontend, f"safety_{i}", kind="safety")
+
+    first = _run_snapshot_restore(None, "safety_0", frontend)
+    second = _run_snapshot_restore(None, "safety_0", frontend)
+
+    assert (frontend / "app.js").read_text() == "console.log('safety 0')"
+    # Same-second restores get distinct safety snapshots
+    assert first["safety_snapshot"] != second["safety_snapshot"]
+    names = [m["name"] for m in list_manifests("frontend")]
+    assert "safety_0" in names
+    assert len(names) == backup_store.SAFETY_SNAPSHOTS_KEEP + 1
@@ -0,0 +1,59 @@
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import ServerSelectionTimeoutError
+
+from circuit_breaker import OPEN, CircuitBreaker, LastGoodStore, stale_fallback
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LastGoodStore(directory=tmp_path, persist_interval=0)
+
+
+def make_endpoint(breaker, store, results):
+    @stale_fallback(breaker, store)
+    async def list_promotions(limit: int = 10):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return list_promotions
+
+
+async def test_cache_hits_are_not_stored_again(store):
+    cached = [{"title": "2x1"}]
+    endpoint = make_endpoint(CircuitBreaker("test"), store, [cached, cached, [{"title": "3x2"}]])
+
+    await endpoint(limit=10)
+    key, (stored_at, _, _) = next(iter(store._memory.items()))
+    await endpoint(limit=10)
+    assert store._memory[key][0] == stored_at
+
+    await endpoint(limit=10)
+    assert store._memory[key][0] > stored_at
+    assert store._memory[key][1] == [{"title": "3x2"}]
+
+
+async def test_database_errors_serve_the_last_good_response(store):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    endpoint = make_endpoint(breaker, store, [[{"title": "2x1"}], ServerSelectionTimeoutError("down")])
+
+    await endpoint(limit=10)
+    stale = await endpoint(limit=10)
+
+    assert stale.headers["x-stale-reason"] == "database-error"
+    assert stale.body == b'[{"title":"2x1"}]'
+    assert breaker.state == OPEN
+    # A fresh worker (empty memory) falls back to the copy on disk
+    fresh_store = LastGoodStore(directory=store.directory)
+    rejected = await make_endpoint(breaker, fresh_store, [])(limit=10)
+    assert rejected.headers["x-stale-source"] == "disk"
+
+
+async def test_no_last_good_response_is_a_503(store):
+    endpoint = make_endpoint(CircuitBreaker("test"), store, [ServerSelectionTimeoutError("down")])
+
+    with pytest.raises(HTTPException) as error:
+        await endpoint(limit=10)
+    assert error.value.status_code == 503
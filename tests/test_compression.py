@@ -0,0 +1,76 @@
+import gzip
+
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from compression import CompressedBodyCache, CompressionMiddleware, negotiate_encoding, precompress_file
+
+BODY = '{"items": [' + ",".join(['"óptica villalba"'] * 200) + "]}"
+
+
+def make_client(**kwargs) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/data")
+    async def data():
+        return Response(BODY, media_type="application/json", headers={"ETag": '"7"'})
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/image")
+    async def image():
+        return Response(b"\x89PNG" + b"0" * 2000, media_type="image/png")
+
+    app.add_middleware(CompressionMiddleware, cache=CompressedBodyCache(), **kwargs)
+    return TestClient(app)
+
+
+def test_negotiate_encoding_honours_q_values():
+    assert negotiate_encoding("gzip, br", ["br", "gzip"]) == "br"
+    assert negotiate_encoding("gzip;q=1, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("br;q=0, *;q=0.1", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("identity", ["br", "gzip"]) is None
+    assert negotiate_encoding("", ["br", "gzip"]) is None
+
+
+def test_gzip_response_is_compressed_with_vary_and_per_encoding_etag():
+    response = make_client().get("/data", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.headers["etag"] == '"7-gzip"'
+    # httpx decodes transparently; the raw length is the compressed one
+    assert response.text == BODY
+    assert int(response.headers["content-length"]) < len(BODY.encode("utf-8"))
+
+
+def test_small_and_incompressible_bodies_pass_through():
+    client = make_client()
+
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    image = client.get("/image", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in image.headers
+
+
+def test_excluded_paths_are_not_compressed():
+    response = make_client(exclude_paths=("/data",)).get("/data", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"7"'
+
+
+def test_precompress_file_writes_smaller_siblings(tmp_path):
+    path = tmp_path / "promo.svg"
+    path.write_text("<svg>" + "<rect/>" * 500 + "</svg>")
+
+    siblings = precompress_file(path)
+
+    gz = tmp_path / "promo.svg.gz"
+    assert gz in siblings
+    assert gzip.decompress(gz.read_bytes()) == path.read_bytes()
+    assert gz.stat().st_mtime_ns == path.stat().st_mtime_ns
+    assert precompress_file(tmp_path / "photo.jpg") == []
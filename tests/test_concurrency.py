@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from concurrency import parse_if_match
+from scheduler import PromotionScheduler
+
+PROMOTION = {
+    "title": "2x1 en anteojos de sol",
+    "discount": "2x1",
+    "type": "Promoción Especial",
+    # Long enough that the JSON response is compressed
+    "description": "Llevá dos anteojos de sol de la misma marca y pagá uno. " * 20,
+    "features": ["Marcas premium", "Garantía"],
+    "start_date": "2026-01-01T00:00:00",
+    "end_date": "2026-12-31T00:00:00",
+}
+
+
+def test_parse_if_match_accepts_encoded_weak_and_listed_etags():
+    assert parse_if_match('"3"') == {3}
+    assert parse_if_match('W/"3"') == {3}
+    assert parse_if_match('"3-gzip"') == {3}
+    assert parse_if_match('"3-br"') == {3}
+    assert parse_if_match('"3", "3-gzip"') == {3}
+    assert parse_if_match('"2", W/"4-br", "other"') == {2, 4}
+    assert parse_if_match("*") is None
+    assert parse_if_match(None) is None
+    with pytest.raises(HTTPException) as error:
+        parse_if_match('"abc"')
+    assert error.value.status_code == 400
+
+
+def test_promotion_if_match_round_trip_through_gzip(client):
+    promotion_id = client.post("/api/admin/promotions/", json=PROMOTION).json()["id"]
+
+    read = client.get(f"/api/admin/promotions/{promotion_id}", headers={"Accept-Encoding": "gzip"})
+    assert read.headers["content-encoding"] == "gzip"
+    assert read.headers["etag"] == '"0-gzip"'
+
+    updated = client.put(
+        f"/api/admin/promotions/{promotion_id}",
+        json={"title": "3x2 en anteojos de sol"},
+        headers={"If-Match": read.headers["etag"], "Accept-Encoding": "gzip"},
+    )
+    assert updated.status_code == 200
+    assert updated.json()["version"] == 1
+
+    # The validator read before the update is stale now
+    stale = client.put(
+        f"/api/admin/promotions/{promotion_id}",
+        json={"title": "otra"},
+        headers={"If-Match": read.headers["etag"]},
+    )
+    assert stale.status_code == 412
+    assert stale.headers["etag"] == '"1"'
+
+    # Any tag of a list may match
+    listed = client.put(
+        f"/api/admin/promotions/{promotion_id}",
+        json={"title": "3x2"},
+        headers={"If-Match": f'{read.headers["etag"]}, "1", "1-gzip"'},
+    )
+    assert listed.status_code == 200
+
+    deleted = client.delete(f"/api/admin/promotions/{promotion_id}", headers={"If-Match": listed.headers["etag"]})
+    assert deleted.status_code == 200
+
+
+def test_brand_and_site_config_accept_their_own_etags(client):
+    brand_id = client.post("/api/admin/brands/", json={"name": "Ray-Ban"}).json()["id"]
+    brand = client.get(f"/api/admin/brands/{brand_id}", headers={"Accept-Encoding": "gzip"})
+    assert client.put(
+        f"/api/admin/brands/{brand_id}", json={"name": "Oakley"}, headers={"If-Match": brand.headers["etag"]}
+    ).status_code == 200
+
+    config = client.put("/api/admin/content/section/header/tagline", json={"value": "Calidad"})
+    assert client.put(
+        "/api/admin/content/section/header/tagline",
+        json={"value": "Calidad Visual"},
+        headers={"If-Match": config.headers["etag"][:-1] + '-gzip"'},
+    ).status_code == 200
+    assert client.put(
+        "/api/admin/content/section/header/tagline",
+        json={"value": "Otra"},
+        headers={"If-Match": config.headers["etag"]},
+    ).status_code == 412
+
+
+def test_scheduler_change_invalidates_an_earlier_etag(client, db):
+    expired = {**PROMOTION, "start_date": "2026-01-01T00:00:00", "end_date": "2026-01-31T00:00:00", "is_active": True}
+    promotion_id = client.post("/api/admin/promotions/", json=expired).json()["id"]
+    read = client.get(f"/api/admin/promotions/{promotion_id}")
+    assert read.json()["is_active"] is True
+
+    asyncio.run(PromotionScheduler(db).check_promotion_schedules())
+
+    stale = client.put(
+        f"/api/admin/promotions/{promotion_id}",
+        json={"title": "otra", "is_active": True},
+        headers={"If-Match": read.headers["etag"]},
+    )
+    assert stale.status_code == 412
+    assert client.get(f"/api/admin/promotions/{promotion_id}").json()["is_active"] is False
@@ -0,0 +1,153 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+import content_bundles
+from circuit_breaker import CircuitBreaker
+from content_bundles import BUNDLES_COLLECTION, PublishConflict, get_pointer, publish, published_bundle
+from content_revisions import REVISIONS_COLLECTION, latest_revision
+from indexes import CONTENT_REVISIONS_INDEXES
+
+TITLE = "/api/admin/content/section/header/title"
+
+
+@pytest.fixture
+def bundle(tmp_path, monkeypatch):
+    """A fresh process-local bundle reference that refreshes on every request"""
+    monkeypatch.setattr(published_bundle, "bundle", None)
+    monkeypatch.setattr(published_bundle, "refresh_seconds", 0)
+    monkeypatch.setattr(published_bundle, "fallback_path", tmp_path / "content_bundle.json")
+    return published_bundle
+
+
+def header(client, **headers):
+    return client.get("/api/public/content/header", headers=headers)
+
+
+def test_draft_goes_live_only_when_published(client, bundle):
+    client.put(TITLE, json={"value": "Óptica"})
+    first = client.post("/api/admin/content/publish").json()
+    assert first["published"] is True
+
+    client.put(TITLE, json={"value": "Óptica Villalba"})
+    assert header(client).json() == {"title": "Óptica"}
+    changes = client.get("/api/admin/content/draft/changes").json()
+    assert changes["published_revision"] == first["revision"]
+    assert changes["set"] == [{"section": "header", "key": "title", "value": "Óptica Villalba"}]
+
+    before = header(client)
+    # A stale review cannot publish over a newer publish
+    assert client.post("/api/admin/content/publish", params={"expected_revision": 0}).status_code == 409
+    second = client.post("/api/admin/content/publish", params={"expected_revision": first["revision"]}).json()
+
+    after = header(client)
+    assert after.json() == {"title": "Óptica Villalba"}
+    assert after.headers["etag"] == f'"{second["bundle_id"]}"' != before.headers["etag"]
+    assert header(client, **{"If-None-Match": after.headers["etag"]}).status_code == 304
+    assert client.get("/api/admin/content/published").json()["revision"] == second["revision"]
+    # Nothing changed since: publishing again is a no-op
+    assert client.post("/api/admin/content/publish").json()["published"] is False
+
+
+def test_discard_and_rollback(client, bundle):
+    client.put(TITLE, json={"value": "Óptica"})
+    first = client.post("/api/admin/content/publish").json()
+    client.put(TITLE, json={"value": "Óptica Villalba"})
+    client.post("/api/admin/content/publish")
+
+    client.put(TITLE, json={"value": "borrador"})
+    assert client.post("/api/admin/content/draft/discard").json() == {"set": 1, "unset": 0}
+    assert client.get("/api/admin/content/draft/changes").json()["set"] == []
+
+    rolled_back = client.post(f"/api/admin/content/revisions/{first['revision']}/rollback").json()
+    assert rolled_back["rolled_back_to"] == first["revision"]
+    assert rolled_back["revision"] > first["revision"]
+    assert header(client).json() == {"title": "Óptica"}
+    assert client.post("/api/admin/content/revisions/99/rollback").status_code == 404
+
+
+def test_bundle_is_served_from_disk_when_the_database_is_down(client, bundle, monkeypatch):
+    client.put(TITLE, json={"value": "Óptica"})
+    client.post("/api/admin/content/publish")
+    assert header(client).status_code == 200
+
+    async def unreachable(db):
+        raise ServerSelectionTimeoutError("down")
+
+    # A fresh worker with no bundle in memory
+    monkeypatch.setattr(content_bundles, "get_pointer", unreachable)
+    monkeypatch.setattr(content_bundles, "public_db_breaker", CircuitBreaker("test", failure_threshold=10))
+    bundle.bundle = None
+    assert header(client).json() == {"title": "Óptica"}
+
+    # Nothing in memory or on disk
+    bundle.bundle = None
+    bundle.fallback_path.unlink()
+    assert header(client).status_code == 503
+
+
+def bundle_title(bundle_doc):
+    return json.loads(dict(bundle_doc["sections"])["header"])["title"]
+
+
+async def edit_title(db, value):
+    await db.site_config.update_one({"section": "header", "key": "title"}, {"$set": {"value": value}}, upsert=True)
+
+
+async def test_losing_publish_writes_nothing(db, bundle, monkeypatch):
+    await db[REVISIONS_COLLECTION].create_indexes(CONTENT_REVISIONS_INDEXES)
+    await edit_title(db, "Óptica")
+    await publish(db, "admin")
+    await edit_title(db, "Óptica Villalba")
+
+    async def pointer_then_lose_the_race(db):
+        pointer = await get_pointer(db)
+        monkeypatch.setattr(content_bundles, "get_pointer", get_pointer)
+        await edit_title(db, "Óptica Villalba Express")
+        await publish(db, "ana")
+        return pointer
+
+    monkeypatch.setattr(content_bundles, "get_pointer", pointer_then_lose_the_race)
+    with pytest.raises(PublishConflict):
+        await publish(db, "admin")
+
+    pointer = await get_pointer(db)
+    assert pointer["published_by"] == "ana"
+    assert pointer["revision"] == await latest_revision(db)
+    assert await db[BUNDLES_COLLECTION].count_documents({}) == 2
+
+
+async def test_revision_of_an_abandoned_publish_is_dropped(db, bundle, monkeypatch):
+    await db[REVISIONS_COLLECTION].create_indexes(CONTENT_REVISIONS_INDEXES)
+    await edit_title(db, "Óptica")
+    first = await publish(db, "admin")
+    # A publish died after recording its revision, before the pointer swap
+    await db[REVISIONS_COLLECTION].insert_one({
+        "revision": first["revision"] + 1, "kind": "delta", "created_at": datetime.utcnow() - timedelta(minutes=5),
+        "set": [["header", "title", "nunca publicado"]], "unset": [],
+    })
+    await edit_title(db, "Óptica Villalba")
+
+    second = await publish(db, "admin")
+
+    assert second["revision"] == first["revision"] + 1
+    assert (await db[REVISIONS_COLLECTION].find_one({"revision": second["revision"]}))["username"] == "admin"
+    assert bundle_title(await db[BUNDLES_COLLECTION].find_one({"_id": second["bundle_id"]})) == "Óptica Villalba"
+
+
+async def test_failed_pointer_swap_removes_its_revision_and_bundle(db, bundle, monkeypatch):
+    await edit_title(db, "Óptica")
+    first = await publish(db, "admin")
+    await edit_title(db, "Óptica Villalba")
+
+    async def swap_fails(db, previous, new_bundle):
+        raise ServerSelectionTimeoutError("down")
+
+    monkeypatch.setattr(content_bundles, "_swap_pointer", swap_fails)
+    with pytest.raises(ServerSelectionTimeoutError):
+        await publish(db, "admin")
+
+    assert await latest_revision(db) == first["revision"]
+    assert await db[BUNDLES_COLLECTION].count_documents({}) == 1
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+import content_revisions
+from content_revisions import (
+    REVISIONS_COLLECTION,
+    apply_changes,
+    RevisionConflict,
+    diff_content,
+    list_revisions,
+    load_content,
+    record_revision,
+)
+from indexes import CONTENT_REVISIONS_INDEXES
+
+
+def test_diff_then_apply_rebuilds_the_new_content():
+    old = {"header": {"title": "Óptica", "phone": "123"}, "footer": {"note": "x"}}
+    new = {"header": {"title": "Óptica Villalba", "phone": "123"}, "hours": {"mon": "9-18"}}
+
+    set_entries, unset_entries = diff_content(old, new)
+
+    assert sorted(set_entries) == [["header", "title", "Óptica Villalba"], ["hours", "mon", "9-18"]]
+    assert unset_entries == [["footer", "note"]]
+    assert apply_changes({k: dict(v) for k, v in old.items()}, set_entries, unset_entries) == new
+
+
+async def test_every_revision_is_rebuilt_from_checkpoint_and_deltas(db, monkeypatch):
+    monkeypatch.setattr(content_revisions, "CONTENT_CHECKPOINT_EVERY", 3)
+    await db.site_config.insert_one({"section": "header", "key": "title", "value": "Óptica"})
+
+    expected = {1: {"header": {"title": "Óptica"}}}
+    content = {"header": {"title": "Óptica"}}
+    for n in range(6):
+        apply_changes(content, [["hours", f"day{n}", "9-18"]], [["hours", f"day{n - 2}"]] if n >= 2 else [])
+        revision = await record_revision(db, content, "admin", "publish")
+        expected[revision] = {section: dict(keys) for section, keys in content.items()}
+
+    assert max(expected) == 7
+    for revision, wanted in expected.items():
+        assert await load_content(db, revision) == (revision, wanted)
+    kinds = [doc["kind"] async for doc in db[REVISIONS_COLLECTION].find().sort("revision", 1)]
+    assert kinds == ["checkpoint", "delta", "checkpoint", "delta", "delta", "checkpoint", "delta"]
+
+    # No-op changes are not recorded; listing is newest first and light
+    assert await record_revision(db, content, "admin", "publish") is None
+    listed = await list_revisions(db, limit=2)
+    assert [r["revision"] for r in listed] == [7, 6]
+    assert "content" not in listed[1] and "set" not in listed[0]
+
+
+async def test_lost_race_is_rediffed_against_the_winning_revision(db, monkeypatch):
+    await db[REVISIONS_COLLECTION].create_indexes(CONTENT_REVISIONS_INDEXES)
+    await db.site_config.insert_one({"section": "header", "key": "title", "value": "Óptica"})
+    await content_revisions.ensure_history(db)
+    load = content_revisions.load_content
+
+    async def load_then_lose_the_race(db, revision=None):
+        loaded = await load(db, revision)
+        if loaded[0] == 1:
+            # Another writer appends revision 2 after our diff was computed
+            await db[REVISIONS_COLLECTION].insert_one({
+                "revision": 2, "kind": "delta", "set": [["footer", "note", "x"]], "unset": [],
+            })
+        return loaded
+
+    monkeypatch.setattr(content_revisions, "load_content", load_then_lose_the_race)
+    wanted = {"header": {"title": "Óptica Villalba"}}
+
+    assert await record_revision(db, wanted, "admin", "publish") == 3
+    monkeypatch.undo()
+    assert await load_content(db, 3) == (3, wanted)
+    delta = await db[REVISIONS_COLLECTION].find_one({"revision": 3})
+    assert delta["unset"] == [["footer", "note"]]
+
+    # A writer bound to a base revision fails instead of re-appending
+    with pytest.raises(RevisionConflict):
+        await record_revision(db, {"header": {"title": "Otra"}}, "admin", "publish", base_revision=2)
+
+
+def test_revision_endpoints(client, db):
+    asyncio.run(db.site_config.insert_one({"section": "header", "key": "title", "value": "Óptica"}))
+    asyncio.run(record_revision(db, {"header": {"title": "Óptica Villalba"}}, "admin", "publish"))
+
+    history = client.get("/api/admin/content/revisions").json()
+    assert history["latest"] == 2
+    assert [r["action"] for r in history["revisions"]] == ["publish", "initial_import"]
+    first = client.get("/api/admin/content/revisions/1").json()
+    assert first["content"] == {"header": {"title": "Óptica"}}
+    assert client.get("/api/admin/content/revisions/9").status_code == 404
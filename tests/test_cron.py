@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from cron import JOBS_COLLECTION, CronExpression, CronScheduler
+
+
+def current_slot() -> datetime:
+    return datetime.utcnow().replace(second=0, microsecond=0) - timedelta(minutes=1)
+
+
+async def make_scheduler(db, func, slot=None):
+    scheduler = CronScheduler(db)
+    job = scheduler.register("job", "* * * * *", func)
+    await scheduler._load_state()
+    if slot is not None:
+        job.next_run_at = slot
+    return scheduler, job
+
+
+async def run_due(scheduler, job):
+    await scheduler._run_due()
+    task = scheduler._tasks.get(job.name)
+    if task is not None:
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def test_cron_expression_matches_steps_and_either_day_field():
+    every_quarter_hour = CronExpression("*/15 * * * *")
+    assert every_quarter_hour.next_after(datetime(2026, 3, 1, 10, 7)) == datetime(2026, 3, 1, 10, 15)
+
+    # 1st of the month or any Monday
+    either = CronExpression("0 0 1 * 1")
+    assert either.next_after(datetime(2026, 3, 1, 0, 0)) == datetime(2026, 3, 2, 0, 0)
+    with pytest.raises(ValueError):
+        CronExpression("61 * * * *")
+
+
+async def test_load_state_never_overwrites_the_persisted_schedule(db):
+    slot = current_slot()
+    await db[JOBS_COLLECTION].insert_one({"_id": "job", "schedule": "* * * * *", "next_run_at": slot, "running": True})
+
+    await make_scheduler(db, lambda: asyncio.sleep(0))
+
+    state = await db[JOBS_COLLECTION].find_one({"_id": "job"})
+    assert state["next_run_at"] == slot
+    assert state["running"] is True
+
+
+async def test_deposed_leader_cannot_run_a_slot_again(db):
+    calls = []
+
+    async def func():
+        calls.append(1)
+
+    slot = current_slot()
+    await db[JOBS_COLLECTION].insert_one({"_id": "job", "schedule": "* * * * *", "next_run_at": slot})
+    leader, leader_job = await make_scheduler(db, func)
+    deposed, deposed_job = await make_scheduler(db, func, slot=slot)
+
+    await run_due(leader, leader_job)
+    await run_due(deposed, deposed_job)
+
+    assert calls == [1]
+    state = await db[JOBS_COLLECTION].find_one({"_id": "job"})
+    assert state["last_scheduled_for"] == slot
+    # The deposed worker adopted the persisted schedule instead of retrying
+    assert deposed_job.next_run_at == state["next_run_at"] > slot
+
+
+async def test_failed_job_is_recorded_as_error(db):
+    async def func():
+        raise RuntimeError("boom")
+
+    scheduler, job = await make_scheduler(db, func, slot=current_slot())
+    await db[JOBS_COLLECTION].update_one({"_id": "job"}, {"$set": {"next_run_at": job.next_run_at}})
+
+    await run_due(scheduler, job)
+
+    state = await db[JOBS_COLLECTION].find_one({"_id": "job"})
+    assert state["last_status"] == "error"
+    assert state["last_error"] == "boom"
+    assert state["failures"] == 1
+    assert state["running"] is False
+
+
+async def test_cancelled_run_releases_the_claim_and_keeps_its_slot(db):
+    started = asyncio.Event()
+
+    async def func():
+        started.set()
+        await asyncio.sleep(60)
+
+    slot = current_slot()
+    scheduler, job = await make_scheduler(db, func, slot=slot)
+    await db[JOBS_COLLECTION].update_one({"_id": "job"}, {"$set": {"next_run_at": slot}})
+
+    await scheduler._run_due()
+    await started.wait()
+    scheduler.stop()
+    await asyncio.gather(scheduler._tasks["job"], return_exceptions=True)
+
+    state = await db[JOBS_COLLECTION].find_one({"_id": "job"})
+    assert state["running"] is False
+    assert state["last_status"] == "cancelled"
+    assert state["next_run_at"] == slot
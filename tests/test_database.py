@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pymongo import _csot
+
+import database
+from database import LazyClient, QueryTimeoutMiddleware, create_client, query_budget, read_database
+
+
+class FakeClient:
+    def __init__(self):
+        self.closed = False
+
+    def get_database(self, name, **kwargs):
+        return {"name": name, "client": self, **kwargs}
+
+    def close(self):
+        self.closed = True
+
+
+def test_client_is_not_built_until_first_use():
+    built = []
+    client = LazyClient(lambda: built.append(FakeClient()) or built[-1])
+
+    db = client["optica"]
+    read_db = client.get_database("optica", read_preference="secondaryPreferred")
+    assert built == []
+
+    assert db.resolve()["name"] == "optica"
+    assert read_db.resolve()["read_preference"] == "secondaryPreferred"
+    assert len(built) == 1
+    assert db.resolve() is db.resolve()
+
+
+def test_forked_worker_builds_its_own_client():
+    built = []
+    client = LazyClient(lambda: built.append(FakeClient()) or built[-1])
+    db = client["optica"]
+    parent = db.resolve()["client"]
+
+    client._pid = os.getpid() + 1  # as seen from a child after fork()
+
+    assert db.resolve()["client"] is not parent
+    assert len(built) == 2
+    # The inherited client is dropped, never closed by the child
+    client._pid = os.getpid() + 1
+    client.close()
+    assert not built[1].closed
+
+
+def test_create_client_defers_the_motor_client():
+    client = create_client("mongodb://localhost:27017/?serverSelectionTimeoutMS=100")
+    read_db = read_database(client, "optica")
+    assert client._client is None
+
+    assert read_db.promotions.name == "promotions"
+    assert client._client is not None
+    client.close()
+
+
+def make_timeout_client():
+    app = FastAPI()
+
+    async def remaining(path_budget_started: bool):
+        await asyncio.sleep(0.2)  # a slow upload or image optimization
+        if path_budget_started:
+            return {"remaining": _csot.remaining()}
+        with query_budget():
+            return {"remaining": _csot.remaining()}
+
+    @app.post("/api/admin/upload/image")
+    async def upload():
+        return await remaining(False)
+
+    @app.get("/api/admin/promotions/")
+    async def promotions():
+        return await remaining(True)
+
+    app.add_middleware(QueryTimeoutMiddleware)
+    return TestClient(app)
+
+
+def test_upload_routes_start_their_query_budget_at_the_first_query(monkeypatch):
+    monkeypatch.setattr(database, "QUERY_TIMEOUTS_MS", [("/api/admin", 150)])
+    client = make_timeout_client()
+
+    # Regular route: the budget ran out while the handler was busy
+    assert client.get("/api/admin/promotions/").json()["remaining"] < 0
+    # Deferred route: the whole budget is left for the queries
+    assert 0.1 < client.post("/api/admin/upload/image").json()["remaining"] <= 0.15
+    assert database.defers_budget("/api/admin/promotions/abc/upload-image")
+    assert not database.defers_budget("/api/admin/system/backups/jobs")
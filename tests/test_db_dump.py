@@ -0,0 +1,57 @@
+import pytest
+
+import db_dump
+from db_dump import create_dump, restore_dump
+
+
+@pytest.fixture(autouse=True)
+def dumps_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_dump, "DB_DUMPS_DIR", tmp_path / "db_dumps")
+
+
+async def seed(db):
+    await db.promotions.insert_many([{"_id": i, "id": f"promo-{i}", "title": f"Promoción {i}"} for i in range(3)])
+    await db.admin_users.insert_one({"_id": "admin", "username": "admin", "password_hash": "old"})
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "bson"])
+async def test_full_restore_round_trips_collections(db, fmt):
+    await seed(db)
+    dump = await create_dump(None, db, fmt=fmt)
+    await db.promotions.delete_many({"_id": {"$gt": 0}})
+
+    result = await restore_dump(None, db, dump["name"])
+
+    assert result["restored"]["promotions"] == 3
+    assert await db.promotions.count_documents({}) == 3
+
+
+async def test_dropping_restore_keeps_admin_users(db):
+    await seed(db)
+    dump = await create_dump(None, db)
+    # Changed after the dump: a new admin and a password change
+    await db.admin_users.insert_one({"_id": "ana", "username": "ana", "password_hash": "new"})
+    await db.admin_users.update_one({"_id": "admin"}, {"$set": {"password_hash": "changed"}})
+    await db.promotions.insert_one({"_id": 99, "id": "promo-99", "title": "Nueva"})
+
+    await restore_dump(None, db, dump["name"], drop=True)
+
+    assert await db.promotions.count_documents({}) == 3
+    usernames = sorted(u["username"] for u in await db.admin_users.find().to_list(None))
+    assert usernames == ["admin", "ana"]
+    # Dumped accounts are replaced by _id
+    assert (await db.admin_users.find_one({"_id": "admin"}))["password_hash"] == "old"
+
+
+async def test_dumps_started_in_the_same_second_get_their_own_directories(db):
+    await seed(db)
+
+    full = await create_dump(None, db)
+    incremental = await create_dump(None, db, mode="incremental")
+    again = await create_dump(None, db)
+
+    assert len({full["name"], incremental["name"], again["name"]}) == 3
+    assert incremental["base"] == full["name"]
+    assert sorted(path.name for path in db_dump.DB_DUMPS_DIR.iterdir()) == sorted(
+        [full["name"], incremental["name"], again["name"]]
+    )
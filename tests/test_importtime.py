@@ -0,0 +1,23 @@
+from importtime_report import by_package, parse, run_importtime
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        900 |     pydantic.main
+import time:       600 |       1500 |   pydantic
+"""
+
+
+def test_parse_and_group_by_package():
+    rows = parse(SAMPLE)
+
+    assert rows[0] == ("_io", 120, 120)
+    assert by_package(rows) == {"_io": 120, "pydantic": 900}
+
+
+def test_full_app_does_not_import_heavy_optional_modules():
+    names = {name for name, _, _ in parse(run_importtime("full"))}
+
+    assert "server" in names
+    assert not names & {"PIL", "qrcode", "pyotp", "pandas", "numpy", "boto3"}
+
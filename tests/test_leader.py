@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from leader import LEASES_COLLECTION, LeaderElection
+
+
+async def test_only_one_instance_holds_the_lease(db):
+    first = LeaderElection(db, lease_seconds=15)
+    second = LeaderElection(db, lease_seconds=15)
+
+    assert await first.try_acquire() is True
+    assert await second.try_acquire() is False
+    # Renewal by the holder keeps the lease
+    assert await first.try_acquire() is True
+    assert first.is_leader and not second.is_leader
+
+    lease = await db[LEASES_COLLECTION].find_one({"_id": "scheduler"})
+    assert lease["holder"] == first.instance_id
+
+
+async def test_released_or_expired_lease_is_taken_over(db):
+    first = LeaderElection(db)
+    second = LeaderElection(db)
+    await first.try_acquire()
+
+    await first.release()
+    assert not first.is_leader
+    assert await second.try_acquire() is True
+
+    # The holder stops renewing and its lease runs out
+    await db[LEASES_COLLECTION].update_one(
+        {"_id": "scheduler"}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+    assert await first.try_acquire() is True
+    assert await second.try_acquire() is False
+    assert not second.is_leader
@@ -0,0 +1,66 @@
+import asyncio
+
+from benchmarks.loadgen import Endpoint, percentile, run_load, summarize
+from benchmarks.run import compare
+
+
+async def serve(reader, writer):
+    """Keep-alive HTTP server: /chunked answers chunked, /missing 404s"""
+    while True:
+        request_line = await reader.readline()
+        if not request_line:
+            break
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        path = request_line.split()[1]
+        if path == b"/chunked":
+            writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nhello\r\n3\r\nabc\r\n0\r\n\r\n")
+        elif path == b"/missing":
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+        else:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 4\r\n\r\nok!!")
+        await writer.drain()
+    writer.close()
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([7.0], 95) == 7
+    assert percentile([], 95) == 0.0
+    summary = summarize([3.0, 1.0, 2.0], errors=1, elapsed=2.0, size=30)
+    assert summary["p50_ms"] == 2.0
+    assert summary["max_ms"] == 3.0
+    assert summary["rps"] == 1.5
+    assert summary["avg_bytes"] == 10
+
+
+async def test_run_load_reads_both_body_framings_and_counts_errors():
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    endpoints = [Endpoint("plain", "/plain"), Endpoint("chunked", "/chunked"), Endpoint("missing", "/missing")]
+    try:
+        results = await run_load("127.0.0.1", port, endpoints, concurrency=4, duration=0.2, warmup=0.05)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    assert results["plain"]["requests"] > 0 and results["plain"]["avg_bytes"] == 4
+    assert results["chunked"]["requests"] > 0 and results["chunked"]["avg_bytes"] == 8
+    assert results["missing"]["requests"] == 0 and results["missing"]["errors"] > 0
+    assert results["_total"]["requests"] == results["plain"]["requests"] + results["chunked"]["requests"]
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"endpoints": {"promotions": {"rps": 1000, "p50_ms": 2.0, "p95_ms": 5.0, "p99_ms": 8.0}}}
+    results = {
+        "promotions": {"rps": 800, "p50_ms": 1.5, "p95_ms": 5.4, "p99_ms": 12.0},
+        "new_endpoint": {"rps": 1, "p50_ms": 100.0, "p95_ms": 100.0, "p99_ms": 100.0},
+    }
+
+    regressions = compare(results, baseline, tolerance=0.1)
+
+    assert [r.split(":")[0] for r in regressions] == ["promotions.rps", "promotions.p99_ms"]
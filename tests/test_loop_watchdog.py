@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from loop_watchdog import LoopWatchdog
+
+
+def block_the_loop(seconds):
+    time.sleep(seconds)
+
+
+async def test_stall_is_recorded_with_its_stack_and_task():
+    watchdog = LoopWatchdog(threshold_ms=50)
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.05)
+
+        async def handler():
+            watchdog.track({"type": "http", "method": "GET", "path": "/api/public/promotions/active"})
+            block_the_loop(0.25)
+
+        await asyncio.create_task(handler())
+        # Let the heartbeat run again so the watchdog sees the recovery
+        await asyncio.sleep(0.1)
+    finally:
+        watchdog.stop()
+
+    status = watchdog.status()
+    assert status["total_blocks"] == 1
+    block = status["recent"][0]
+    assert block["route"] == "GET /api/public/promotions/active"
+    assert "block_the_loop" in block["stack"]
+    assert 150 <= block["duration_ms"] <= 400
+
+
+async def test_short_pauses_are_not_stalls():
+    watchdog = LoopWatchdog(threshold_ms=200)
+    watchdog.start()
+    try:
+        block_the_loop(0.05)
+        await asyncio.sleep(0.1)
+    finally:
+        watchdog.stop()
+
+    assert watchdog.status()["total_blocks"] == 0
+    assert watchdog.status()["enabled"] is False
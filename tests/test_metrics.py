@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+import metrics
+from metrics import CommandMetrics, Histogram
+
+
+def sample(text, prefix):
+    """Value of the first exposition line starting with `prefix`"""
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"no sample {prefix}")
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("job_seconds", "Job time", ("job",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, "backup")
+
+    lines = histogram.render()
+
+    assert lines[:2] == ["# HELP job_seconds Job time", "# TYPE job_seconds histogram"]
+    assert 'job_seconds_bucket{job="backup",le="0.1"} 1' in lines
+    assert 'job_seconds_bucket{job="backup",le="1.0"} 3' in lines
+    assert 'job_seconds_bucket{job="backup",le="+Inf"} 4' in lines
+    assert 'job_seconds_count{job="backup"} 4' in lines
+
+
+def test_requests_are_labelled_by_route_template(client, monkeypatch):
+    client.get("/api/admin/promotions/abc")
+    client.get("/api/admin/promotions/def")
+
+    text = client.get("/metrics").text
+
+    labels = 'method="GET",route="/api/admin/promotions/{promotion_id}",status="404"'
+    assert sample(text, f"http_requests_total{{{labels}}}") >= 2
+    assert "/api/admin/promotions/abc" not in text
+    assert "http_request_duration_seconds_bucket" in text
+
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+def test_command_listener_times_commands_per_collection():
+    listener = CommandMetrics()
+    started = SimpleNamespace(
+        command={"find": "promotions_metrics_test"}, command_name="find", connection_id=("db", 27017), request_id=7
+    )
+    listener.started(started)
+    listener.failed(SimpleNamespace(command_name="find", connection_id=("db", 27017), request_id=7, duration_micros=2500))
+
+    text = metrics.registry.render()
+
+    labels = 'collection="promotions_metrics_test",command="find",status="error"'
+    assert sample(text, f"mongodb_command_duration_seconds_count{{{labels}}}") == 1
+    assert sample(text, f"mongodb_command_duration_seconds_sum{{{labels}}}") == 0.0025
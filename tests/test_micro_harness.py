@@ -0,0 +1,46 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.micro.conftest import Benchmark
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+BENCHMARK = "benchmarks/micro/bench_hot_paths.py::test_promotion_model_construction"
+
+
+def run_micro(*args):
+    return subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", BENCHMARK, "--bench-min-time", "0.02", *args],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_benchmark_calibrates_iterations_and_returns_the_result():
+    calls = []
+    bench = Benchmark("append", min_time=0.01)
+
+    result = bench(lambda: calls.append(1) or len(calls), rounds=3)
+
+    assert bench.stats["rounds"] == 3
+    assert bench.stats["iterations"] > 1
+    assert bench.stats["min_us"] <= bench.stats["median_us"]
+    assert result == len(calls)
+
+
+def test_saved_baseline_is_compared_on_the_next_run(tmp_path):
+    baseline = tmp_path / "baseline.json"
+
+    saved = run_micro("--bench-save", "--bench-baseline", str(baseline))
+    assert saved.returncode == 0, saved.stdout
+    stats = json.loads(baseline.read_text())["benchmarks"]["test_promotion_model_construction"]
+    assert stats["median_us"] > 0
+
+    # A baseline 100x faster than reality is a regression
+    stats["median_us"] /= 100
+    baseline.write_text(json.dumps({"benchmarks": {"test_promotion_model_construction": stats}}))
+    regressed = run_micro("--bench-baseline", str(baseline))
+    assert regressed.returncode == 1
+    assert "regressed" in regressed.stdout
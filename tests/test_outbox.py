@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import outbox
+from outbox import DEAD, OUTBOX_COLLECTION, PENDING, SENT, OutboxDispatcher, backoff_seconds, enqueue, requeue
+
+PROMOTION = {"id": "p1", "title": "2x1 en anteojos de sol", "discount": "2x1", "is_active": True}
+
+
+class FakeTransport:
+    name = "fake"
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)  # one error (or None) per delivered message
+        self.sent = []
+
+    def deliver(self, messages):
+        self.sent.extend(messages)
+        return [self.outcomes.pop(0) if self.outcomes else None for _ in messages]
+
+
+def dispatcher(db, transport):
+    worker = OutboxDispatcher(transport=transport, batch_size=10)
+    worker.db = db
+    return worker
+
+
+async def make_due(db):
+    await db[OUTBOX_COLLECTION].update_many({}, {"$set": {"available_at": datetime.utcnow() - timedelta(seconds=1)}})
+
+
+def test_backoff_is_exponential_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_BACKOFF_BASE_SECONDS", 30)
+    monkeypatch.setattr(outbox, "OUTBOX_BACKOFF_MAX_SECONDS", 3600)
+
+    assert 15 <= backoff_seconds(1) <= 30
+    assert 60 <= backoff_seconds(3) <= 120
+    assert 1800 <= backoff_seconds(20) <= 3600
+
+
+async def test_message_is_sent_once_with_a_stable_message_id(db):
+    message_id = await enqueue(db, "promotion.created", {"event": "created", "promotion": PROMOTION}, "ventas@example.com")
+    transport = FakeTransport()
+
+    assert await dispatcher(db, transport).dispatch_batch() == 1
+    assert await dispatcher(db, transport).dispatch_batch() == 0
+
+    doc = await db[OUTBOX_COLLECTION].find_one({"_id": message_id})
+    assert doc["status"] == SENT and doc["attempts"] == 1
+    [message] = transport.sent
+    assert message["Subject"] == "Nueva promoción: 2x1 en anteojos de sol"
+    assert message["To"] == "ventas@example.com"
+    assert message["Message-ID"].startswith(f"<{message_id}@")
+
+
+async def test_failures_back_off_then_dead_letter_until_requeued(db, monkeypatch):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    message_id = await enqueue(db, "promotion.updated", {"event": "updated", "promotion": PROMOTION})
+    worker = dispatcher(db, FakeTransport("421: busy", "421: busy"))
+
+    await worker.dispatch_batch()
+    doc = await db[OUTBOX_COLLECTION].find_one({"_id": message_id})
+    assert doc["status"] == PENDING
+    assert doc["available_at"] > datetime.utcnow()
+    assert doc["last_error"] == "421: busy"
+    # Not due yet
+    assert await worker.dispatch_batch() == 0
+
+    await make_due(db)
+    await worker.dispatch_batch()
+    doc = await db[OUTBOX_COLLECTION].find_one({"_id": message_id})
+    assert doc["status"] == DEAD and doc["attempts"] == 2
+
+    assert await requeue(db, message_id) == 1
+    await worker.dispatch_batch()
+    assert (await db[OUTBOX_COLLECTION].find_one({"_id": message_id}))["status"] == SENT
+
+
+async def test_unrenderable_message_is_dead_lettered_immediately(db):
+    message_id = await enqueue(db, "promotion.created", {"event": "created"})
+
+    await dispatcher(db, FakeTransport()).dispatch_batch()
+
+    doc = await db[OUTBOX_COLLECTION].find_one({"_id": message_id})
+    assert doc["status"] == DEAD
+    assert doc["last_error"].startswith("render:")
+
+
+async def test_expired_lease_is_reclaimed_and_the_old_claim_cannot_settle(db):
+    message_id = await enqueue(db, "promotion.deleted", {"event": "deleted", "promotion": PROMOTION})
+    crashed = dispatcher(db, FakeTransport())
+    crashed.worker_id = "web-1:10"
+    claimed = await crashed._claim(datetime.utcnow())
+    assert claimed["_id"] == message_id
+
+    # Another worker takes over once the lease runs out
+    await db[OUTBOX_COLLECTION].update_one({"_id": message_id}, {"$set": {"locked_until": datetime.utcnow() - timedelta(seconds=1)}})
+    assert await dispatcher(db, FakeTransport()).dispatch_batch() == 1
+
+    await crashed._settle(claimed, "connect: timed out")
+    doc = await db[OUTBOX_COLLECTION].find_one({"_id": message_id})
+    assert doc["status"] == SENT
+    assert doc["last_error"] is None
+
+
+def test_promotion_save_only_queues_a_notification(client, db):
+    promotion_id = client.post("/api/admin/promotions/", json={
+        "title": "2x1 en anteojos de sol",
+        "discount": "2x1",
+        "type": "Promoción Especial",
+        "description": "Llevá dos y pagá uno",
+        "features": [],
+        "start_date": "2026-01-01T00:00:00",
+        "end_date": "2026-12-31T00:00:00",
+    }).json()["id"]
+
+    queued = asyncio.run(db[OUTBOX_COLLECTION].find_one({"topic": "promotion.created"}))
+    assert queued["status"] == PENDING
+    assert queued["payload"]["promotion"]["id"] == promotion_id
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from profiler import SamplingProfiler
+
+
+def spin_on_the_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def test_profile_collapses_the_loop_stack_under_its_task():
+    profiler = SamplingProfiler()
+    loop = asyncio.get_running_loop()
+    sampling = loop.run_in_executor(None, profiler.run, 0.2, 5, loop, threading.get_ident())
+
+    async def busy():
+        spin_on_the_loop(0.3)
+
+    await asyncio.create_task(busy(), name="busy-handler")
+    result = await sampling
+
+    assert result["matched"] > 0
+    hot = max(result["collapsed"].splitlines(), key=lambda line: int(line.rsplit(" ", 1)[1]))
+    assert ";task:busy-handler;" in hot
+    assert hot.split(" (")[-2].endswith("spin_on_the_loop")
+    assert not profiler.running
+
+
+async def test_route_filter_drops_other_samples_and_one_profile_runs_at_a_time():
+    profiler = SamplingProfiler()
+    loop = asyncio.get_running_loop()
+    sampling = loop.run_in_executor(None, profiler.run, 0.2, 5, loop, threading.get_ident(), "GET /api/nothing")
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(RuntimeError, match="already running"):
+        profiler.run(0.1, 5, loop, threading.get_ident())
+
+    result = await sampling
+    assert result["samples"] > 0
+    assert result["matched"] == 0
+    assert result["collapsed"] == ""
+
+
+def test_profile_endpoint_validates_and_returns_collapsed_stacks(client):
+    assert client.post("/api/admin/system/profile", params={"seconds": 0}).status_code == 400
+
+    response = client.post("/api/admin/system/profile", params={"seconds": 0.05, "all_threads": True})
+
+    assert response.status_code == 200
+    assert int(response.headers["x-profile-samples"]) > 0
+    assert response.headers["content-disposition"].endswith('.collapsed"')
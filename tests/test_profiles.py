@@ -0,0 +1,66 @@
+import pytest
+
+import server
+from cache import TTLCache, cached, public_cache
+from importtime_report import parse, run_importtime
+
+
+@pytest.fixture
+def build_app():
+    enabled = public_cache.enabled
+
+    def build(profile):
+        return {route.path for route in server.create_app(profile).routes}
+
+    yield build
+    # create_app switches the shared cache on for the public profile
+    public_cache.enabled = enabled
+    public_cache.clear()
+
+
+def test_profiles_mount_their_own_routers(build_app):
+    public = build_app("public")
+    admin = build_app("admin")
+    full = build_app("full")
+
+    assert "/api/public/promotions/active" in public
+    assert not any(path.startswith("/api/admin") for path in public)
+    assert "/api/admin/promotions/" in admin
+    assert "/api/public/health" in admin
+    assert "/api/public/promotions/active" not in admin
+    assert public | admin <= full
+    with pytest.raises(ValueError):
+        server.create_app("storefront")
+
+
+def test_public_app_skips_admin_routers_and_auth():
+    names = {name for name, _, _ in parse(run_importtime("public"))}
+
+    assert "routes.public_api" in names
+    assert not names & {"auth", "jose", "passlib", "routes.admin_promotions"}
+
+
+async def test_cached_endpoint_hits_until_ttl_expires():
+    cache = TTLCache(ttl=60, max_entries=2)
+    calls = []
+
+    @cached(cache)
+    async def promotions(brand=None):
+        calls.append(brand)
+        return [brand]
+
+    await promotions(brand="oakley")
+    assert calls == ["oakley"]  # disabled: every call reaches the function
+    cache.enabled = True
+    await promotions(brand="oakley")
+    await promotions(brand="oakley")
+    await promotions(brand="ray-ban")
+    assert calls == ["oakley", "oakley", "ray-ban"]
+    assert cache.stats()["hits"] == 1
+
+    cache.ttl = -1
+    await promotions(brand="vogue")
+    await promotions(brand="vogue")
+    assert calls[-2:] == ["vogue", "vogue"]
+    # LRU bound
+    assert cache.stats()["entries"] <= 2
@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from routes import admin_promotions
+
+
+def promotion(i, type, is_active, start):
+    return {
+        "id": f"promo-{i}",
+        "title": f"Promoción {i}",
+        "discount": "20%",
+        "type": type,
+        "description": "Descuento en anteojos",
+        "features": [],
+        "is_active": is_active,
+        "start_date": start,
+        "end_date": datetime(2026, 12, 31),
+        "created_at": start,
+        "updated_at": start,
+    }
+
+
+@pytest.fixture(autouse=True)
+def facet_cache():
+    admin_promotions.search_facet_cache.clear()
+    yield admin_promotions.search_facet_cache
+    admin_promotions.search_facet_cache.clear()
+
+
+@pytest.fixture
+def promotions(db):
+    asyncio.run(db.promotions.insert_many([
+        promotion(1, "2x1", True, datetime(2026, 1, 10)),
+        promotion(2, "2x1", False, datetime(2026, 2, 10)),
+        promotion(3, "Descuento", True, datetime(2026, 2, 20)),
+        promotion(4, "2x1", True, datetime(2026, 3, 5)),
+    ]))
+
+
+def test_search_pages_newest_first_with_facets(client, promotions):
+    response = client.get("/api/admin/promotions/search", params={"limit": 2})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["total"] == 4
+    assert [p["id"] for p in body["results"]] == ["promo-4", "promo-3"]
+    assert body["facets"]["type"] == [{"value": "2x1", "count": 3}, {"value": "Descuento", "count": 1}]
+    assert sorted(body["facets"]["is_active"], key=lambda b: b["value"]) == [
+        {"value": False, "count": 1},
+        {"value": True, "count": 3},
+    ]
+    assert body["facets"]["start_date"] == [
+        {"value": "2026-03", "count": 1},
+        {"value": "2026-02", "count": 2},
+        {"value": "2026-01", "count": 1},
+    ]
+
+
+def test_search_filters_with_exact_facets(client, promotions):
+    body = client.get(
+        "/api/admin/promotions/search",
+        params={"type": "2x1", "is_active": True, "date_bucket": "year"},
+    ).json()
+
+    assert body["total"] == 2
+    assert [p["id"] for p in body["results"]] == ["promo-4", "promo-1"]
+    assert body["facets"]["start_date"] == [{"value": "2026", "count": 2}]
+    assert client.get("/api/admin/promotions/search", params={"date_bucket": "week"}).status_code == 400
+
+
+def test_facets_are_cached_until_a_promotion_changes(client, db, promotions):
+    assert client.get("/api/admin/promotions/search").json()["total"] == 4
+
+    # A write from another worker shows up once the cached facets expire
+    asyncio.run(db.promotions.insert_one(promotion(5, "Descuento", True, datetime(2026, 4, 1))))
+    cached = client.get("/api/admin/promotions/search").json()
+    assert cached["total"] == 4
+    assert [p["id"] for p in cached["results"]][0] == "promo-5"
+
+    # A write through this worker clears them
+    client.post("/api/admin/promotions/bulk-deactivate", json=["promo-5"])
+    body = client.get("/api/admin/promotions/search").json()
+    assert body["total"] == 5
+    assert {"value": False, "count": 2} in body["facets"]["is_active"]
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from indexes import ensure_indexes
+from rollups import AUDIT_LOG_RETENTION_DAYS, backfill_reports, day_key, record_event
+
+
+async def test_backfill_never_zeroes_reports_past_log_retention(db):
+    old_day = day_key(datetime.utcnow() - timedelta(days=AUDIT_LOG_RETENTION_DAYS + 5))
+    await db.daily_reports.insert_one({"date": old_day, "daily_admin_actions": 42})
+
+    days, skipped = await backfill_reports(db, old_day, old_day, rebuild=True)
+
+    assert (days, skipped) == ([], [old_day])
+    report = await db.daily_reports.find_one({"date": old_day})
+    assert report["daily_admin_actions"] == 42
+
+
+async def test_backfill_rebuilds_recent_days_from_the_audit_log(db):
+    moment = datetime.utcnow() - timedelta(days=2)
+    day = day_key(moment)
+    await db.admin_logs.insert_many([
+        {"action": "login_attempt", "success": False, "timestamp": moment},
+        {"action": "update_promotion", "timestamp": moment},
+    ])
+
+    days, skipped = await backfill_reports(db, day, day, rebuild=True)
+
+    assert (days, skipped) == ([day], [])
+    report = await db.daily_reports.find_one({"date": day})
+    assert report["daily_admin_actions"] == 2
+    assert report["failed_logins"] == 1
+
+
+async def test_old_day_with_a_rollup_is_rebuilt_from_it(db):
+    moment = datetime.utcnow() - timedelta(days=AUDIT_LOG_RETENTION_DAYS + 1)
+    await record_event(db, {"action": "create_brand", "timestamp": moment})
+
+    days, _ = await backfill_reports(db, day_key(moment), day_key(moment), rebuild=True)
+
+    assert days == [day_key(moment)]
+    report = await db.daily_reports.find_one({"date": day_key(moment)})
+    assert report["actions"] == {"create_brand": 1}
+
+
+async def test_ensure_indexes_dedupes_reports_before_the_unique_index(db):
+    await db.daily_reports.insert_many([
+        {"date": "2026-01-01", "daily_admin_actions": 1, "generated_at": datetime(2026, 1, 2)},
+        {"date": "2026-01-01", "daily_admin_actions": 3, "generated_at": datetime(2026, 1, 5)},
+        {"date": "2026-01-02", "daily_admin_actions": 7, "generated_at": datetime(2026, 1, 3)},
+    ])
+
+    await ensure_indexes(db)
+
+    reports = await db.daily_reports.find({}, {"_id": 0, "date": 1, "daily_admin_actions": 1}).sort("date", 1).to_list(None)
+    assert reports == [
+        {"date": "2026-01-01", "daily_admin_actions": 3},
+        {"date": "2026-01-02", "daily_admin_actions": 7},
+    ]
+    assert "date_unique" in await db.daily_reports.index_information()
@@ -0,0 +1,56 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from static_files import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, UploadsStaticFiles, parse_range_header
+
+UNIQUE_NAME = "0f8fad5b-d9cb-469f-a165-70867728950e.svg"
+BODY = b"<svg>" + b"<rect/>" * 200 + b"</svg>"
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / UNIQUE_NAME).write_bytes(BODY)
+    (tmp_path / (UNIQUE_NAME + ".gz")).write_bytes(gzip.compress(BODY))
+    (tmp_path / "logo.svg").write_bytes(BODY)
+    app = FastAPI()
+    app.mount("/uploads", UploadsStaticFiles(directory=tmp_path), name="uploads")
+    return TestClient(app)
+
+
+def test_parse_range_header():
+    assert parse_range_header("bytes=0-9", 100) == (0, 9)
+    assert parse_range_header("bytes=90-", 100) == (90, 99)
+    assert parse_range_header("bytes=-10", 100) == (90, 99)
+    assert parse_range_header("bytes=0-5,10-20", 100) is None
+    with pytest.raises(ValueError):
+        parse_range_header("bytes=100-", 100)
+
+
+def test_unique_names_are_immutable_and_others_revalidate(client):
+    assert client.get(f"/uploads/{UNIQUE_NAME}").headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert client.get("/uploads/logo.svg").headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+
+def test_byte_ranges_and_conditional_requests(client):
+    partial = client.get(f"/uploads/{UNIQUE_NAME}", headers={"Range": "bytes=0-4", "Accept-Encoding": "identity"})
+    assert partial.status_code == 206
+    assert partial.content == b"<svg>"
+    assert partial.headers["content-range"] == f"bytes 0-4/{len(BODY)}"
+
+    unsatisfiable = client.get("/uploads/logo.svg", headers={"Range": f"bytes={len(BODY)}-"})
+    assert unsatisfiable.status_code == 416
+
+    full = client.get("/uploads/logo.svg")
+    revalidated = client.get("/uploads/logo.svg", headers={"If-None-Match": full.headers["etag"]})
+    assert revalidated.status_code == 304
+
+
+def test_precompressed_sibling_is_served(client):
+    response = client.get(f"/uploads/{UNIQUE_NAME}", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.content == BODY
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import tracing
+from tracing import OTLPExporter, SpanContext, TracingMiddleware, current_span, submit_in_context
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    exporter = OTLPExporter(path=None)
+    monkeypatch.setattr(tracing.tracer, "enabled", True)
+    monkeypatch.setattr(tracing.tracer, "exporter", exporter)
+
+    def spans():
+        items = []
+        while not exporter._queue.empty():
+            items.append(exporter._queue.get_nowait())
+        return items
+
+    return spans
+
+
+def test_traceparent_parsing():
+    context = SpanContext.from_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")
+    assert (context.trace_id, context.span_id, context.sampled) == (TRACE_ID, PARENT_ID, True)
+    assert SpanContext.from_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert SpanContext.from_traceparent("garbage") is None
+
+
+def test_server_span_continues_incoming_trace(exported):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"span": current_span().span_id}
+
+    app.add_middleware(TracingMiddleware)
+    response = TestClient(app).get("/items/7", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+
+    [span] = exported()
+    assert span.name == "GET /items/{item_id}"
+    assert (span.trace_id, span.parent_id) == (TRACE_ID, PARENT_ID)
+    assert span.attributes["http.response.status_code"] == 200
+    assert response.json()["span"] == span.span_id
+
+
+def test_worker_threads_join_the_callers_trace(exported):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with tracing.tracer.span("request") as parent:
+            child_parent = submit_in_context(executor, lambda: current_span()).result()
+
+    assert child_parent is parent
+    assert [span.name for span in exported()] == ["request"]